@@ -23,6 +23,19 @@ DATA_DIR = PROJECT_ROOT / 'data'
 RAW_DATA_DIR = DATA_DIR / 'raw'
 PROCESSED_DATA_DIR = DATA_DIR / 'processed'
 RESULTS_DIR = DATA_DIR / 'results'
+# K线本地存储目录（按交易对和间隔保存，只下载缺失的时间段）
+KLINE_CACHE_DIR = Path(os.getenv('KLINE_CACHE_DIR', str(DATA_DIR / 'klines')))
+# Whale Alert 历史数据回填目录（逐页写入的交易和断点）
+WHALE_BACKFILL_DIR = Path(os.getenv('WHALE_BACKFILL_DIR', str(DATA_DIR / 'whale_backfill')))
+# 多币种回填合并后的数据集目录（按币种和日期分区）
+WHALE_DATASET_DIR = Path(os.getenv('WHALE_DATASET_DIR', str(DATA_DIR / 'whale_dataset')))
+# 地址标签文件（CSV，列: address, entity[, entity_type]），加载后编译为同名 .npz 缓存，判断转账是否转入/转出交易所
+ADDRESS_LABELS_PATH = Path(os.getenv('ADDRESS_LABELS_PATH', str(DATA_DIR / 'address_labels.csv')))
+# 标签文件不存在时的来源：redis 表示读取 Redis 集合 {ADDRESS_LABELS_REDIS_PREFIX}{实体名称}，留空表示不加载
+ADDRESS_LABELS_SOURCE = os.getenv('ADDRESS_LABELS_SOURCE', '').strip().lower()
+ADDRESS_LABELS_REDIS_PREFIX = os.getenv('ADDRESS_LABELS_REDIS_PREFIX', 'address_labels:')
+# 更粗的K线间隔（1h、1d 等）由本地存储的该间隔K线聚合得到，每个交易对只需下载一种间隔；留空表示直接下载
+KLINE_BASE_INTERVAL = os.getenv('KLINE_BASE_INTERVAL', '1m').strip()
 
 # 创建数据目录（如果不存在）
 DATA_DIR.mkdir(exist_ok=True)
@@ -56,9 +69,50 @@ BLOCKCHAINS = [b.strip().lower() for b in blockchains_str.split(',') if b.strip(
 
 # 最小转账金额（美元）
 WHALE_ALERT_MIN_VALUE_USD = float(os.getenv('WHALE_ALERT_MIN_VALUE_USD', '500000'))
+# REST API 每分钟请求数和最多可以连续发送的请求数（所有进程共享）
+WHALE_ALERT_REQUESTS_PER_MIN = int(os.getenv('WHALE_ALERT_REQUESTS_PER_MIN', '40'))
+WHALE_ALERT_REQUESTS_BURST = int(os.getenv('WHALE_ALERT_REQUESTS_BURST', '5'))
+# 多币种历史回填时同时执行的任务数（总请求频率仍受上面的配额限制）
+WHALE_BACKFILL_WORKERS = int(os.getenv('WHALE_BACKFILL_WORKERS', '4'))
 
-# Binance API配置
-BINANCE_BASE_URL = 'https://api.binance.com/api/v3'
+# Binance API配置（BINANCE_BASE_URL 可指向本地替身服务用于测试）
+BINANCE_BASE_URL = os.getenv('BINANCE_BASE_URL', 'https://api.binance.com/api/v3')
+# HTTP 连接池：keep-alive 复用连接，所有 BinanceCollector 共用一个会话
+BINANCE_POOL_SIZE = int(os.getenv('BINANCE_POOL_SIZE', 10))
+# 连接超时 / 读取超时（秒）
+BINANCE_CONNECT_TIMEOUT = float(os.getenv('BINANCE_CONNECT_TIMEOUT', '3.05'))
+BINANCE_READ_TIMEOUT = float(os.getenv('BINANCE_READ_TIMEOUT', '10'))
+# 连接错误和 5xx 的重试次数与指数退避系数（秒）；429/418 由限流器处理
+BINANCE_MAX_RETRIES = int(os.getenv('BINANCE_MAX_RETRIES', 3))
+BINANCE_RETRY_BACKOFF = float(os.getenv('BINANCE_RETRY_BACKOFF', '0.5'))
+# K线下载的并发请求数
+BINANCE_KLINE_CONCURRENCY = int(os.getenv('BINANCE_KLINE_CONCURRENCY', '8'))
+# 每分钟最多使用的请求权重（所有进程共享，Binance 上限为 BINANCE_WEIGHT_LIMIT）
+BINANCE_WEIGHT_BUDGET = int(os.getenv('BINANCE_WEIGHT_BUDGET', '4800'))
+# 最多可以连续使用的请求权重（令牌桶容量）
+BINANCE_WEIGHT_BURST = int(os.getenv('BINANCE_WEIGHT_BURST', '1200'))
+# Binance 每分钟的权重上限（响应头 X-MBX-USED-WEIGHT-1M 接近上限时所有进程暂停到本分钟结束）
+BINANCE_WEIGHT_LIMIT = int(os.getenv('BINANCE_WEIGHT_LIMIT', '6000'))
+# 行情 WebSocket 价格簿：订阅全市场 mini-ticker，基准价格和观察器采样直接读内存，过期时回退到 REST
+BINANCE_STREAM_ENABLED = os.getenv('BINANCE_STREAM_ENABLED', 'false').strip().lower() in ('1', 'true', 'yes')
+BINANCE_STREAM_URL = os.getenv('BINANCE_STREAM_URL', 'wss://stream.binance.com:9443/ws/!miniTicker@arr')
+# 单个交易对最长多少秒没有更新仍视为有效（mini-ticker 只推送有变化的交易对）
+BINANCE_STREAM_MAX_AGE = float(os.getenv('BINANCE_STREAM_MAX_AGE', '300'))
+# 整个连接最长多少秒没有消息仍视为有效（正常情况下每秒推送一次）
+BINANCE_STREAM_MAX_SILENCE = float(os.getenv('BINANCE_STREAM_MAX_SILENCE', '10'))
+# 价格缓存有效期（秒），同一交易对在有效期内只请求一次 REST；0 表示不缓存
+BINANCE_PRICE_CACHE_TTL = float(os.getenv('BINANCE_PRICE_CACHE_TTL', '5'))
+# 交易对索引（exchangeInfo）刷新间隔（秒）
+BINANCE_SYMBOLS_REFRESH = float(os.getenv('BINANCE_SYMBOLS_REFRESH', '3600'))
+# 美元计价交易对的优先顺序（逗号分隔）
+BINANCE_QUOTE_ASSETS = [s.strip().upper() for s in os.getenv('BINANCE_QUOTE_ASSETS', 'USDT,USDC,FDUSD').split(',') if s.strip()]
+# 没有美元计价交易对时使用的交叉报价币种（价格 = XYZ/BTC × BTC/USDT）
+BINANCE_CROSS_ASSETS = [s.strip().upper() for s in os.getenv('BINANCE_CROSS_ASSETS', 'BTC,ETH').split(',') if s.strip()]
+
+# API 限流：redis 表示所有进程共享 Redis 中的令牌桶，local 表示每个进程单独限流
+RATE_LIMIT_BACKEND = os.getenv('RATE_LIMIT_BACKEND', 'redis').strip().lower()
+# 历史回填请求需要在令牌桶中保留的比例（保留部分只给实时监控使用）
+RATE_LIMIT_BACKFILL_RESERVE = float(os.getenv('RATE_LIMIT_BACKFILL_RESERVE', '0.25'))
 
 # Redis配置
 # 优先使用 REDIS_URL，格式: redis://[:password@]host[:port][/db]
@@ -71,3 +125,46 @@ REDIS_PORT = int(os.getenv('REDIS_PORT', 6379))
 REDIS_DB = int(os.getenv('REDIS_DB', 0))
 REDIS_PASSWORD = os.getenv('REDIS_PASSWORD', None)  # 如果Redis有密码
 
+
+# WebSocket 警报摄取队列配置
+# 接收线程只负责解析和入队，由工作线程池处理警报（价格查询、Redis 写入）
+# WS_INGEST_WORKERS=0 表示不使用队列，在接收线程中直接处理（旧行为）
+WS_INGEST_WORKERS = int(os.getenv('WS_INGEST_WORKERS', 4))
+WS_INGEST_QUEUE_SIZE = int(os.getenv('WS_INGEST_QUEUE_SIZE', 1000))
+# 队列满时的策略: block（背压，等待 WS_INGEST_BLOCK_TIMEOUT 秒）、drop_newest、drop_oldest
+WS_INGEST_POLICY = os.getenv('WS_INGEST_POLICY', 'drop_oldest').strip().lower()
+WS_INGEST_BLOCK_TIMEOUT = float(os.getenv('WS_INGEST_BLOCK_TIMEOUT', '1.0'))
+# 队列指标汇报间隔（秒），写入 Redis 的 metrics:ingest
+WS_INGEST_REPORT_INTERVAL = int(os.getenv('WS_INGEST_REPORT_INTERVAL', 60))
+
+# asyncio 引擎配置（main_ws_async.py）
+# 同时处理的警报数量上限（达到上限时接收循环等待，形成背压）
+WS_ASYNC_MAX_INFLIGHT = int(os.getenv('WS_ASYNC_MAX_INFLIGHT', 50))
+# 观察器同时读取快照列表的窗口数量上限（观察窗口在每次检查中批量读写，只有未记录最大/最小变化的旧窗口需要读取快照）
+OBSERVER_ASYNC_CONCURRENCY = int(os.getenv('OBSERVER_ASYNC_CONCURRENCY', 20))
+
+# WebSocket 重连配置
+# 订阅ID：重连时发送同一个ID，Whale Alert 会补发断线期间错过的警报
+# 留空时自动生成并持久化到 Redis（ws:subscription_id），进程重启后保持不变
+WHALE_ALERT_SUBSCRIPTION_ID = os.getenv('WHALE_ALERT_SUBSCRIPTION_ID', '').strip()
+# 抖动指数退避：首次等待 WS_RECONNECT_BASE_DELAY 秒，每次失败翻倍，最多 WS_RECONNECT_MAX_DELAY 秒
+# 实际等待时间在 [delay * (1 - WS_RECONNECT_JITTER), delay] 之间随机
+WS_RECONNECT_BASE_DELAY = float(os.getenv('WS_RECONNECT_BASE_DELAY', '5'))
+WS_RECONNECT_MAX_DELAY = float(os.getenv('WS_RECONNECT_MAX_DELAY', '300'))
+WS_RECONNECT_JITTER = float(os.getenv('WS_RECONNECT_JITTER', '0.5'))
+
+# WebSocket 原始帧录制（可选）：设置文件路径后，每一帧原始消息都会追加写入该文件
+# 以 .gz 结尾时使用 gzip 压缩；用 scripts/replay_frames.py 回放
+WS_RECORD_PATH = os.getenv('WS_RECORD_PATH', '').strip()
+
+# WebSocket 消息 JSON 解码器：auto（orjson → msgspec → json，使用第一个已安装的）、orjson、msgspec、json
+WS_JSON_DECODER = os.getenv('WS_JSON_DECODER', 'auto').strip().lower()
+
+# 警报去重（按交易哈希）：进程内布隆过滤器 + Redis 有序集合 alerts:seen
+# 重连补发或重复投递的警报在查询 Binance 之前被丢弃，不会覆盖已有事件和基准价格
+WS_DEDUP_ENABLED = os.getenv('WS_DEDUP_ENABLED', 'true').strip().lower() in ('1', 'true', 'yes')
+# 去重窗口（秒），默认 48 小时
+WS_DEDUP_TTL = int(os.getenv('WS_DEDUP_TTL', 172800))
+# 布隆过滤器每一代的容量和误判率（误判的新警报会被丢弃，误判率应足够小）
+WS_DEDUP_CAPACITY = int(os.getenv('WS_DEDUP_CAPACITY', 100000))
+WS_DEDUP_ERROR_RATE = float(os.getenv('WS_DEDUP_ERROR_RATE', '1e-6'))
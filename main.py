@@ -48,12 +48,14 @@ def main():
     try:
         # 收集Whale Alert数据
         print("正在收集Whale Alert数据...")
+        # 交易逐页写入本地列式存储（WHALE_DATASET_DIR），分析只读取该币种、时间范围内需要的列
         whale_data = collect_whale_data(
             start_date=start_date,
             end_date=end_date,
             currency=currency,
             min_value=500000,  # 最小50万美元的转账
-            save_path=str(settings.RAW_DATA_DIR / f'whale_alert_{start_date.strftime("%Y%m%d")}_{end_date.strftime("%Y%m%d")}.csv')
+            columns=['timestamp', 'hash', 'amount_usd', 'from_address', 'to_address',
+                     'from_owner', 'to_owner', 'from_owner_type', 'to_owner_type']
         )
         print(f"收集到 {len(whale_data)} 条Whale Alert记录")
         
@@ -14,6 +14,8 @@ if hasattr(sys.stdout, 'reconfigure'):
     sys.stderr.reconfigure(line_buffering=True)
 
 from src.websocket.whale_alert_ws import WhaleAlertWebSocket
+from src.data_collectors.binance import BinanceCollector
+from src.data_collectors.binance_stream import BinancePriceStream
 from src.observers.price_observer import PriceObserver
 from src.observers.window_manager import WindowManager
 from config import settings
@@ -25,6 +27,7 @@ class WhaleAlertMonitor:
     def __init__(self):
         self.ws_client = None
         self.observer = None
+        self.price_stream = None
         self.running = False
     
     def setup_signal_handlers(self):
@@ -53,8 +56,13 @@ class WhaleAlertMonitor:
         
         # 初始化组件
         try:
-            self.ws_client = WhaleAlertWebSocket(api_key=settings.WHALE_ALERT_API_KEY)
-            self.observer = PriceObserver(check_interval=300)  # 每5分钟检查一次
+            # 行情流价格簿（可选）：基准价格和观察器采样直接读内存，过期时回退到 REST
+            if settings.BINANCE_STREAM_ENABLED:
+                self.price_stream = BinancePriceStream()
+            binance = BinanceCollector(price_stream=self.price_stream)
+            self.ws_client = WhaleAlertWebSocket(api_key=settings.WHALE_ALERT_API_KEY, binance=binance)
+            # 每5分钟检查一次，与 WebSocket 客户端共用 Binance 收集器（同一个 HTTP 连接池和价格簿）
+            self.observer = PriceObserver(check_interval=300, binance=binance)
         except Exception as e:
             print(f"初始化错误: {e}", flush=True)
             return
@@ -62,7 +70,9 @@ class WhaleAlertMonitor:
         # 设置信号处理器
         self.setup_signal_handlers()
         
-        # 启动价格观察器（后台线程）
+        # 启动行情流价格簿和价格观察器（后台线程）
+        if self.price_stream:
+            self.price_stream.start()
         self.observer.start()
         
         # 显示当前状态
@@ -97,6 +107,9 @@ class WhaleAlertMonitor:
         if self.ws_client:
             self.ws_client.stop()
         
+        if self.price_stream:
+            self.price_stream.stop()
+        
         print("监控系统已停止", flush=True)
 
 
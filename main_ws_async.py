@@ -0,0 +1,43 @@
+"""
+WebSocket主程序（asyncio版本）：在单个事件循环中实时监听Whale Alert事件并观察价格变化
+"""
+import asyncio
+import sys
+import os
+from datetime import datetime
+
+# 强制无缓冲输出，确保日志实时显示（特别是 Railway 等云平台）
+os.environ['PYTHONUNBUFFERED'] = '1'
+if hasattr(sys.stdout, 'reconfigure'):
+    sys.stdout.reconfigure(line_buffering=True)
+    sys.stderr.reconfigure(line_buffering=True)
+
+from src.websocket.async_client import run_async_monitor
+from config import settings
+
+
+def main():
+    """主函数"""
+    print("="*60, flush=True)
+    print("Whale Alert 实时监控系统（asyncio）", flush=True)
+    print("="*60, flush=True)
+    print(f"启动时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", flush=True)
+    print(flush=True)
+    
+    # 检查API密钥
+    if not settings.WHALE_ALERT_API_KEY:
+        print("错误: 未配置 Whale Alert API 密钥", flush=True)
+        print("请在 .env 文件中设置 WHALE_ALERT_API_KEY", flush=True)
+        return
+    
+    print("按 Ctrl+C 停止", flush=True)
+    print("-"*60, flush=True)
+    
+    try:
+        asyncio.run(run_async_monitor(check_interval=300))  # 每5分钟检查一次
+    except KeyboardInterrupt:
+        print("\n监控系统已停止", flush=True)
+
+
+if __name__ == '__main__':
+    main()
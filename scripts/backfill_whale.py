@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+可断点续传的 Whale Alert 历史数据回填（支持多币种并发）
+用法: python scripts/backfill_whale.py --currency btc,eth,xrp --days 30 [--range 开始:结束 ...] [--workers N]
+                                      [--min-value 500000] [--restart] [--status] [--output 文件.csv]
+
+每获取一页就写入 WHALE_BACKFILL_DIR 并记录断点，中断后再次运行同样的命令即可从断点继续；
+完成后追加到按币种和日期分区的交易列式存储（WHALE_DATASET_DIR，Parquet）。
+"""
+import argparse
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from config import settings
+from src.data_collectors.whale_backfill import STATUS_DONE, BackfillOrchestrator
+from src.storage.rate_limiter import get_rate_limiter
+from src.storage.transaction_store import TransactionStore
+
+
+def parse_range(value: str) -> tuple:
+    """解析 '2024-01-01:2024-01-10' 形式的时间范围"""
+    start, _, end = value.partition(':')
+    if not start or not end:
+        raise ValueError(f"时间范围格式应为 开始:结束，实际为 {value}")
+    return datetime.fromisoformat(start), datetime.fromisoformat(end)
+
+
+def main():
+    default_currencies = ','.join(settings.SYMBOLS) if settings.SYMBOLS else 'btc'
+    parser = argparse.ArgumentParser(description="可断点续传的 Whale Alert 历史数据回填")
+    parser.add_argument('--currency', default=default_currencies,
+                        help=f"币种，逗号分隔（默认读取 SYMBOLS，当前 {default_currencies}）")
+    parser.add_argument('--days', type=float, default=30, help="回填最近多少天（未指定 --range 时使用，最多 30，默认 30）")
+    parser.add_argument('--range', action='append', dest='ranges', metavar='开始:结束',
+                        help="时间范围，如 2024-01-01:2024-01-10（可重复指定，每个币种都回填所有范围）")
+    parser.add_argument('--min-value', type=int, default=int(settings.WHALE_ALERT_MIN_VALUE_USD),
+                        help="最小转账金额（美元，默认读取 WHALE_ALERT_MIN_VALUE_USD）")
+    parser.add_argument('--workers', type=int, help="同时执行的任务数（默认读取 WHALE_BACKFILL_WORKERS）")
+    parser.add_argument('--restart', action='store_true', help="丢弃已有的断点和数据，重新开始")
+    parser.add_argument('--status', action='store_true', help="只显示断点状态，不请求 API")
+    parser.add_argument('--output', help="把合并后的交易保存为 CSV 文件（可选）")
+    args = parser.parse_args()
+
+    currencies = [c.strip().lower() for c in args.currency.split(',') if c.strip()]
+    try:
+        if args.ranges:
+            ranges = [parse_range(r) for r in args.ranges]
+        else:
+            end = datetime.now()
+            ranges = [(end - timedelta(days=args.days), end)]
+    except ValueError as e:
+        print(f"❌ 错误: 时间范围不正确: {e}")
+        sys.exit(1)
+    jobs = [(currency, start, end) for currency in currencies for start, end in ranges]
+
+    orchestrator = BackfillOrchestrator(min_value=args.min_value, workers=args.workers)
+    print("=" * 60)
+    print(f"Whale Alert 回填: {', '.join(c.upper() for c in currencies)} | 时间范围 {len(ranges)} 个 | "
+          f"最小金额 ${args.min_value:,}")
+    print(f"任务: {len(jobs)} 个 | 并发 {min(orchestrator.workers, len(jobs))} | 目录 {orchestrator.root}")
+    print("=" * 60)
+
+    def fmt(ts):
+        return datetime.fromtimestamp(ts).strftime('%Y-%m-%d %H:%M:%S') if ts else '-'
+
+    if args.status:
+        try:
+            for job in jobs:
+                backfill = orchestrator._backfill_for(jobs, job)
+                checkpoint = backfill.checkpoint(job[0], args.min_value)
+                if not checkpoint:
+                    print(f"{job[0].upper()}: 没有断点")
+                    continue
+                print(f"{job[0].upper()}: {fmt(checkpoint['start'])} ~ {fmt(checkpoint['end'])} | "
+                      f"{'已完成' if checkpoint['status'] == STATUS_DONE else checkpoint['status']} | "
+                      f"{checkpoint['pages']} 页 / {checkpoint['transactions']} 条交易 | "
+                      f"最后交易时间 {fmt(checkpoint['last_timestamp'])}"
+                      + (f" | {checkpoint['error']}" if checkpoint.get('error') else ""))
+        except ValueError as e:
+            print(f"❌ 错误: {e}")
+            sys.exit(1)
+        print("=" * 60)
+        return
+
+    try:
+        reports = orchestrator.run(jobs, restart=args.restart)
+    except ValueError as e:
+        print(f"❌ 错误: {e}")
+        sys.exit(1)
+    except KeyboardInterrupt:
+        print("\n已中断，再次运行将从断点继续")
+        sys.exit(1)
+
+    print("-" * 60)
+    print(f"{'币种':<8}{'状态':<10}{'页数':>6}{'交易':>10}{'耗时(秒)':>10}{'条/秒':>10}{'累计':>10}")
+    for report in reports:
+        status = '已完成' if report['status'] == STATUS_DONE else report['status']
+        print(f"{report['currency'].upper():<8}{status:<10}{report['pages']:>6}{report['transactions']:>10}"
+              f"{report['elapsed_s']:>10}{report['tx_per_s']:>10}{report['total_transactions']:>10}")
+    fetched = sum(r['transactions'] for r in reports)
+    print(f"总计: {fetched} 条交易 / {orchestrator.elapsed_s} 秒"
+          + (f" ({fetched / orchestrator.elapsed_s:.1f} 条/秒)" if orchestrator.elapsed_s else ""))
+    limiter = get_rate_limiter().stats()
+    if limiter.get('whale_alert_acquired'):
+        print(f"限流器({limiter['backend']}): 请求 {limiter['whale_alert_acquired']} 次 | "
+              f"等待 {limiter.get('whale_alert_waits', 0)} 次 / {limiter.get('whale_alert_wait_s', 0)} 秒")
+
+    store = TransactionStore()
+    rows = orchestrator.merge(jobs, store=store)
+    for currency in rows:
+        store.compact(currency)  # 每个日期分区合并为一个文件
+    print(f"交易存储: {store.root} | 新增 " + ', '.join(f"{c.upper()} {n} 条" for c, n in rows.items()))
+
+    if args.output:
+        df = store.scan(currencies)
+        df.to_csv(args.output, index=False)
+        print(f"数据已保存到: {args.output}（{len(df)} 条）")
+    print("=" * 60)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+地址索引基准：千万级交易所地址的构建、加载、整列分类和单个地址查找
+用法: python scripts/bench_address_index.py [--addresses N] [--rows R] [--lookups L]
+
+生成合成的已标注地址（EVM 和比特币格式混合），构建 AddressIndex，报告：
+- 构建 / 保存 / 加载耗时和内存占用（与 Python 字典对比，字典内存按 100 万个地址的实测值估算）
+- 整个 DataFrame 的方向分类（classify_frame）与逐行查字典的耗时
+- WebSocket 路径单个地址查找的平均延迟
+"""
+import argparse
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.storage.address_index import (
+    AddressIndex, DIRECTION_IN, DIRECTION_INTERNAL, DIRECTION_OUT, DIRECTION_UNKNOWN
+)
+
+ENTITIES = ['Binance', 'Coinbase', 'Kraken', 'OKX', 'Bitfinex', 'Huobi', 'Bybit', 'KuCoin',
+            'Gemini', 'Bitstamp', 'Upbit', 'Gate.io', 'Crypto.com', 'Bithumb', 'MEXC', 'HTX']
+
+
+def synthetic_addresses(count: int, seed: int = 42) -> list:
+    """生成合成地址（3/4 为 EVM 地址，1/4 为比特币地址）"""
+    rnd = random.Random(seed)
+    return [f'0x{rnd.getrandbits(160):040x}' if i % 4 else f'bc1q{rnd.getrandbits(160):040x}'
+            for i in range(count)]
+
+
+def dict_megabytes(addresses: list, entities: list) -> float:
+    """Python 字典 {地址: 实体} 的内存（MB，包括地址字符串本身）"""
+    tracemalloc.start()
+    labels = {a: e for a, e in zip(addresses, entities)}
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del labels
+    return (size + sum(sys.getsizeof(a) for a in addresses)) / 1024 / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description="地址索引基准")
+    parser.add_argument('--addresses', type=int, default=10_000_000, help="已标注地址数量（默认 10000000）")
+    parser.add_argument('--rows', type=int, default=1_000_000, help="分类的交易行数（默认 1000000）")
+    parser.add_argument('--lookups', type=int, default=100_000, help="单个地址查找次数（默认 100000）")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print(f"地址: {args.addresses} 个 / {len(ENTITIES)} 个实体 | 交易: {args.rows} 行")
+    print("=" * 60)
+
+    t0 = time.perf_counter()
+    addresses = synthetic_addresses(args.addresses)
+    rnd = np.random.default_rng(42)
+    entities = np.array(ENTITIES, dtype=object)[rnd.integers(0, len(ENTITIES), args.addresses)]
+    print(f"生成地址: {time.perf_counter() - t0:.1f}s")
+
+    t0 = time.perf_counter()
+    index = AddressIndex.from_labels(addresses, entities)
+    build_time = time.perf_counter() - t0
+    sample = min(args.addresses, 1_000_000)
+    dict_mb = dict_megabytes(addresses[:sample], entities[:sample].tolist()) * args.addresses / sample
+    print(f"构建: {build_time:.1f}s | 索引 {index.nbytes / 1024 / 1024:.0f}MB | "
+          f"Python 字典约 {dict_mb:.0f}MB ({dict_mb / (index.nbytes / 1024 / 1024):.1f}x)")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / 'address_labels.npz'
+        t0 = time.perf_counter()
+        index.save(path)
+        save_time = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        index = AddressIndex.load(path)
+        load_time = time.perf_counter() - t0
+        print(f"保存: {save_time:.2f}s | 加载: {load_time:.2f}s ({path.stat().st_size / 1024 / 1024:.0f}MB)")
+    print("-" * 60)
+
+    # 交易：一半的发送方 / 接收方是已标注地址，其余是未标注的新地址（EVM 地址大小写混合）
+    labels = dict(zip(addresses[:sample], entities[:sample]))
+    labelled = [addresses[i] for i in rnd.integers(0, sample, args.rows)]
+    unlabelled = synthetic_addresses(args.rows, seed=7)
+    pick = rnd.random((2, args.rows)) < 0.5
+    df = pd.DataFrame({
+        'from_address': np.where(pick[0], labelled, unlabelled),
+        'to_address': np.where(pick[1], labelled[::-1], unlabelled[::-1]),
+    })
+    df['from_address'] = df['from_address'].where(~df['from_address'].str.startswith('0x'),
+                                                  '0x' + df['from_address'].str[2:].str.upper())
+
+    def is_labelled(address: str) -> bool:
+        return (address.lower() if address.startswith('0x') else address) in labels
+
+    def classify_dict():
+        directions = []
+        for f, t in zip(df['from_address'], df['to_address']):
+            from_exchange, to_exchange = is_labelled(f), is_labelled(t)
+            if from_exchange and to_exchange:
+                directions.append(DIRECTION_INTERNAL)
+            elif to_exchange:
+                directions.append(DIRECTION_IN)
+            elif from_exchange:
+                directions.append(DIRECTION_OUT)
+            else:
+                directions.append(DIRECTION_UNKNOWN)
+        return directions
+
+    t0 = time.perf_counter()
+    expected = classify_dict()
+    dict_time = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    directions = index.classify_frame(df)
+    index_time = time.perf_counter() - t0
+    print(f"{'逐行查字典':<20} {dict_time * 1000:>9.1f}ms")
+    print(f"{'classify_frame':<20} {index_time * 1000:>9.1f}ms | {args.rows / index_time / 1e6:.1f}M 行/s | "
+          f"{dict_time / index_time:>5.1f}x")
+    counts = pd.Series(directions).value_counts()
+    print("方向: " + ', '.join(f"{k} {v}" for k, v in counts.items()))
+    print(f"结果一致: {'是' if list(directions) == expected else '否'}")
+    print("-" * 60)
+
+    queries = [labelled[i] if i % 2 else unlabelled[i] for i in range(min(args.lookups, args.rows))]
+    t0 = time.perf_counter()
+    found = sum(index.is_exchange(a) for a in queries)
+    single_time = time.perf_counter() - t0
+    print(f"单个地址查找: {single_time / len(queries) * 1e6:.1f}µs/次 | 命中 {found}/{len(queries)}")
+    print("=" * 60)
+
+
+if __name__ == '__main__':
+    main()
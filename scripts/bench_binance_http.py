@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Binance HTTP 调用延迟基准：每次新建连接（requests.get） vs 共享连接池（BinanceCollector）
+用法: python scripts/bench_binance_http.py [--count N] [--handshake-ms MS] [--url 真实端点]
+
+默认在本地启动一个 HTTP/1.1 keep-alive 替身服务（/ticker/price），
+--handshake-ms 在每个新连接上模拟 TCP + TLS 握手的往返耗时（到 api.binance.com 通常为 50-200ms）。
+指定 --url（如 https://api.binance.com/api/v3）时直接测试真实端点。
+"""
+import argparse
+import json
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlparse, parse_qs
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import requests
+
+from src.data_collectors.binance import BinanceCollector, create_session
+
+
+class TickerHandler(BaseHTTPRequestHandler):
+    """模拟 /ticker/price 的请求处理器（支持 keep-alive）"""
+
+    protocol_version = 'HTTP/1.1'
+    handshake_delay = 0.0
+    connections = 0
+
+    def setup(self):
+        super().setup()
+        # 每个新连接模拟一次握手往返
+        TickerHandler.connections += 1
+        if self.handshake_delay:
+            time.sleep(self.handshake_delay)
+
+    def do_GET(self):
+        query = parse_qs(urlparse(self.path).query)
+        if 'symbols' in query:
+            body = [{"symbol": s, "price": "100.00"} for s in json.loads(query['symbols'][0])]
+        else:
+            body = {"symbol": query.get('symbol', ['BTCUSDT'])[0], "price": "100.00"}
+        data = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+def measure(call, count: int) -> list:
+    """执行 count 次调用，返回每次的耗时（毫秒）"""
+    samples = []
+    for _ in range(count):
+        t0 = time.perf_counter()
+        call()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return samples
+
+
+def report(name: str, samples: list):
+    """打印延迟统计"""
+    ordered = sorted(samples)
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    print(f"{name:<28} 平均 {statistics.mean(samples):>8.2f}ms | "
+          f"p50 {statistics.median(samples):>8.2f}ms | p99 {p99:>8.2f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Binance HTTP 调用延迟基准")
+    parser.add_argument('--count', type=int, default=200, help="每种方式的调用次数")
+    parser.add_argument('--handshake-ms', type=float, default=50,
+                        help="本地替身在每个新连接上模拟的握手耗时（毫秒）")
+    parser.add_argument('--url', help="直接测试的 Binance API 端点（默认使用本地替身）")
+    args = parser.parse_args()
+
+    server = None
+    if args.url:
+        base_url = args.url.rstrip('/')
+    else:
+        TickerHandler.handshake_delay = args.handshake_ms / 1000
+        server = ThreadingHTTPServer(('127.0.0.1', 0), TickerHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = f"http://127.0.0.1:{server.server_address[1]}/api/v3"
+
+    print("=" * 60)
+    print(f"端点: {base_url} | 调用次数: {args.count}" +
+          ("" if args.url else f" | 模拟握手: {args.handshake_ms:g}ms"))
+    print("=" * 60)
+
+    try:
+        # 改造前：模块级 requests.get，每次调用都新建连接
+        def unpooled():
+            response = requests.get(f'{base_url}/ticker/price', params={'symbol': 'BTCUSDT'}, timeout=10)
+            response.raise_for_status()
+            return float(response.json()['price'])
+
+        collector = BinanceCollector(session=create_session())
+        collector.base_url = base_url
+        collector.price_cache = None  # 只测连接池，每次调用都发请求
+        collector.symbol_resolver = None  # 替身服务没有 exchangeInfo
+        collector.rate_limiter = None  # 只测连接池，不经过限流器
+
+        report("requests.get（无连接池）", measure(unpooled, args.count))
+        connections_before = TickerHandler.connections
+        report("BinanceCollector（连接池）", measure(lambda: collector.get_current_price('btc'), args.count))
+        if server:
+            print(f"连接池新建连接数: {TickerHandler.connections - connections_before}")
+    finally:
+        if server:
+            server.shutdown()
+    print("=" * 60)
+
+
+if __name__ == '__main__':
+    main()
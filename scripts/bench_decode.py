@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+警报解码微基准：对比各 JSON 解码器以及解码 + 构建事件数据的单帧耗时
+用法: python scripts/bench_decode.py [--frames 帧日志文件] [--count N] [--repeat R]
+
+不指定 --frames 时使用合成的 AlertJSON（约 5% 为多币种交易）。
+"旧路径" 复现改造前 handle_alert 的做法：json.loads 后对字典做 dict.get 链式查找，
+并为每个币种单独调用 str() / isoformat() 构建事件数据。
+"""
+import argparse
+import hashlib
+import json
+import random
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.websocket.alert import Alert, build_alert_observations, get_event_id, parse_amounts
+from src.websocket.codec import DECODERS, load_decoder
+from src.websocket.frame_log import iter_frames
+
+PRICES = {'btc': 60000.0, 'eth': 3000.0, 'sol': 150.0, 'xrp': 0.5, 'usdt': 1.0}
+
+
+def synthetic_frames(count: int, seed: int = 42) -> list:
+    """生成合成的 AlertJSON 帧"""
+    rnd = random.Random(seed)
+    frames = []
+    now = int(time.time())
+    for i in range(count):
+        symbols = rnd.sample(list(PRICES), 2 if rnd.random() < 0.05 else 1)
+        amounts = []
+        for symbol in symbols:
+            value_usd = rnd.lognormvariate(14.5, 1.0)
+            amounts.append({"symbol": symbol.upper(), "amount": value_usd / PRICES[symbol],
+                            "value_usd": value_usd})
+        tx_hash = hashlib.sha256(str(i).encode()).hexdigest()
+        frames.append(json.dumps({
+            "channel_id": "bench",
+            "timestamp": now - i,
+            "blockchain": "ethereum",
+            "transaction_type": "transfer",
+            "from": "Binance",
+            "to": "unknown wallet",
+            "amounts": amounts,
+            "text": f"{amounts[0]['amount']:,.0f} #{symbols[0].upper()} transferred from Binance to unknown wallet",
+            "transaction": {"type": "transfer", "blockchain": "ethereum", "hash": tx_hash,
+                            "height": 19000000 + i, "index_in_block": i % 300, "timestamp": now - i},
+        }))
+    return frames
+
+
+def legacy_path(message: str):
+    """改造前的处理路径（仅 CPU 部分）"""
+    alert_data = json.loads(message)
+    event_id = get_event_id(alert_data)
+    assets = parse_amounts(alert_data)
+    items = []
+    for currency, amount, amount_usd in assets:
+        price = PRICES.get(currency)
+        timestamp = alert_data.get('timestamp', 0)
+        if isinstance(timestamp, (int, float)) and timestamp > 0:
+            timestamp = datetime.fromtimestamp(timestamp).isoformat()
+        event_data = {
+            "timestamp": timestamp,
+            "amount": str(amount),
+            "amount_usd": str(amount_usd),
+            "currency": currency,
+            "from_address": alert_data.get('from', ''),
+            "to_address": alert_data.get('to', ''),
+            "blockchain": alert_data.get('blockchain', ''),
+            "transaction_type": alert_data.get('transaction_type', ''),
+            "channel_id": alert_data.get('channel_id', ''),
+            "text": alert_data.get('text', ''),
+            "baseline_price": str(price),
+            "baseline_time": datetime.now().isoformat(),
+            "status": "observing"
+        }
+        items.append((event_id, {k: str(v) for k, v in event_data.items()}, price))
+    return items
+
+
+def time_per_frame(func, frames: list, repeat: int) -> float:
+    """取 repeat 轮中最快一轮的单帧耗时（微秒）"""
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for message in frames:
+            func(message)
+        best = min(best, time.perf_counter() - t0)
+    return best / len(frames) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="警报解码微基准")
+    parser.add_argument('--frames', help="帧日志文件（WS_RECORD_PATH 录制），默认使用合成数据")
+    parser.add_argument('--count', type=int, default=20000, help="合成帧数量")
+    parser.add_argument('--repeat', type=int, default=5, help="重复轮数（取最快一轮）")
+    args = parser.parse_args()
+
+    if args.frames:
+        frames = [m for _, m in iter_frames(args.frames) if '"transaction"' in m or '"channel_id"' in m]
+        source = args.frames
+    else:
+        frames = synthetic_frames(args.count)
+        source = "合成数据"
+    if not frames:
+        print("❌ 没有可用的警报帧")
+        sys.exit(1)
+
+    avg_size = sum(len(m) for m in frames) / len(frames)
+    print("=" * 60)
+    print(f"数据: {source} | 帧数: {len(frames)} | 平均大小: {avg_size:.0f} 字节")
+    print("=" * 60)
+
+    baseline = time_per_frame(legacy_path, frames, args.repeat)
+    print(f"{'旧路径 (json + dict.get)':<32} {baseline:>8.2f} µs/帧")
+
+    for name in DECODERS:
+        loaded = load_decoder(name)
+        if not loaded:
+            print(f"{name:<32} {'未安装':>8}")
+            continue
+        loads = loaded[0]
+        decode_only = time_per_frame(loads, frames, args.repeat)
+
+        def new_path(message, loads=loads):
+            return build_alert_observations(Alert.from_dict(loads(message)), PRICES)
+
+        full = time_per_frame(new_path, frames, args.repeat)
+        print(f"{name + ' 仅解码':<32} {decode_only:>8.2f} µs/帧")
+        print(f"{name + ' + Alert + 事件数据':<32} {full:>8.2f} µs/帧  ({baseline / full:.2f}x)")
+    print("=" * 60)
+
+
+if __name__ == '__main__':
+    main()
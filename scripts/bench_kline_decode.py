@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+K线解码基准：对比改造前的 JSON → 列表 → DataFrame → pd.to_numeric 路径和直接解码为 NumPy 数组的路径
+用法: python scripts/bench_kline_decode.py [--candles N] [--repeat R]
+
+使用合成的 /klines 响应（格式与 Binance 相同），报告每种路径的耗时和 Python 堆内存峰值（tracemalloc）。
+"""
+import argparse
+import gc
+import json
+import random
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.data_collectors.binance import klines_to_dataframe
+from src.data_collectors.kline_codec import decode_klines, records_to_dataframe
+from src.websocket import codec
+
+
+def synthetic_payload(candles: int, seed: int = 42) -> bytes:
+    """生成合成的 1 分钟K线响应"""
+    rnd = random.Random(seed)
+    open_time = 1_700_000_000_000
+    price = 60000.0
+    rows = []
+    for _ in range(candles):
+        high = price * (1 + rnd.random() * 0.002)
+        low = price * (1 - rnd.random() * 0.002)
+        close = rnd.uniform(low, high)
+        volume = rnd.lognormvariate(2, 1)
+        rows.append(f'[{open_time},"{price:.8f}","{high:.8f}","{low:.8f}","{close:.8f}","{volume:.8f}",'
+                    f'{open_time + 59999},"{volume * close:.8f}",{rnd.randint(100, 5000)},'
+                    f'"{volume / 2:.8f}","{volume * close / 2:.8f}","0"]')
+        open_time += 60000
+        price = close
+    return ('[' + ','.join(rows) + ']').encode()
+
+
+def legacy_path(payload: bytes):
+    """改造前：json 解析为列表，构建字符串列的 DataFrame，再逐列 pd.to_numeric"""
+    return klines_to_dataframe(json.loads(payload))
+
+
+def codec_path(payload: bytes):
+    """只替换 JSON 解码器（orjson 等），其余与改造前相同"""
+    return klines_to_dataframe(codec.loads(payload))
+
+
+def numpy_path(payload: bytes):
+    """直接解码为结构化数组，数值列零拷贝构建 DataFrame"""
+    return records_to_dataframe(decode_klines(payload))
+
+
+def measure(func, payload: bytes, repeat: int) -> tuple:
+    """
+    返回:
+    - (最短耗时秒, 内存峰值 MB, 结果)
+    """
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        gc.collect()
+        t0 = time.perf_counter()
+        result = func(payload)
+        best = min(best, time.perf_counter() - t0)
+    del result
+    gc.collect()
+    tracemalloc.start()
+    result = func(payload)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak / 1024 / 1024, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="K线解码基准")
+    parser.add_argument('--candles', type=int, default=500_000, help="K线数量（默认 500000）")
+    parser.add_argument('--repeat', type=int, default=3, help="每种路径重复次数，取最短耗时")
+    args = parser.parse_args()
+
+    payload = synthetic_payload(args.candles)
+    print("=" * 60)
+    print(f"K线: {args.candles} 根 | 响应大小: {len(payload) / 1024 / 1024:.1f} MB | "
+          f"JSON 解码器: {codec.DECODER_NAME}")
+    print("=" * 60)
+
+    paths = [("改造前 (json + to_numeric)", legacy_path)]
+    if codec.DECODER_NAME != 'json':
+        paths.append((f"{codec.DECODER_NAME} + to_numeric", codec_path))
+    paths.append(("NumPy 直接解码", numpy_path))
+
+    results = {}
+    baseline = None
+    for name, func in paths:
+        elapsed, peak_mb, df = measure(func, payload, args.repeat)
+        results[name] = df
+        baseline = baseline or elapsed
+        print(f"{name:<28} {elapsed * 1000:>9.1f}ms | {args.candles / elapsed:>12,.0f} 根/秒 | "
+              f"内存峰值 {peak_mb:>8.1f}MB | {baseline / elapsed:>5.1f}x")
+
+    # 校验两种路径的结果一致
+    legacy = results[paths[0][0]]
+    fast = results["NumPy 直接解码"]
+    columns = [c for c in fast.columns if c != 'close_time']
+    same = (legacy.index.equals(fast.index)
+            and (legacy[columns].astype('float64').values == fast[columns].astype('float64').values).all())
+    print("-" * 60)
+    print(f"结果一致: {'是' if same else '否'}")
+    print("=" * 60)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+交易存储基准：对比整个 CSV 解析后再过滤和 Parquet 列式存储按分区、按列读取
+用法: python scripts/bench_transaction_store.py [--transactions N] [--days D] [--repeat R]
+
+生成合成的 Whale Alert 交易（格式与 API 相同），分别写入 CSV（collect_whale_data 原来的保存方式）
+和 TransactionStore（临时目录），报告读取最近 30 天的 timestamp / amount_usd 两列的耗时。
+"""
+import argparse
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.data_collectors.whale_alert import WhaleAlertCollector
+from src.storage.transaction_store import TransactionStore
+
+
+def synthetic_transactions(count: int, days: float, seed: int = 42) -> list:
+    """生成合成的原始交易（时间均匀分布在最近 days 天内）"""
+    rnd = random.Random(seed)
+    end = int(time.time())
+    start = end - int(days * 86400)
+    step = (end - start) / count
+    owners = ['binance', 'coinbase', 'kraken', 'okx', None]
+    transactions = []
+    for i in range(count):
+        owner = rnd.choice(owners)
+        transactions.append({
+            'blockchain': 'bitcoin', 'symbol': 'btc', 'transaction_type': 'transfer',
+            'hash': f'{i:064x}', 'timestamp': int(start + i * step),
+            'amount': rnd.lognormvariate(3, 1), 'amount_usd': rnd.lognormvariate(14, 1),
+            'from': {'address': f'bc1q{rnd.getrandbits(120):030x}', 'owner': owner,
+                     'owner_type': 'exchange' if owner else 'unknown'},
+            'to': {'address': f'bc1q{rnd.getrandbits(120):030x}', 'owner_type': 'unknown'},
+        })
+    return transactions
+
+
+def timed(func, repeat: int) -> tuple:
+    """返回 (最短耗时秒, 结果)"""
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="交易存储基准")
+    parser.add_argument('--transactions', type=int, default=1_000_000, help="交易数量（默认 1000000）")
+    parser.add_argument('--days', type=float, default=180, help="交易分布的天数（默认 180）")
+    parser.add_argument('--repeat', type=int, default=3, help="每种读取方式重复次数，取最短耗时")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print(f"交易: {args.transactions} 条 / {args.days:g} 天 | 读取: 最近 30 天的 timestamp, amount_usd")
+    print("=" * 60)
+
+    transactions = synthetic_transactions(args.transactions, args.days)
+    since = datetime.now() - timedelta(days=30)
+    columns = ['timestamp', 'amount_usd']
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = Path(tmp) / 'whale.csv'
+        t0 = time.perf_counter()
+        collector = WhaleAlertCollector(api_key='bench')  # 只用来格式化，不发请求
+        collector._process_transactions_df(pd.DataFrame(transactions)).to_csv(csv_path, index=False)
+        csv_write = time.perf_counter() - t0
+
+        store = TransactionStore(Path(tmp) / 'store')
+        t0 = time.perf_counter()
+        with store.writer('btc') as writer:
+            for i in range(0, len(transactions), 100):  # 与 API 分页相同，每页 100 条
+                writer.append(transactions[i:i + 100])
+        store_write = time.perf_counter() - t0
+        del transactions
+
+        csv_mb = csv_path.stat().st_size / 1024 / 1024
+        store_mb = sum(p['bytes'] for p in store.partitions()) / 1024 / 1024
+        print(f"写入: CSV {csv_write:.2f}s / {csv_mb:.1f}MB | 列式存储 {store_write:.2f}s / {store_mb:.1f}MB "
+              f"({len(store.partitions())} 个分区)")
+        print("-" * 60)
+
+        def read_csv():
+            df = pd.read_csv(csv_path, parse_dates=['timestamp'])
+            return df.loc[df['timestamp'] >= since, columns]
+
+        def read_store():
+            return store.scan(['btc'], start=since, columns=columns)
+
+        csv_time, csv_df = timed(read_csv, args.repeat)
+        store_time, store_df = timed(read_store, args.repeat)
+        print(f"{'CSV 全部解析后过滤':<24} {csv_time * 1000:>9.1f}ms | {len(csv_df)} 条")
+        print(f"{'列式存储（分区 + 列）':<24} {store_time * 1000:>9.1f}ms | {len(store_df)} 条 | "
+              f"{csv_time / store_time:>5.1f}x")
+        print("-" * 60)
+        # CSV 中的浮点数是文本，比较时允许末位误差
+        same = len(csv_df) == len(store_df) and np.allclose(csv_df['amount_usd'].values, store_df['amount_usd'].values)
+        print(f"结果一致: {'是' if same else '否'}")
+    print("=" * 60)
+
+
+if __name__ == '__main__':
+    main()
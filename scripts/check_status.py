@@ -38,6 +38,63 @@ def main():
             print(f"\n✅ 数据充足: 有 {completed_count} 个完成的事件")
             print("可以开始进行 Granger 因果检验分析！")
         
+        # 实时摄取队列指标（由 main_ws.py 定期写入）
+        ingest = manager.redis_client.get_metrics('ingest')
+        if ingest:
+            print("\n" + "=" * 60)
+            print("警报摄取队列")
+            print("=" * 60)
+            print(f"队列深度: {ingest.get('depth', 0)}/{ingest.get('maxsize', 0)} (峰值 {ingest.get('max_depth', 0)})")
+            print(f"已处理: {ingest.get('processed', 0)} | 失败: {ingest.get('failed', 0)} | 丢弃: {ingest.get('dropped', 0)}")
+            print(f"处理延迟: p50={ingest.get('process_p50_ms', 0)}ms, p99={ingest.get('process_p99_ms', 0)}ms")
+            print(f"更新时间: {ingest.get('updated_at', 'N/A')}")
+        
+        # 警报去重指标
+        dedup = manager.redis_client.get_metrics('dedup')
+        if dedup:
+            print(f"去重: 检查 {dedup.get('checked', 0)} | 重复 {dedup.get('duplicates', 0)} "
+                  f"(本地 {dedup.get('local_hits', 0)}, Redis {dedup.get('redis_hits', 0)}) | "
+                  f"命中率 {float(dedup.get('hit_rate', 0)):.1%}")
+        
+        # 行情流价格簿指标
+        price_stream = manager.redis_client.get_metrics('price_stream')
+        if price_stream:
+            stale = {k[4:]: v for k, v in price_stream.items() if k.startswith('age:')}
+            print(f"行情流: {'正常' if price_stream.get('healthy') == 'True' else '过期'} | "
+                  f"交易对 {price_stream.get('symbols', 0)} | 命中率 {float(price_stream.get('hit_rate', 0)):.1%} | "
+                  f"各交易对更新间隔(秒): {stale}")
+        
+        # 价格缓存指标
+        price_cache = manager.redis_client.get_metrics('price_cache')
+        if price_cache:
+            print(f"价格缓存: TTL {price_cache.get('ttl_s', 0)} 秒 | 命中 {price_cache.get('hits', 0)} | "
+                  f"合并 {price_cache.get('coalesced', 0)} | 请求 {price_cache.get('misses', 0)} | "
+                  f"命中率 {float(price_cache.get('hit_rate', 0)):.1%}")
+        
+        # 交易对索引指标
+        symbols = manager.redis_client.get_metrics('symbols')
+        if symbols:
+            print(f"交易对索引: {'已加载' if symbols.get('loaded') == 'True' else '未加载'} | "
+                  f"交易对 {symbols.get('pairs', 0)} | 交叉报价 {symbols.get('cross_routes', 0)} | "
+                  f"无法解析: {symbols.get('unresolved') or '无'}")
+
+        # API 限流（WebSocket 客户端写入的本进程统计）
+        rate_limit = manager.redis_client.get_metrics('rate_limit')
+        if rate_limit:
+            print(f"API 限流: {rate_limit.get('backend', '-')} | "
+                  f"Binance 权重 {rate_limit.get('binance_cost', 0)}，等待 {rate_limit.get('binance_waits', 0)} 次 "
+                  f"{rate_limit.get('binance_wait_s', 0)} 秒 | 暂停 {rate_limit.get('binance_penalties', 0)} 次")
+        
+        # 最近的断线记录（由重连监督器写入）
+        outages = manager.redis_client.get_outages(limit=5)
+        if outages:
+            print("\n" + "=" * 60)
+            print("最近断线记录（前5个）")
+            print("=" * 60)
+            for outage in outages:
+                print(f"{outage.get('started_at', 'N/A')} | 持续 {outage.get('duration_s', 0)} 秒 | "
+                      f"原因: {outage.get('reason', 'N/A')} | 补发警报: {outage.get('replayed', 0)}")
+        
         # 查看最近完成的结果
         print("\n" + "=" * 60)
         print("最近完成的结果（前5个）")
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+并发下载 Binance K线
+用法: python scripts/download_klines.py --symbol BTCUSDT --interval 1m --days 365 [--output 文件.csv] [--store]
+"""
+import argparse
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.data_collectors.binance import BinanceCollector
+from src.data_collectors.kline_codec import records_to_dataframe
+from src.data_collectors.kline_downloader import KlineDownloader, INTERVAL_MS
+from src.storage.kline_store import KlineStore
+from src.storage.rate_limiter import PRIORITY_BACKFILL
+
+
+def main():
+    parser = argparse.ArgumentParser(description="并发下载 Binance K线")
+    parser.add_argument('--symbol', default='BTCUSDT', help="交易对（默认 BTCUSDT）")
+    parser.add_argument('--interval', default='1m', choices=list(INTERVAL_MS), help="K线间隔（默认 1m）")
+    parser.add_argument('--days', type=float, default=30, help="下载最近多少天（未指定 --start 时使用，默认 30）")
+    parser.add_argument('--start', help="开始日期，如 2024-01-01")
+    parser.add_argument('--end', help="结束日期（默认当前时间）")
+    parser.add_argument('--concurrency', type=int, help="并发请求数（默认读取 BINANCE_KLINE_CONCURRENCY）")
+    parser.add_argument('--output', help="保存为 CSV 文件（可选）")
+    parser.add_argument('--store', action='store_true',
+                        help="写入本地K线存储（KLINE_CACHE_DIR），只下载存储中缺失的时间段")
+    args = parser.parse_args()
+
+    try:
+        end = datetime.fromisoformat(args.end) if args.end else datetime.now()
+        start = datetime.fromisoformat(args.start) if args.start else end - timedelta(days=args.days)
+    except ValueError as e:
+        print(f"❌ 错误: 日期格式不正确: {e}")
+        sys.exit(1)
+
+    downloader = KlineDownloader(BinanceCollector(priority=PRIORITY_BACKFILL), concurrency=args.concurrency)
+    print("=" * 60)
+    print(f"下载 {args.symbol} {args.interval} K线: {start} ~ {end} | 并发 {downloader.concurrency}")
+    print("=" * 60)
+
+    if args.store:
+        store = KlineStore(downloader=downloader)
+        missing = store.missing_ranges(args.symbol, args.interval,
+                                       int(start.timestamp() * 1000), int(end.timestamp() * 1000))
+        print(f"存储中缺失的时间段: {len(missing)} 个")
+        try:
+            records = store.get(args.symbol, args.interval, start, end)
+        except Exception as e:
+            print(f"❌ 错误: {e}")
+            sys.exit(1)
+        print(f"存储中该时间段的K线: {len(records)} 根")
+        if downloader.last_report and missing:
+            report = downloader.last_report
+            print(f"最后一个缺失时间段: {report['candles']} 根 / {report['elapsed_s']} 秒 "
+                  f"({report['candles_per_s']} 根/秒)")
+        print("=" * 60)
+        return
+
+    try:
+        klines = downloader.download(args.symbol, args.interval, start, end)
+    except Exception as e:
+        print(f"❌ 错误: {e}")
+        sys.exit(1)
+
+    report = downloader.last_report
+    print(f"窗口: {report['windows']} (失败 {report['failed_windows']})")
+    print(f"K线: {report['candles']} 根")
+    print(f"耗时: {report['elapsed_s']} 秒 | 吞吐量: {report['candles_per_s']} 根/秒")
+    print(f"最高每分钟请求权重: {report['max_used_weight']} | 权重等待: {report['weight_wait_s']} 秒")
+
+    if args.output and len(klines):
+        records_to_dataframe(klines).to_csv(args.output, index=True)
+        print(f"数据已保存到: {args.output}")
+    print("=" * 60)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+"""
+本地 Whale Alert WebSocket 模拟服务器（压测和重连测试用，不访问真实 API）
+用法: python scripts/mock_ws_server.py [--rate N] [--schedule 429,4001@30,1006@60]
+
+实现 subscribe_alerts / subscribed_alerts 协议，按配置的速率和金额分布推送合成的 AlertJSON。
+把 WHALE_ALERT_WS_URL 指向本服务即可压测完整的 main_ws.py 流程：
+
+    WHALE_ALERT_WS_URL=ws://127.0.0.1:8765/ws python main_ws.py
+
+--schedule 按连接顺序指定每次连接的行为（用完后恢复正常），逗号分隔：
+- ok: 正常连接
+- 429: 握手阶段返回 HTTP 429 Too Many Requests
+- 4001@N: N 秒后以关闭代码 4001（认证失败）关闭连接
+- 1006@N: N 秒后直接断开 TCP（客户端看到 1006 异常关闭）
+
+使用相同订阅ID重新订阅时，会补发断线期间（按 --rate 计算）错过的警报，时间戳落在断线区间内。
+
+同一端口还提供 Binance 全市场 mini-ticker 替身流（路径包含 miniTicker，每秒推送一次随机游走的价格）：
+
+    BINANCE_STREAM_ENABLED=true BINANCE_STREAM_URL=ws://127.0.0.1:8765/ws/!miniTicker@arr python main_ws.py
+"""
+import argparse
+import asyncio
+import hashlib
+import itertools
+import json
+import math
+import random
+import sys
+import time
+from http import HTTPStatus
+from typing import List, Optional, Tuple
+
+import websockets
+
+try:
+    from websockets.asyncio.server import serve  # websockets >= 13 的新实现
+    LEGACY_API = False
+except ImportError:
+    from websockets import serve
+    LEGACY_API = True
+
+# 合成警报使用的币种：(符号, 区块链, 参考价格)
+ASSETS = {
+    'btc': ('bitcoin', 60000.0),
+    'eth': ('ethereum', 3000.0),
+    'sol': ('solana', 150.0),
+    'xrp': ('ripple', 0.5),
+    'bnb': ('binance', 550.0),
+    'usdt': ('ethereum', 1.0),
+    'usdc': ('ethereum', 1.0),
+}
+OWNERS = ['Binance', 'Coinbase', 'Kraken', 'OKX', 'Bitfinex', 'unknown', 'unknown', 'unknown']
+TX_TYPES = ['transfer', 'transfer', 'transfer', 'mint', 'burn']
+
+
+def parse_schedule(spec: str) -> List[Tuple[str, float]]:
+    """
+    解析连接行为计划
+
+    参数:
+    - spec: 如 "429,ok,4001@30,1006@60"
+
+    返回:
+    - [(行为, 秒数), ...]
+    """
+    schedule = []
+    for item in filter(None, (s.strip() for s in spec.split(','))):
+        action, _, after = item.partition('@')
+        if action not in ('ok', '429', '4001', '1006'):
+            raise ValueError(f"未知的连接行为: {item}")
+        schedule.append((action, float(after) if after else 0.0))
+    return schedule
+
+
+class AlertGenerator:
+    """合成 AlertJSON 生成器"""
+
+    def __init__(self, symbols: List[str], median_usd: float, sigma: float,
+                 multi_asset_ratio: float, seed: Optional[int] = None):
+        """
+        初始化生成器
+
+        参数:
+        - symbols: 使用的币种
+        - median_usd: 单笔金额中位数（美元），金额服从对数正态分布
+        - sigma: 对数正态分布的 sigma，越大尾部越长
+        - multi_asset_ratio: 多币种交易的比例
+        - seed: 随机种子
+        """
+        self.symbols = [s for s in symbols if s in ASSETS] or list(ASSETS)
+        self.mu = math.log(median_usd)
+        self.sigma = sigma
+        self.multi_asset_ratio = multi_asset_ratio
+        self.random = random.Random(seed)
+        self.counter = itertools.count()
+
+    def make_alert(self, channel_id: str, min_value_usd: float,
+                   timestamp: Optional[float] = None) -> dict:
+        """
+        生成一条警报
+
+        参数:
+        - channel_id: 订阅ID
+        - min_value_usd: 订阅的最小金额
+        - timestamp: 交易时间（epoch 秒），默认当前时间
+
+        返回:
+        - AlertJSON 字典
+        """
+        rnd = self.random
+        timestamp = int(timestamp or time.time())
+        count = 2 if rnd.random() < self.multi_asset_ratio and len(self.symbols) > 1 else 1
+        symbols = rnd.sample(self.symbols, count)
+        blockchain = ASSETS[symbols[0]][0]
+
+        amounts = []
+        for symbol in symbols:
+            value_usd = max(min_value_usd, rnd.lognormvariate(self.mu, self.sigma))
+            price = ASSETS[symbol][1] * (1 + rnd.uniform(-0.01, 0.01))
+            amounts.append({
+                "symbol": symbol.upper(),
+                "amount": round(value_usd / price, 6),
+                "value_usd": round(value_usd, 2),
+            })
+
+        seq = next(self.counter)
+        tx_hash = hashlib.sha256(f"{seq}:{timestamp}:{rnd.random()}".encode()).hexdigest()
+        from_owner, to_owner = rnd.choice(OWNERS), rnd.choice(OWNERS)
+        tx_type = rnd.choice(TX_TYPES)
+        first = amounts[0]
+        return {
+            "channel_id": channel_id,
+            "timestamp": timestamp,
+            "blockchain": blockchain,
+            "transaction_type": tx_type,
+            "from": from_owner,
+            "to": to_owner,
+            "amounts": amounts,
+            "text": f"{first['amount']:,.0f} #{first['symbol']} (${first['value_usd']:,.0f}) "
+                    f"{tx_type} from {from_owner} to {to_owner}",
+            "transaction": {
+                "type": tx_type,
+                "blockchain": blockchain,
+                "hash": tx_hash,
+                "height": 800000 + seq,
+                "index_in_block": seq % 500,
+                "timestamp": timestamp,
+            },
+        }
+
+
+class MockWhaleAlertServer:
+    """模拟的 Whale Alert WebSocket 服务器"""
+
+    def __init__(self, generator: AlertGenerator, rate: float,
+                 schedule: List[Tuple[str, float]], replay_max: int = 500,
+                 ticker_interval: float = 1.0):
+        """
+        初始化服务器
+
+        参数:
+        - generator: 警报生成器
+        - rate: 每个连接每秒推送的警报数（泊松到达）
+        - schedule: 按连接顺序的行为计划
+        - replay_max: 重新订阅时最多补发的警报数
+        - ticker_interval: mini-ticker 替身流的推送间隔（秒）
+        """
+        self.generator = generator
+        self.rate = rate
+        self.schedule = list(schedule)
+        self.replay_max = replay_max
+        self.ticker_interval = ticker_interval
+        self.ticker_prices = {f"{s.upper()}USDT": price for s, (_, price) in ASSETS.items() if price != 1.0}
+        self.connections = 0
+        self.sent = 0
+        self.disconnected_at = {}  # 订阅ID -> 断线时间
+
+    def next_action(self) -> Tuple[str, float]:
+        """取出下一次连接的行为"""
+        self.connections += 1
+        if self.connections <= len(self.schedule):
+            return self.schedule[self.connections - 1]
+        return 'ok', 0.0
+
+    def _reject_429(self, connection):
+        """握手阶段返回 429（兼容 websockets 新旧两套服务器 API）"""
+        body = "Too Many Requests\n"
+        if LEGACY_API:
+            return HTTPStatus.TOO_MANY_REQUESTS, [], body.encode()
+        return connection.respond(HTTPStatus.TOO_MANY_REQUESTS, body)
+
+    @staticmethod
+    def _path(websocket) -> str:
+        """连接的请求路径（兼容 websockets 新旧两套服务器 API）"""
+        return websocket.path if LEGACY_API else websocket.request.path
+
+    async def process_request(self, *args):
+        """握手前回调：按计划拒绝连接，其余连接记录本次行为（mini-ticker 流不受计划影响）"""
+        path = args[0] if LEGACY_API else args[1].path
+        if 'miniTicker' in path:
+            return None
+        action, after = self.next_action()
+        self._pending_action = (action, after)
+        if action == '429':
+            print(f"[连接 #{self.connections}] 返回 HTTP 429", flush=True)
+            return self._reject_429(args[0])
+        return None
+
+    async def stream_tickers(self, websocket):
+        """Binance !miniTicker@arr 替身：按间隔推送所有交易对的随机游走价格"""
+        print("[mini-ticker] 已连接", flush=True)
+        try:
+            while True:
+                now_ms = int(time.time() * 1000)
+                tickers = []
+                for symbol, price in self.ticker_prices.items():
+                    price *= 1 + random.gauss(0, 0.0005)
+                    self.ticker_prices[symbol] = price
+                    tickers.append({"e": "24hrMiniTicker", "E": now_ms, "s": symbol,
+                                    "c": f"{price:.8f}", "o": f"{price:.8f}", "h": f"{price:.8f}",
+                                    "l": f"{price:.8f}", "v": "0", "q": "0"})
+                await websocket.send(json.dumps(tickers))
+                await asyncio.sleep(self.ticker_interval)
+        except websockets.ConnectionClosed:
+            print("[mini-ticker] 已断开", flush=True)
+
+    async def handler(self, websocket, *args):
+        """单个连接的处理流程：等待订阅 → 补发 → 按速率推送"""
+        if 'miniTicker' in self._path(websocket):
+            await self.stream_tickers(websocket)
+            return
+        conn_no = self.connections
+        action, after = getattr(self, '_pending_action', ('ok', 0.0))
+        print(f"[连接 #{conn_no}] 已连接，行为={action}" + (f"@{after:g}s" if after else ''), flush=True)
+
+        try:
+            subscription = json.loads(await websocket.recv())
+        except (json.JSONDecodeError, websockets.ConnectionClosed):
+            return
+        if subscription.get('type') != 'subscribe_alerts' or 'min_value_usd' not in subscription:
+            await websocket.send(json.dumps({"error": "invalid subscription: min_value_usd is required"}))
+            await websocket.close(4003, 'Invalid subscription')
+            return
+
+        channel_id = subscription.get('id') or hashlib.md5(str(time.time()).encode()).hexdigest()[:16]
+        min_value_usd = float(subscription['min_value_usd'])
+        await websocket.send(json.dumps({
+            "type": "subscribed_alerts",
+            "id": channel_id,
+            "blockchains": subscription.get('blockchains', []),
+            "symbols": subscription.get('symbols', []),
+            "tx_types": subscription.get('tx_types', []),
+            "min_value_usd": min_value_usd,
+        }))
+
+        stream = asyncio.ensure_future(self._stream(websocket, channel_id, min_value_usd))
+        try:
+            if action in ('4001', '1006'):
+                done, _ = await asyncio.wait([stream], timeout=after)
+                if not done:
+                    if action == '4001':
+                        print(f"[连接 #{conn_no}] 关闭连接 (4001)", flush=True)
+                        await websocket.close(4001, 'Unauthorized')
+                    else:
+                        print(f"[连接 #{conn_no}] 直接断开 TCP (1006)", flush=True)
+                        websocket.transport.abort()
+            else:
+                await stream
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            stream.cancel()
+            self.disconnected_at[channel_id] = time.time()
+            print(f"[连接 #{conn_no}] 已断开，累计推送 {self.sent} 条警报", flush=True)
+
+    async def _stream(self, websocket, channel_id: str, min_value_usd: float):
+        """补发断线期间的警报，然后按泊松到达持续推送"""
+        gap_start = self.disconnected_at.pop(channel_id, None)
+        if gap_start is not None and self.rate > 0:
+            now = time.time()
+            missed = min(self.replay_max, int((now - gap_start) * self.rate))
+            if missed:
+                print(f"订阅 {channel_id} 重新连接，补发 {missed} 条警报", flush=True)
+            for i in range(missed):
+                ts = gap_start + (now - gap_start) * (i + 1) / (missed + 1)
+                await websocket.send(json.dumps(self.generator.make_alert(channel_id, min_value_usd, ts)))
+                self.sent += 1
+
+        while True:
+            if self.rate > 0:
+                await asyncio.sleep(random.expovariate(self.rate))
+            else:
+                await asyncio.sleep(3600)
+                continue
+            await websocket.send(json.dumps(self.generator.make_alert(channel_id, min_value_usd)))
+            self.sent += 1
+
+
+async def serve_forever(args):
+    """启动服务器并持续运行"""
+    generator = AlertGenerator(
+        symbols=[s.strip().lower() for s in args.symbols.split(',') if s.strip()],
+        median_usd=args.median_usd,
+        sigma=args.sigma,
+        multi_asset_ratio=args.multi_asset_ratio,
+        seed=args.seed
+    )
+    server = MockWhaleAlertServer(generator, args.rate, parse_schedule(args.schedule),
+                                  replay_max=args.replay_max, ticker_interval=args.ticker_interval)
+    async with serve(server.handler, args.host, args.port,
+                     process_request=server.process_request):
+        print("=" * 60, flush=True)
+        print(f"模拟 Whale Alert WebSocket: ws://{args.host}:{args.port}/ws", flush=True)
+        print(f"模拟 Binance mini-ticker: ws://{args.host}:{args.port}/ws/!miniTicker@arr", flush=True)
+        print(f"速率: {args.rate:g} alerts/sec | 金额中位数: ${args.median_usd:,.0f} | "
+              f"多币种比例: {args.multi_asset_ratio:.0%}", flush=True)
+        if args.schedule:
+            print(f"连接计划: {args.schedule}", flush=True)
+        print("=" * 60, flush=True)
+        await asyncio.Future()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地 Whale Alert WebSocket 模拟服务器")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--rate', type=float, default=1.0,
+                        help="每个连接每秒推送的警报数（生产环境约 100 条/小时 ≈ 0.03）")
+    parser.add_argument('--symbols', default='btc,eth,sol,xrp,bnb,usdt', help="使用的币种（逗号分隔）")
+    parser.add_argument('--median-usd', type=float, default=2_000_000, help="单笔金额中位数（美元）")
+    parser.add_argument('--sigma', type=float, default=1.0, help="金额对数正态分布的 sigma")
+    parser.add_argument('--multi-asset-ratio', type=float, default=0.05, help="多币种交易比例")
+    parser.add_argument('--schedule', default='', help="按连接顺序的行为计划，如 429,4001@30,1006@60")
+    parser.add_argument('--replay-max', type=int, default=500, help="重新订阅时最多补发的警报数")
+    parser.add_argument('--ticker-interval', type=float, default=1.0,
+                        help="Binance mini-ticker 替身流的推送间隔（秒）")
+    parser.add_argument('--seed', type=int, default=None, help="随机种子")
+    args = parser.parse_args()
+
+    try:
+        parse_schedule(args.schedule)
+    except ValueError as e:
+        print(f"❌ 错误: {e}")
+        sys.exit(1)
+
+    try:
+        asyncio.run(serve_forever(args))
+    except KeyboardInterrupt:
+        print("\n\n用户中断")
+
+
+if __name__ == '__main__':
+    main()
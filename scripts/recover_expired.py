@@ -14,7 +14,9 @@ sys.path.insert(0, str(project_root))
 
 from src.storage.redis_client import RedisClient
 from src.data_collectors.binance import BinanceCollector
-from datetime import datetime
+from src.observers.tick import (
+    collect_pending, tick_currencies, compute_price_updates, needs_snapshot_history, build_tick_writes
+)
 
 
 def main():
@@ -26,104 +28,53 @@ def main():
         client = RedisClient()
         binance = BinanceCollector()
         
-        # 获取所有活跃的观察窗口
-        active_events = client.get_active_observations()
+        # 到期索引之前创建的窗口先补充到期时间
+        backfilled = client.backfill_expiry_index()
+        if backfilled:
+            print(f"已为 {backfilled} 个观察窗口补充到期索引")
         
-        if not active_events:
-            print("没有活跃的观察窗口")
+        # 到期的窗口直接来自到期索引（ZRANGEBYSCORE），不需要逐个检查活跃窗口
+        active_events, due = client.get_observation_schedule()
+        active = set(active_events)
+        due_events = [event_id for event_id in due if event_id in active]
+        orphans = [event_id for event_id in due if event_id not in active]
+        
+        if not due_events and not orphans:
+            print(f"没有过期的观察窗口（活跃 {len(active_events)} 个）")
             return
         
-        print(f"检查 {len(active_events)} 个活跃观察窗口...\n")
+        print(f"检查 {len(due_events)} 个过期观察窗口（活跃 {len(active_events)} 个）...\n")
+        
+        # 一个 pipeline 读取所有过期窗口和事件，每个币种只查询一次价格
+        states = client.load_observation_states(due_events)
+        pending, stale = collect_pending(due_events, states)
+        prices = binance.get_current_prices(tick_currencies(pending))
+        updates = compute_price_updates(pending, prices, due_events)
+        
+        updated = {update[0] for update in updates}
+        for event_id, _, currency, _ in pending:
+            if event_id not in updated:
+                print(f"⚠️  无法获取 {currency.upper()} 价格，跳过事件 {event_id[:16]}...")
+        
+        # 升级前创建的窗口没有记录最大/最小变化，从快照列表计算
+        history = {}
+        for update in updates:
+            if needs_snapshot_history(update):
+                history[update[0]] = [float(s.get('change_pct', 0)) for s in client.get_price_snapshots(update[0])]
         
-        recovered = 0
-        skipped = 0
-        errors = 0
+        # 一个 pipeline 写入所有结果，并从活跃列表和到期索引移除
+        snapshots, completions = build_tick_writes(updates, history)
+        client.save_tick_updates(snapshots, completions, stale + orphans)
+        client.update_stats()
         
-        for event_id in active_events:
-            observation = client.get_observation(event_id)
-            if not observation:
-                # 观察窗口不存在，从活跃列表移除
-                client.client.zrem("observations:active", event_id)
-                skipped += 1
-                continue
-            
-            expires_at_str = observation.get('expires_at')
-            if not expires_at_str:
-                skipped += 1
-                continue
-            
-            try:
-                expires_at = datetime.fromisoformat(expires_at_str)
-                
-                # 如果已过期但状态还是 observing
-                if datetime.now() >= expires_at and observation.get('status') == 'observing':
-                    # 获取事件信息
-                    event = client.get_event(event_id)
-                    if not event:
-                        print(f"⚠️  事件 {event_id[:16]}... 不存在，跳过")
-                        skipped += 1
-                        continue
-                    
-                    currency = event.get('currency', 'btc')
-                    baseline_price = float(event.get('baseline_price', 0))
-                    
-                    if baseline_price == 0:
-                        print(f"⚠️  事件 {event_id[:16]}... 基准价格为0，跳过")
-                        skipped += 1
-                        continue
-                    
-                    # 获取当前价格
-                    current_price = binance.get_current_price(currency)
-                    if not current_price or current_price == 0:
-                        print(f"⚠️  无法获取 {currency.upper()} 价格，跳过事件 {event_id[:16]}...")
-                        skipped += 1
-                        continue
-                    
-                    # 计算变化
-                    change_pct = ((current_price - baseline_price) / baseline_price) * 100
-                    
-                    # 获取所有快照计算最大最小
-                    snapshots = client.get_price_snapshots(event_id)
-                    max_change = change_pct
-                    min_change = change_pct
-                    
-                    if snapshots:
-                        changes = [float(s.get('change_pct', 0)) for s in snapshots]
-                        if changes:
-                            max_change = max(changes)
-                            min_change = min(changes)
-                    
-                    direction = "up" if change_pct > 0 else "down"
-                    
-                    # 完成观察
-                    client.complete_observation(
-                        event_id=event_id,
-                        final_price=current_price,
-                        final_change_pct=change_pct,
-                        direction=direction,
-                        max_change_pct=max_change,
-                        min_change_pct=min_change
-                    )
-                    
-                    # 更新统计
-                    client.update_stats()
-                    
-                    print(f"✅ 恢复过期观察: {event_id[:16]}... | 变化: {change_pct:+.2f}% | 方向: {direction}")
-                    recovered += 1
-                else:
-                    # 未过期或已完成
-                    skipped += 1
-                    
-            except Exception as e:
-                print(f"❌ 处理 {event_id[:16]}... 时出错: {e}")
-                errors += 1
-                continue
+        for event_id, _, change_pct, direction, _, _ in completions:
+            print(f"✅ 恢复过期观察: {event_id[:16]}... | 变化: {change_pct:+.2f}% | 方向: {direction}")
         
         print("\n" + "=" * 60)
         print(f"恢复完成:")
-        print(f"  ✅ 已恢复: {recovered} 个")
-        print(f"  ⏭️  跳过: {skipped} 个")
-        print(f"  ❌ 错误: {errors} 个")
+        print(f"  ✅ 已恢复: {len(completions)} 个")
+        print(f"  ⏭️  跳过: {len(due_events) - len(completions) - len(stale)} 个")
+        print(f"  🧹 清理: {len(stale) + len(orphans)} 个（观察窗口已不存在）")
         print("=" * 60)
         
     except Exception as e:
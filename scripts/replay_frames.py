@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+回放录制的 WebSocket 帧，测量摄取吞吐量
+用法: python scripts/replay_frames.py <帧日志文件> [--speed N] [--stub-binance] [--workers N]
+
+帧日志由 main_ws.py 在设置 WS_RECORD_PATH 时录制。
+回放走与线上相同的 WhaleAlertWebSocket.on_message 代码路径，写入 REDIS_URL 指向的 Redis
+（建议使用本地 Redis，不要指向生产环境）。
+--speed 0 表示尽可能快，结束后输出 alerts/sec 和 p50/p99 延迟。
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.websocket.whale_alert_ws import WhaleAlertWebSocket
+from src.websocket.frame_log import FrameReplayer
+
+
+class StubBinance:
+    """固定价格的 Binance 替身，用于离线回放（可模拟网络延迟）"""
+
+    DEFAULT_PRICES = {'btc': 60000.0, 'eth': 3000.0, 'sol': 150.0, 'xrp': 0.5, 'bnb': 550.0}
+    price_stream = None
+    price_cache = None
+    symbol_resolver = None
+    rate_limiter = None
+
+    def __init__(self, latency_ms: float = 0):
+        self.latency = latency_ms / 1000
+        self.calls = 0
+
+    def get_current_price(self, symbol: str):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return self.DEFAULT_PRICES.get(symbol.lower(), 1.0)
+
+    def get_current_prices(self, currencies):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return {c: self.DEFAULT_PRICES.get(c.lower(), 1.0) for c in currencies}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="回放录制的 WebSocket 帧")
+    parser.add_argument('path', help="帧日志文件（WS_RECORD_PATH 录制的文件）")
+    parser.add_argument('--speed', type=float, default=0,
+                        help="回放速度：1 为实时，N 为 N 倍速，0 为尽可能快（默认）")
+    parser.add_argument('--stub-binance', action='store_true', help="使用固定价格替代 Binance API")
+    parser.add_argument('--stub-latency-ms', type=float, default=0, help="Binance 替身的模拟延迟（毫秒）")
+    parser.add_argument('--workers', type=int, default=0,
+                        help="摄取队列工作线程数，0 表示在回放线程中直接处理（默认）")
+    parser.add_argument('--dedup', action='store_true',
+                        help="启用交易去重（默认关闭，以便同一份帧日志可以重复回放）")
+    args = parser.parse_args()
+
+    try:
+        # 回放时不录制（即使设置了 WS_RECORD_PATH，也不会打开甚至追加到正在回放的文件）
+        client = WhaleAlertWebSocket(api_key='replay-local', ingest_workers=args.workers, record=False)
+        if not args.dedup:
+            client.dedup = None
+        if args.stub_binance:
+            client.binance = StubBinance(latency_ms=args.stub_latency_ms)
+
+        speed_desc = "尽可能快" if args.speed <= 0 else f"{args.speed:g}x"
+        print("=" * 60)
+        print(f"回放: {args.path} | 速度: {speed_desc} | 工作线程: {args.workers}")
+        print("=" * 60)
+
+        report = FrameReplayer(client, args.path, speed=args.speed).run()
+        if client.ingest_queue:
+            client.ingest_queue.stop()
+
+        print("\n" + "=" * 60)
+        print("回放结果")
+        print("=" * 60)
+        print(f"帧数: {report['frames']}")
+        print(f"警报数: {report['alerts']}")
+        print(f"耗时: {report['duration_s']} 秒")
+        print(f"吞吐量: {report['alerts_per_sec']} alerts/sec")
+        print(f"延迟: p50={report['p50_ms']}ms, p99={report['p99_ms']}ms")
+        if 'dropped' in report:
+            print(f"队列丢弃: {report['dropped']}")
+        if client.dedup:
+            dedup = client.dedup.stats()
+            print(f"去重: 重复 {dedup['duplicates']} / 检查 {dedup['checked']}")
+        print("=" * 60)
+
+    except KeyboardInterrupt:
+        print("\n\n用户中断")
+        sys.exit(0)
+    except Exception as e:
+        print(f"❌ 错误: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
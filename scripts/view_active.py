@@ -4,6 +4,7 @@
 用法: python scripts/view_active.py
 """
 import sys
+import time
 from pathlib import Path
 
 # 添加项目根目录到路径
@@ -27,7 +28,7 @@ def main():
             print("当前没有活跃的观察窗口")
             return
         
-        for i, window in enumerate(active[:10], 1):  # 只显示前10个
+        for i, window in enumerate(active[:10], 1):  # 只显示最先到期的10个
             event = window.get('event', {})
             observation = window.get('observation', {})
             
@@ -35,14 +36,15 @@ def main():
             currency = event.get('currency', 'N/A').upper()
             amount_usd = float(event.get('amount_usd', 0))
             baseline_price = float(observation.get('baseline_price', 0))
-            expires_at = observation.get('expires_at', 'N/A')
+            expires_ts = window.get('expires_ts')
             
-            # 计算剩余时间
+            # 计算剩余时间（到期时间来自到期索引，不在索引中的旧窗口解析 expires_at）
             try:
-                expires = datetime.fromisoformat(expires_at)
-                remaining = expires - datetime.now()
-                if remaining.total_seconds() > 0:
-                    remaining_str = f"{remaining.total_seconds()/3600:.1f} 小时"
+                if expires_ts is None:
+                    expires_ts = datetime.fromisoformat(observation['expires_at']).timestamp()
+                remaining = expires_ts - time.time()
+                if remaining > 0:
+                    remaining_str = f"{remaining/3600:.1f} 小时"
                 else:
                     remaining_str = "已过期"
             except:
@@ -0,0 +1,180 @@
+"""Binance API异步数据收集器（aiohttp）"""
+import asyncio
+import json
+from typing import Optional, Dict, Iterable, List
+
+import aiohttp
+
+from config import settings
+from src.data_collectors.binance import WEIGHTS
+from src.data_collectors.symbol_resolver import PriceRoute, get_shared_symbol_resolver
+from src.storage.rate_limiter import PRIORITY_LIVE, RateLimiter, get_rate_limiter
+
+
+class AsyncBinanceCollector:
+    """Binance API异步收集器，只实现实时监控需要的价格查询"""
+
+    def __init__(self, timeout: float = 10, max_connections: int = 20,
+                 rate_limiter: Optional[RateLimiter] = None, priority: str = PRIORITY_LIVE):
+        """
+        初始化异步收集器（需要在事件循环中 await start()）
+
+        参数:
+        - timeout: 单次请求超时（秒）
+        - max_connections: 连接池大小（keep-alive 复用 TCP/TLS 连接）
+        - rate_limiter: 限流器，默认使用进程内共享的限流器（与 BinanceCollector 共用配额）
+        - priority: 请求优先级，默认 PRIORITY_LIVE
+        """
+        self.base_url = settings.BINANCE_BASE_URL
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.session: Optional[aiohttp.ClientSession] = None
+        self.symbol_resolver = get_shared_symbol_resolver()
+        self.rate_limiter = rate_limiter or get_rate_limiter()
+        self.priority = priority
+
+    async def start(self):
+        """创建 HTTP 会话"""
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                connector=aiohttp.TCPConnector(limit=self.max_connections)
+            )
+
+    async def close(self):
+        """关闭 HTTP 会话"""
+        if self.session and not self.session.closed:
+            await self.session.close()
+
+    async def _acquire(self, weight: int):
+        """
+        请求前从限流器取得请求权重（限流器可能阻塞等待或访问 Redis，放到线程中执行，不阻塞事件循环）
+
+        参数:
+        - weight: 接口的请求权重（见 WEIGHTS）
+        """
+        if self.rate_limiter:
+            await asyncio.to_thread(self.rate_limiter.acquire, 'binance', weight, priority=self.priority)
+
+    async def _observe_response(self, response: aiohttp.ClientResponse):
+        """
+        根据响应校准限流器（与 BinanceCollector.observe_response 相同）：
+        429/418 时按 Retry-After 暂停所有进程，否则按已用权重校准
+
+        参数:
+        - response: Binance 响应
+        """
+        if not self.rate_limiter:
+            return
+        if response.status in (418, 429):
+            retry_after = response.headers.get('Retry-After')
+            await asyncio.to_thread(self.rate_limiter.penalize, 'binance',
+                                    float(retry_after) if retry_after else 60)
+        else:
+            used = (response.headers.get('X-MBX-USED-WEIGHT-1M')
+                    or response.headers.get('X-MBX-USED-WEIGHT'))
+            await asyncio.to_thread(self.rate_limiter.observe_binance_weight, used)
+
+    async def get_current_price(self, symbol: str) -> Optional[float]:
+        """
+        获取当前价格（交易对由 exchangeInfo 索引解析，与 BinanceCollector.get_current_price 相同）
+
+        参数:
+        - symbol: 交易对，如 'BTCUSDT'，或币种代码如 'btc'
+
+        返回:
+        - 当前价格，如果获取失败或币种在 Binance 上没有交易对返回None
+        """
+        return (await self.get_current_prices([symbol]))[symbol]
+
+    async def get_current_prices(self, currencies: Iterable[str]) -> Dict[str, Optional[float]]:
+        """
+        批量获取当前价格（一次 /ticker/price 请求，与 BinanceCollector.get_current_prices 相同）
+
+        参数:
+        - currencies: 币种代码或交易对列表
+
+        返回:
+        - {输入的币种: 价格}，获取失败的币种值为None
+        """
+        prices = {}
+        routes = {}
+        for currency in currencies:
+            route = await self.resolve_symbol(currency)
+            if route is None:
+                prices[currency] = None  # 无法解析，不发请求
+            else:
+                routes[currency] = route
+
+        pairs = sorted({pair for route in routes.values() for pair in route.pairs})
+        quoted = await self._fetch_prices(pairs) if pairs else {}
+        for currency, route in routes.items():
+            prices[currency] = route.price(quoted)
+        return prices
+
+    async def resolve_symbol(self, currency: str) -> Optional[PriceRoute]:
+        """
+        解析币种的计价交易对（按需刷新 exchangeInfo 索引）
+
+        返回:
+        - PriceRoute；无法解析时返回None
+        """
+        if self.symbol_resolver.claim_refresh():
+            exchange_info = None
+            await self.start()
+            try:
+                await self._acquire(WEIGHTS['exchangeInfo'])
+                async with self.session.get(f'{self.base_url}/exchangeInfo',
+                                            params={'symbolStatus': 'TRADING'}) as response:
+                    await self._observe_response(response)
+                    response.raise_for_status()
+                    exchange_info = await response.json()
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                print(f"加载交易对信息失败: {e}", flush=True)
+            finally:
+                self.symbol_resolver.load(exchange_info)
+        return self.symbol_resolver.resolve(currency)
+
+    async def _fetch_price(self, pair: str) -> Optional[float]:
+        """通过 REST 获取单个交易对的价格"""
+        await self.start()
+        try:
+            await self._acquire(WEIGHTS['ticker/price'])
+            async with self.session.get(f'{self.base_url}/ticker/price',
+                                        params={'symbol': pair}) as response:
+                await self._observe_response(response)
+                if response.status == 400:
+                    print(f"⚠️  交易对 {pair} 不存在", flush=True)
+                    return None
+                response.raise_for_status()
+                data = await response.json()
+                return float(data.get('price', 0))
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            print(f"获取价格失败 {pair}: {e}", flush=True)
+            return None
+
+    async def _fetch_prices(self, pairs: List[str]) -> Dict[str, Optional[float]]:
+        """
+        通过 REST 批量获取交易对价格（一次 /ticker/price 请求）
+
+        返回:
+        - {交易对: 价格}
+        """
+        if len(pairs) == 1:
+            return {pairs[0]: await self._fetch_price(pairs[0])}
+
+        await self.start()
+        try:
+            params = {'symbols': json.dumps(pairs, separators=(',', ':'))}
+            await self._acquire(WEIGHTS['ticker/price:symbols'])
+            async with self.session.get(f'{self.base_url}/ticker/price', params=params) as response:
+                await self._observe_response(response)
+                if response.status == 400:
+                    # 有交易对不存在时整个批量请求失败，改为并发逐个查询
+                    results = await asyncio.gather(*(self._fetch_price(p) for p in pairs))
+                    return dict(zip(pairs, results))
+                response.raise_for_status()
+                return {item['symbol']: float(item['price']) for item in await response.json()}
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            print(f"批量获取价格失败 {pairs}: {e}", flush=True)
+            return {}
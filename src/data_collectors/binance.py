@@ -1,28 +1,197 @@
 """Binance API数据收集器"""
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
-from typing import Optional, List
+from typing import Optional, List, Dict, Iterable
+import threading
 import time
+import json
 
 from config import settings
+from src.data_collectors.kline_codec import records_to_dataframe
+from src.data_collectors.kline_downloader import KlineDownloader
+from src.data_collectors.price_cache import PriceCache, get_shared_price_cache
+from src.storage.rate_limiter import PRIORITY_LIVE, PRIORITY_BACKFILL, RateLimiter, get_rate_limiter
+from src.data_collectors.symbol_resolver import (
+    STABLECOINS, PriceRoute, SymbolResolver, get_shared_symbol_resolver, to_trading_pair
+)
+
+
+KLINE_COLUMNS = [
+    'open_time', 'open', 'high', 'low', 'close', 'volume',
+    'close_time', 'quote_volume', 'trades', 'taker_buy_base',
+    'taker_buy_quote', 'ignore'
+]
+
+
+def klines_to_dataframe(klines: list) -> pd.DataFrame:
+    """
+    将 /klines 返回的原始K线（已解析为列表）转换为 DataFrame
+    
+    下载路径已改为 kline_codec.decode_klines + records_to_dataframe，这里保留给已解析的列表数据使用。
+    
+    参数:
+    - klines: 原始K线列表
+    
+    返回:
+    - 以 open_time 为索引的 DataFrame
+    """
+    if not klines:
+        return pd.DataFrame()
+    
+    df = pd.DataFrame(klines, columns=KLINE_COLUMNS)
+    
+    # 数据类型转换
+    df['open_time'] = pd.to_datetime(df['open_time'], unit='ms')
+    df['close_time'] = pd.to_datetime(df['close_time'], unit='ms')
+    
+    numeric_columns = ['open', 'high', 'low', 'close', 'volume', 
+                      'quote_volume', 'trades', 'taker_buy_base', 'taker_buy_quote']
+    for col in numeric_columns:
+        df[col] = pd.to_numeric(df[col], errors='coerce')
+    
+    # 设置时间索引
+    return df.set_index('open_time')
+
+
+# 接口请求权重（https://developers.binance.com/docs/binance-spot-api-docs/rest-api）
+WEIGHTS = {
+    'klines': 2,
+    'ticker/price': 2,
+    'ticker/price:symbols': 4,
+    'ticker/24hr': 2,
+    'exchangeInfo': 20,
+}
+
+
+def create_session(pool_size: Optional[int] = None, max_retries: Optional[int] = None,
+                   backoff: Optional[float] = None) -> requests.Session:
+    """
+    创建带连接池和重试的 HTTP 会话
+    
+    keep-alive 复用 TCP/TLS 连接，避免每次请求都重新握手；
+    连接错误和 5xx 按指数退避重试，最终仍失败时返回最后一次响应，由调用方的 raise_for_status() 处理。
+    429/418 不在这里重试：响应直接交给 observe_response()，由限流器按 Retry-After 暂停所有进程，
+    避免本会话在限流期间继续重试（收到 429 后继续请求会升级为 418 封禁）。
+    
+    参数:
+    - pool_size: 连接池大小，默认读取 BINANCE_POOL_SIZE
+    - max_retries: 最大重试次数，默认读取 BINANCE_MAX_RETRIES
+    - backoff: 退避系数（秒），默认读取 BINANCE_RETRY_BACKOFF
+    
+    返回:
+    - requests.Session
+    """
+    pool_size = pool_size or settings.BINANCE_POOL_SIZE
+    retry = Retry(
+        total=settings.BINANCE_MAX_RETRIES if max_retries is None else max_retries,
+        backoff_factor=settings.BINANCE_RETRY_BACKOFF if backoff is None else backoff,
+        status_forcelist=(500, 502, 503, 504),
+        allowed_methods=frozenset(['GET']),
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers['User-Agent'] = 'WhaleAlertTrends/1.0'
+    return session
+
+
+_shared_session = None
+_shared_session_lock = threading.Lock()
+
+
+def get_shared_session() -> requests.Session:
+    """
+    获取进程内共享的 HTTP 会话（WebSocket 客户端、观察器和脚本共用一个连接池）
+    
+    返回:
+    - requests.Session
+    """
+    global _shared_session
+    with _shared_session_lock:
+        if _shared_session is None:
+            _shared_session = create_session()
+        return _shared_session
 
 
 class BinanceCollector:
     """Binance API数据收集器"""
     
-    def __init__(self, api_key: Optional[str] = None, api_secret: Optional[str] = None):
+    def __init__(self, api_key: Optional[str] = None, api_secret: Optional[str] = None,
+                 session: Optional[requests.Session] = None, price_stream=None,
+                 price_cache: Optional[PriceCache] = None,
+                 symbol_resolver: Optional[SymbolResolver] = None,
+                 rate_limiter: Optional[RateLimiter] = None, priority: str = PRIORITY_LIVE):
         """
         初始化收集器
         
         参数:
         - api_key: Binance API密钥（可选，公开数据可能不需要）
         - api_secret: Binance API密钥（可选）
+        - session: HTTP 会话，默认使用进程内共享的连接池（get_shared_session）
+        - price_stream: 行情流价格簿（BinancePriceStream，可选），价格优先从内存读取，过期时才请求 REST
+        - price_cache: 价格缓存，默认使用进程内共享的缓存（get_shared_price_cache，TTL 为 0 时不缓存）
+        - symbol_resolver: 交易对索引，默认使用进程内共享的索引（get_shared_symbol_resolver）
+        - rate_limiter: 限流器，默认使用进程内共享的限流器（get_rate_limiter，Redis 令牌桶，所有进程共用配额）
+        - priority: 请求优先级，实时监控为 PRIORITY_LIVE（默认），历史数据脚本为 PRIORITY_BACKFILL
         """
         self.api_key = api_key or settings.BINANCE_API_KEY
         self.api_secret = api_secret or settings.BINANCE_API_SECRET
         self.base_url = settings.BINANCE_BASE_URL
+        self.session = session or get_shared_session()
+        self.price_stream = price_stream
+        self.price_cache = price_cache or get_shared_price_cache()
+        self.symbol_resolver = symbol_resolver or get_shared_symbol_resolver()
+        self.rate_limiter = rate_limiter or get_rate_limiter()
+        self.priority = priority
+        # (连接超时, 读取超时)
+        self.timeout = (settings.BINANCE_CONNECT_TIMEOUT, settings.BINANCE_READ_TIMEOUT)
+    
+    def _get(self, path: str, params: dict, weight: int) -> requests.Response:
+        """
+        发送 GET 请求：先从限流器取得请求权重，收到响应后按响应头校准
+        
+        参数:
+        - path: 接口路径，如 '/ticker/price'
+        - params: 请求参数
+        - weight: 接口的请求权重（见 WEIGHTS）
+        
+        返回:
+        - requests.Response
+        """
+        if self.rate_limiter:
+            self.rate_limiter.acquire('binance', weight, priority=self.priority)
+        response = self.session.get(f'{self.base_url}{path}', params=params, timeout=self.timeout)
+        self.observe_response(response)
+        return response
+    
+    def observe_response(self, response: requests.Response) -> int:
+        """
+        根据响应校准限流器：已用权重接近上限时暂停，429/418 时按 Retry-After 暂停所有进程
+        
+        参数:
+        - response: Binance 响应
+        
+        返回:
+        - 响应头报告的本分钟已用权重（没有时为 0）
+        """
+        used = response.headers.get('X-MBX-USED-WEIGHT-1M') or response.headers.get('X-MBX-USED-WEIGHT')
+        if self.rate_limiter:
+            if response.status_code in (418, 429):
+                retry_after = response.headers.get('Retry-After')
+                self.rate_limiter.penalize('binance', float(retry_after) if retry_after else 60)
+            else:
+                self.rate_limiter.observe_binance_weight(used)
+        try:
+            return int(used) if used else 0
+        except ValueError:
+            return 0
     
     def get_klines(
         self,
@@ -33,7 +202,7 @@ class BinanceCollector:
         limit: int = 1000
     ) -> pd.DataFrame:
         """
-        获取K线数据
+        获取K线数据（按 1000 根K线切分窗口并发下载，见 KlineDownloader）
         
         参数:
         - symbol: 交易对，如 'BTCUSDT'
@@ -43,80 +212,17 @@ class BinanceCollector:
         - limit: 每次请求的最大记录数（最大1000）
         
         返回:
-        - DataFrame，包含K线数据
+        - DataFrame，包含K线数据；下载失败的窗口（K线缺失的时间段）打印警告，
+          并记录在 df.attrs['failed_ranges']（[(开始毫秒, 结束毫秒)]）
         """
-        all_klines = []
-        current_start = start_time
-        
-        while True:
-            # 构建请求参数
-            params = {
-                'symbol': symbol,
-                'interval': interval,
-                'limit': limit
-            }
-            
-            if current_start:
-                params['startTime'] = int(current_start.timestamp() * 1000)
-            
-            if end_time:
-                params['endTime'] = int(end_time.timestamp() * 1000)
-            
-            try:
-                response = requests.get(
-                    f'{self.base_url}/klines',
-                    params=params
-                )
-                response.raise_for_status()
-                
-                klines = response.json()
-                
-                if not klines:
-                    break
-                
-                all_klines.extend(klines)
-                
-                # 如果返回的记录数少于limit，说明已经获取完数据
-                if len(klines) < limit:
-                    break
-                
-                # 更新起始时间为最后一条K线的结束时间
-                last_kline_time = datetime.fromtimestamp(klines[-1][6] / 1000)
-                current_start = last_kline_time + timedelta(milliseconds=1)
-                
-                # 如果已经到达结束时间，停止
-                if end_time and current_start >= end_time:
-                    break
-                
-                # 避免请求过快
-                time.sleep(0.1)
-                
-            except requests.exceptions.RequestException as e:
-                print(f"请求错误: {e}")
-                break
-        
-        # 转换为DataFrame
-        if not all_klines:
-            return pd.DataFrame()
-        
-        df = pd.DataFrame(klines, columns=[
-            'open_time', 'open', 'high', 'low', 'close', 'volume',
-            'close_time', 'quote_volume', 'trades', 'taker_buy_base',
-            'taker_buy_quote', 'ignore'
-        ])
-        
-        # 数据类型转换
-        df['open_time'] = pd.to_datetime(df['open_time'], unit='ms')
-        df['close_time'] = pd.to_datetime(df['close_time'], unit='ms')
-        
-        numeric_columns = ['open', 'high', 'low', 'close', 'volume', 
-                          'quote_volume', 'trades', 'taker_buy_base', 'taker_buy_quote']
-        for col in numeric_columns:
-            df[col] = pd.to_numeric(df[col], errors='coerce')
-        
-        # 设置时间索引
-        df = df.set_index('open_time')
-        
+        downloader = KlineDownloader(self, limit=limit)
+        klines = downloader.download(symbol, interval, start_time, end_time)
+        report = downloader.last_report
+        if report['windows'] > 1:
+            print(f"K线下载完成 {symbol} {interval}: {report['candles']} 根 / {report['elapsed_s']} 秒 "
+                  f"({report['candles_per_s']} 根/秒，失败窗口 {report['failed_windows']})")
+        df = records_to_dataframe(klines)
+        df.attrs['failed_ranges'] = report['failed_ranges']
         return df
     
     def calculate_price_changes(self, df: pd.DataFrame) -> pd.DataFrame:
@@ -146,49 +252,153 @@ class BinanceCollector:
         """
         获取当前价格
         
+        交易对由 exchangeInfo 索引解析（见 resolve_symbol）；价格依次查询：
+        行情流价格簿 → 价格缓存（BINANCE_PRICE_CACHE_TTL 秒内有效）→ REST 请求
+        
         参数:
         - symbol: 交易对，如 'BTCUSDT'，或币种代码如 'USDT'
         
         返回:
-        - 当前价格，如果获取失败返回None
+        - 当前价格，如果获取失败或币种在 Binance 上没有交易对返回None
+        """
+        return self.get_current_prices([symbol])[symbol]
+    
+    def get_current_prices(self, currencies: Iterable[str]) -> Dict[str, Optional[float]]:
+        """
+        批量获取当前价格（缓存未命中的交易对合并为一次 /ticker/price 请求）
+        
+        参数:
+        - currencies: 币种代码或交易对列表，如 ['btc', 'eth', 'usdt']
+        
+        返回:
+        - {输入的币种: 价格}，获取失败的币种值为None
+        """
+        prices = {}
+        routes = {}  # 输入的币种 -> PriceRoute
+        for currency in currencies:
+            route = self.resolve_symbol(currency)
+            if route is None:
+                prices[currency] = None  # 无法解析，不发请求
+            else:
+                routes[currency] = route
+        
+        pairs = {pair for route in routes.values() for pair in route.pairs}
+        quoted = self._get_pair_prices(pairs) if pairs else {}
+        for currency, route in routes.items():
+            prices[currency] = route.price(quoted)
+        return prices
+    
+    def resolve_symbol(self, currency: str) -> Optional[PriceRoute]:
+        """
+        解析币种的计价交易对（按需刷新 exchangeInfo 索引）
+        
+        参数:
+        - currency: 币种代码或交易对
+        
+        返回:
+        - PriceRoute；无法解析时返回None
+        """
+        if not self.symbol_resolver:
+            pair = to_trading_pair(currency)
+            return PriceRoute(pair)
+        self._refresh_symbols()
+        return self.symbol_resolver.resolve(currency)
+    
+    def _refresh_symbols(self):
+        """到期时重新加载 exchangeInfo（同一时间只有一个线程请求）"""
+        if not self.symbol_resolver.claim_refresh():
+            return
+        exchange_info = None
+        try:
+            response = self._get('/exchangeInfo', {'symbolStatus': 'TRADING'}, WEIGHTS['exchangeInfo'])
+            response.raise_for_status()
+            exchange_info = response.json()
+        except Exception as e:
+            print(f"加载交易对信息失败: {e}")
+        finally:
+            self.symbol_resolver.load(exchange_info)
+    
+    def _get_pair_prices(self, pairs: Iterable[str]) -> Dict[str, Optional[float]]:
         """
-        # 稳定币直接返回 1.00（锚定美元）
-        stablecoins = {'USDT', 'USDC', 'BUSD', 'TUSD', 'DAI', 'PAX', 'USDP'}
-        if symbol.upper() in stablecoins:
-            return 1.0
+        获取交易对价格：行情流价格簿 → 价格缓存 → REST 批量请求
+        
+        参数:
+        - pairs: 交易对集合
         
-        # 如果已经是交易对格式（如 BTCUSDT），直接使用
-        if 'USDT' in symbol.upper() and len(symbol) > 4:
-            # 已经是交易对格式，如 BTCUSDT
-            pass
+        返回:
+        - {交易对: 价格}，获取失败的交易对值为None或不存在
+        """
+        # 行情流价格簿中有效的交易对不再请求 REST
+        prices = self.price_stream.get_prices(pairs) if self.price_stream else {}
+        missing = [pair for pair in pairs if pair not in prices]
+        if not missing:
+            return prices
+        
+        if self.price_cache:
+            prices.update(self.price_cache.get_many(missing, self._fetch_prices))
         else:
-            # 如果是币种代码，转换为交易对
-            symbol = f"{symbol.upper()}USDT"
+            prices.update(self._fetch_prices(missing))
+        return prices
+    
+    def _fetch_price(self, pair: str) -> Optional[float]:
+        """
+        通过 REST 获取单个交易对的价格（不经过行情流和缓存）
+        
+        参数:
+        - pair: 交易对，如 'BTCUSDT'
         
+        返回:
+        - 当前价格，如果获取失败返回None
+        """
         try:
-            params = {'symbol': symbol}
-            response = requests.get(
-                f'{self.base_url}/ticker/price',
-                params=params,
-                timeout=10
-            )
+            response = self._get('/ticker/price', {'symbol': pair}, WEIGHTS['ticker/price'])
             response.raise_for_status()
             data = response.json()
             return float(data.get('price', 0))
         except requests.exceptions.HTTPError as e:
             # 如果是 400 错误，可能是交易对不存在
-            if e.response and e.response.status_code == 400:
-                # 尝试其他可能的交易对格式
-                base_symbol = symbol.replace('USDT', '')
+            # 注意：requests.Response 在 4xx/5xx 时布尔值为 False，必须与 None 比较
+            if e.response is not None and e.response.status_code == 400:
                 # 某些币种可能使用不同的交易对，这里可以扩展
-                print(f"⚠️  交易对 {symbol} 不存在，可能需要使用其他交易对")
+                print(f"⚠️  交易对 {pair} 不存在，可能需要使用其他交易对")
             else:
-                print(f"获取价格失败 {symbol}: {e}")
+                print(f"获取价格失败 {pair}: {e}")
             return None
         except Exception as e:
-            print(f"获取价格失败 {symbol}: {e}")
+            print(f"获取价格失败 {pair}: {e}")
             return None
     
+    def _fetch_prices(self, pairs: List[str]) -> Dict[str, Optional[float]]:
+        """
+        通过 REST 批量获取交易对价格（一次 /ticker/price 请求，不经过行情流和缓存）
+        
+        参数:
+        - pairs: 交易对列表
+        
+        返回:
+        - {交易对: 价格}，不包含获取失败的交易对
+        """
+        if len(pairs) == 1:
+            price = self._fetch_price(pairs[0])
+            return {} if price is None else {pairs[0]: price}
+        
+        try:
+            params = {'symbols': json.dumps(sorted(pairs), separators=(',', ':'))}
+            response = self._get('/ticker/price', params, WEIGHTS['ticker/price:symbols'])
+            response.raise_for_status()
+            return {item['symbol']: float(item['price']) for item in response.json()}
+        except requests.exceptions.HTTPError as e:
+            # 只要有一个交易对不存在，Binance 就会让整个批量请求返回 400，
+            # 这时逐个查询，保证其他币种仍能拿到价格
+            if e.response is not None and e.response.status_code == 400:
+                quoted = {pair: self._fetch_price(pair) for pair in pairs}
+                return {pair: price for pair, price in quoted.items() if price is not None}
+            print(f"批量获取价格失败 {sorted(pairs)}: {e}")
+            return {}
+        except Exception as e:
+            print(f"批量获取价格失败 {sorted(pairs)}: {e}")
+            return {}
+    
     def get_24h_ticker(self, symbol: str) -> Optional[dict]:
         """
         获取24小时价格统计
@@ -200,12 +410,7 @@ class BinanceCollector:
         - 24小时统计数据字典
         """
         try:
-            params = {'symbol': symbol}
-            response = requests.get(
-                f'{self.base_url}/ticker/24hr',
-                params=params,
-                timeout=10
-            )
+            response = self._get('/ticker/24hr', {'symbol': symbol}, WEIGHTS['ticker/24hr'])
             response.raise_for_status()
             return response.json()
         except Exception as e:
@@ -218,7 +423,8 @@ def collect_kline_data(
     interval: str,
     start_date: datetime,
     end_date: datetime,
-    save_path: Optional[str] = None
+    save_path: Optional[str] = None,
+    use_cache: bool = True
 ) -> pd.DataFrame:
     """
     便捷函数：收集Binance K线数据
@@ -229,17 +435,23 @@ def collect_kline_data(
     - start_date: 开始日期
     - end_date: 结束日期
     - save_path: 保存路径（可选）
+    - use_cache: 使用本地K线存储（KlineStore），只下载缺失的时间段；
+      可以聚合的间隔由 KLINE_BASE_INTERVAL（默认 1m）的K线聚合得到
     
     返回:
     - DataFrame
     """
-    collector = BinanceCollector()
-    df = collector.get_klines(
-        symbol=symbol,
-        interval=interval,
-        start_time=start_date,
-        end_time=end_date
-    )
+    collector = BinanceCollector(priority=PRIORITY_BACKFILL)
+    if use_cache:
+        from src.storage.kline_store import KlineStore
+        df = KlineStore(collector=collector).get_dataframe(symbol, interval, start_date, end_date, derive=True)
+    else:
+        df = collector.get_klines(
+            symbol=symbol,
+            interval=interval,
+            start_time=start_date,
+            end_time=end_date
+        )
     
     # 计算价格变化
     df = collector.calculate_price_changes(df)
@@ -0,0 +1,185 @@
+"""Binance 行情 WebSocket 价格簿 - 订阅全市场 mini-ticker，在内存中维护每个交易对的最新价格"""
+import random
+import threading
+import time
+from typing import Dict, Iterable, Optional
+
+import websocket
+
+from config import settings
+from src.websocket import codec
+
+
+class BinancePriceStream:
+    """
+    全市场 mini-ticker 价格簿（!miniTicker@arr，约每秒推送一次有变化的交易对）
+
+    后台线程负责连接和断线重连；get_price() 只读内存，耗时在微秒级。
+    价格过期（连接静默超过 max_silence 秒，或该交易对超过 max_age 秒没有更新）时返回None，
+    由 BinanceCollector 回退到 REST 请求。
+    """
+
+    def __init__(self, url: Optional[str] = None, max_age: Optional[float] = None,
+                 max_silence: Optional[float] = None):
+        """
+        初始化价格簿（需要调用 start() 启动后台线程）
+
+        参数:
+        - url: 行情流地址，默认读取 BINANCE_STREAM_URL（可指向本地替身服务）
+        - max_age: 单个交易对最长多少秒没有更新仍视为有效，默认读取 BINANCE_STREAM_MAX_AGE
+        - max_silence: 整个连接最长多少秒没有消息仍视为有效，默认读取 BINANCE_STREAM_MAX_SILENCE
+        """
+        self.url = url or settings.BINANCE_STREAM_URL
+        self.max_age = settings.BINANCE_STREAM_MAX_AGE if max_age is None else max_age
+        self.max_silence = settings.BINANCE_STREAM_MAX_SILENCE if max_silence is None else max_silence
+
+        # 交易对 -> (价格, 收到时间 monotonic)；只有接收线程写入，读取无需加锁
+        self.book: Dict[str, tuple] = {}
+        self.last_message_at: Optional[float] = None
+        self.messages = 0
+        self.hits = 0
+        self.stale = 0
+        self.watched = set()  # 查询过的交易对（用于输出逐交易对的过期指标）
+
+        self.attempts = 0  # 连续失败的连接次数（收到消息后清零）
+        self.reconnects = 0
+        self.ws = None
+        self.running = False
+        self.thread = None
+
+    def on_message(self, ws, message):
+        """更新价格簿"""
+        try:
+            tickers = codec.loads(message)
+        except codec.DecodeError:
+            return
+        if isinstance(tickers, dict):
+            # 组合流格式 {"stream": ..., "data": [...]}
+            tickers = tickers.get('data', [tickers])
+        now = time.monotonic()
+        book = self.book
+        for ticker in tickers:
+            symbol = ticker.get('s')
+            close = ticker.get('c')
+            if symbol and close:
+                book[symbol] = (float(close), now)
+        self.last_message_at = now
+        self.messages += 1
+        self.attempts = 0
+
+    def on_open(self, ws):
+        print(f"Binance 行情流已连接: {self.url}", flush=True)
+
+    def on_error(self, ws, error):
+        print(f"Binance 行情流错误: {error}", flush=True)
+
+    def on_close(self, ws, close_status_code, close_msg):
+        print(f"Binance 行情流关闭 (code: {close_status_code})", flush=True)
+
+    def run(self):
+        """连接并持续接收（阻塞，断开后按退避时间重连）"""
+        while self.running:
+            self.ws = websocket.WebSocketApp(
+                self.url,
+                on_open=self.on_open,
+                on_message=self.on_message,
+                on_error=self.on_error,
+                on_close=self.on_close
+            )
+            try:
+                # Binance 服务端每 3 分钟发送 ping，websocket-client 自动回复 pong
+                self.ws.run_forever(ping_interval=60, ping_timeout=10)
+            except Exception as e:
+                print(f"Binance 行情流异常: {e}", flush=True)
+            if not self.running:
+                break
+            # 抖动指数退避：1 秒起，最多 60 秒
+            delay = min(2 ** self.attempts, 60) * (1 - 0.5 * random.random())
+            self.attempts += 1
+            self.reconnects += 1
+            print(f"Binance 行情流 {delay:.1f} 秒后重连...", flush=True)
+            deadline = time.monotonic() + delay
+            while self.running and time.monotonic() < deadline:
+                time.sleep(0.5)
+
+    def start(self):
+        """在后台线程启动"""
+        if self.thread and self.thread.is_alive():
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True, name='binance-stream')
+        self.thread.start()
+
+    def stop(self):
+        """停止"""
+        self.running = False
+        if self.ws:
+            self.ws.close()
+        if self.thread:
+            self.thread.join(timeout=5)
+
+    def is_healthy(self) -> bool:
+        """连接是否在 max_silence 秒内收到过消息"""
+        last = self.last_message_at
+        return last is not None and time.monotonic() - last <= self.max_silence
+
+    def get_price(self, pair: str) -> Optional[float]:
+        """
+        获取交易对的最新价格
+
+        参数:
+        - pair: 交易对，如 'BTCUSDT'
+
+        返回:
+        - 价格；不在价格簿中或已过期时返回None
+        """
+        self.watched.add(pair)
+        entry = self.book.get(pair)
+        if entry is None or not self.is_healthy() or time.monotonic() - entry[1] > self.max_age:
+            self.stale += 1
+            return None
+        self.hits += 1
+        return entry[0]
+
+    def get_prices(self, pairs: Iterable[str]) -> Dict[str, float]:
+        """
+        批量获取最新价格
+
+        返回:
+        - {交易对: 价格}，只包含有效的交易对
+        """
+        prices = {}
+        for pair in pairs:
+            price = self.get_price(pair)
+            if price is not None:
+                prices[pair] = price
+        return prices
+
+    def symbol_age(self, pair: str) -> Optional[float]:
+        """交易对距上次更新的秒数，不在价格簿中时返回None"""
+        entry = self.book.get(pair)
+        return None if entry is None else time.monotonic() - entry[1]
+
+    def stats(self) -> dict:
+        """
+        获取价格簿统计（包括每个查询过的交易对的过期时间 age:{交易对}，秒）
+
+        返回:
+        - 统计字典
+        """
+        last = self.last_message_at
+        total = self.hits + self.stale
+        stats = {
+            "symbols": len(self.book),
+            "messages": self.messages,
+            "reconnects": self.reconnects,
+            "healthy": self.is_healthy(),
+            "last_message_age_s": round(time.monotonic() - last, 1) if last is not None else -1,
+            "hits": self.hits,
+            "stale": self.stale,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+        for pair in sorted(self.watched.copy()):
+            age = self.symbol_age(pair)
+            stats[f"age:{pair}"] = round(age, 1) if age is not None else -1
+        return stats
@@ -0,0 +1,107 @@
+"""K线解码 - 把 /klines 响应直接解码为 NumPy 结构化数组，并零拷贝构建 DataFrame"""
+import json
+
+import numpy as np
+import pandas as pd
+
+
+# 与 /klines 返回的字段一一对应（忽略最后的 ignore 字段）
+KLINE_DTYPE = np.dtype([
+    ('open_time', 'i8'), ('open', 'f8'), ('high', 'f8'), ('low', 'f8'), ('close', 'f8'),
+    ('volume', 'f8'), ('close_time', 'i8'), ('quote_volume', 'f8'), ('trades', 'i8'),
+    ('taker_buy_base', 'f8'), ('taker_buy_quote', 'f8'),
+])
+
+# /klines 每根K线的字段数（包括 ignore）
+KLINE_FIELDS = 12
+
+_STRIP = b'"[] \n\r\t'
+
+
+def empty_records() -> np.ndarray:
+    """空的K线数组"""
+    return np.empty(0, dtype=KLINE_DTYPE)
+
+
+def klines_to_records(klines: list) -> np.ndarray:
+    """
+    将已解析的原始K线（列表的列表）转换为结构化数组
+
+    参数:
+    - klines: 原始K线列表
+
+    返回:
+    - KLINE_DTYPE 结构化数组
+    """
+    if not klines:
+        return empty_records()
+    # 价格和数量是字符串，先转为 float；整数字段由 NumPy 按 dtype 转换
+    return np.array([tuple(map(float, kline[:11])) for kline in klines], dtype=KLINE_DTYPE)
+
+
+def matrix_to_records(matrix: np.ndarray) -> np.ndarray:
+    """
+    将 (n, 字段数) 的 float64 矩阵按列转换为结构化数组
+
+    参数:
+    - matrix: 每行一根K线的矩阵
+
+    返回:
+    - KLINE_DTYPE 结构化数组
+    """
+    records = np.empty(len(matrix), dtype=KLINE_DTYPE)
+    for i, name in enumerate(KLINE_DTYPE.names):
+        records[name] = matrix[:, i]
+    return records
+
+
+def decode_klines(raw: bytes) -> np.ndarray:
+    """
+    把 /klines 的 JSON 响应直接解码为结构化数组
+
+    响应是只包含数字和数字字符串的二维数组（如 [[1499040000000,"0.0163","0.8",...],...]），
+    去掉引号和方括号后就是逗号分隔的数字，由 NumPy 在 C 中一次解析，
+    不为每个字段创建 Python 对象。格式不符合预期时退回 JSON 解析。
+
+    参数:
+    - raw: 响应体（bytes 或 str）
+
+    返回:
+    - KLINE_DTYPE 结构化数组
+    """
+    if isinstance(raw, str):
+        raw = raw.encode()
+    body = raw.strip()
+    if len(body) <= 2:  # "[]"
+        return empty_records()
+
+    first_row = body[:body.find(b']') + 1]
+    fields = first_row.count(b',') + 1
+    if fields >= len(KLINE_DTYPE.names) and b'{' not in body[:64]:
+        text = body.translate(None, _STRIP).decode('ascii')
+        values = np.fromstring(text, dtype=np.float64, sep=',')
+        if values.size and values.size % fields == 0:
+            return matrix_to_records(values.reshape(-1, fields))
+
+    # 兜底：按普通 JSON 解析
+    return klines_to_records(json.loads(raw))
+
+
+def records_to_dataframe(records: np.ndarray) -> pd.DataFrame:
+    """
+    将结构化数组转换为 DataFrame（数值列直接引用数组，不复制；时间列转换为 datetime）
+
+    参数:
+    - records: KLINE_DTYPE 结构化数组
+
+    返回:
+    - 以 open_time 为索引的 DataFrame，列与 BinanceCollector.get_klines 相同（不含 ignore）
+    """
+    if len(records) == 0:
+        return pd.DataFrame()
+    columns = {
+        name: records[name] for name in KLINE_DTYPE.names if name != 'open_time'
+    }
+    columns['close_time'] = pd.to_datetime(records['close_time'], unit='ms')
+    index = pd.DatetimeIndex(pd.to_datetime(records['open_time'], unit='ms'), name='open_time')
+    return pd.DataFrame(columns, index=index, copy=False)
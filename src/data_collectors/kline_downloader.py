@@ -0,0 +1,184 @@
+"""K线并发下载器 - 按固定窗口切分时间范围，在共享的请求权重配额内并发下载"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+import numpy as np
+import requests
+
+from config import settings
+from src.data_collectors.kline_codec import decode_klines, empty_records
+from src.storage.rate_limiter import PRIORITY_BACKFILL, RateLimiter, get_rate_limiter
+
+
+MINUTE_MS = 60 * 1000
+DAY_MS = 24 * 60 * MINUTE_MS
+
+# K线间隔 -> 毫秒（1M 按 31 天估算窗口大小，一个窗口即可覆盖 1000 个月）
+INTERVAL_MS = {
+    '1s': 1000,
+    '1m': MINUTE_MS, '3m': 3 * MINUTE_MS, '5m': 5 * MINUTE_MS,
+    '15m': 15 * MINUTE_MS, '30m': 30 * MINUTE_MS,
+    '1h': 60 * MINUTE_MS, '2h': 120 * MINUTE_MS, '4h': 240 * MINUTE_MS,
+    '6h': 360 * MINUTE_MS, '8h': 480 * MINUTE_MS, '12h': 720 * MINUTE_MS,
+    '1d': DAY_MS, '3d': 3 * DAY_MS, '1w': 7 * DAY_MS, '1M': 31 * DAY_MS,
+}
+
+# /klines 的请求权重（与 binance.WEIGHTS['klines'] 相同）
+KLINES_WEIGHT = 2
+
+
+class KlineDownloader:
+    """
+    K线并发下载器
+
+    把 [start, end) 切分成固定的 1000 根K线窗口，多个线程并发请求（共用收集器的连接池），
+    按窗口顺序拼接结果。单个窗口失败不影响其他窗口，失败的窗口会打印并返回给调用方（fetch_range）。
+    每个请求前从共享限流器（RateLimiter）按回填优先级取得权重，实时监控的请求优先。
+    """
+
+    def __init__(self, collector, concurrency: Optional[int] = None,
+                 limiter: Optional[RateLimiter] = None, limit: int = 1000):
+        """
+        初始化下载器
+
+        参数:
+        - collector: BinanceCollector（使用其 session、base_url 和超时设置）
+        - concurrency: 并发请求数，默认读取 BINANCE_KLINE_CONCURRENCY
+        - limiter: 限流器，默认使用进程内共享的限流器（get_rate_limiter）
+        - limit: 每个窗口的K线数量（最大1000）
+        """
+        self.collector = collector
+        self.concurrency = concurrency or settings.BINANCE_KLINE_CONCURRENCY
+        self.limiter = limiter or getattr(collector, 'rate_limiter', None) or get_rate_limiter()
+        self.limit = limit
+        self.last_report: dict = {}
+        self._stats_lock = threading.Lock()
+        self.max_used = 0     # 响应头报告的最高每分钟已用权重
+        self.waited_s = 0.0   # 等待限流器的累计时间
+
+    def split_windows(self, interval: str, start_ms: int, end_ms: int) -> List[tuple]:
+        """
+        切分时间窗口
+
+        返回:
+        - [(窗口开始毫秒, 窗口结束毫秒)]，左闭右开
+        """
+        span = INTERVAL_MS[interval] * self.limit
+        return [(t, min(t + span, end_ms)) for t in range(start_ms, end_ms, span)]
+
+    def fetch_window(self, symbol: str, interval: str, window: tuple) -> Optional[np.ndarray]:
+        """
+        下载一个窗口
+
+        返回:
+        - KLINE_DTYPE 结构化数组，失败时返回None
+        """
+        params = {
+            'symbol': symbol,
+            'interval': interval,
+            'startTime': window[0],
+            'endTime': window[1] - 1,
+            'limit': self.limit
+        }
+        t0 = time.perf_counter()
+        self.limiter.acquire('binance', KLINES_WEIGHT, priority=PRIORITY_BACKFILL)
+        waited = time.perf_counter() - t0
+        try:
+            response = self.collector.session.get(
+                f'{self.collector.base_url}/klines',
+                params=params,
+                timeout=self.collector.timeout
+            )
+            used = self.collector.observe_response(response)
+            with self._stats_lock:
+                self.waited_s += waited
+                self.max_used = max(self.max_used, used)
+            response.raise_for_status()
+            return decode_klines(response.content)
+        except (requests.exceptions.RequestException, ValueError) as e:
+            print(f"请求错误 {symbol} {interval} {datetime.fromtimestamp(window[0] / 1000)}: {e}")
+            return None
+
+    def download(self, symbol: str, interval: str, start_time: Optional[datetime] = None,
+                 end_time: Optional[datetime] = None) -> np.ndarray:
+        """
+        下载K线
+
+        参数:
+        - symbol: 交易对，如 'BTCUSDT'
+        - interval: K线间隔，如 '1m', '1h'
+        - start_time: 开始时间（默认为结束时间前 limit 根K线）
+        - end_time: 结束时间（默认为当前时间）
+
+        返回:
+        - 按开盘时间排序的 KLINE_DTYPE 结构化数组（统计信息见 last_report）
+        """
+        if interval not in INTERVAL_MS:
+            raise ValueError(f"不支持的K线间隔: {interval}")
+        end_ms = int((end_time or datetime.now()).timestamp() * 1000)
+        if start_time:
+            start_ms = int(start_time.timestamp() * 1000)
+        else:
+            start_ms = end_ms - INTERVAL_MS[interval] * self.limit
+        return self.download_range(symbol, interval, start_ms, end_ms)
+
+    def download_range(self, symbol: str, interval: str, start_ms: int, end_ms: int) -> np.ndarray:
+        """
+        下载开盘时间在 [start_ms, end_ms) 内的K线
+
+        返回:
+        - 按开盘时间排序的 KLINE_DTYPE 结构化数组（失败的窗口会打印，也见 last_report['failed_ranges']）
+        """
+        return self.fetch_range(symbol, interval, start_ms, end_ms)[0]
+
+    def fetch_range(self, symbol: str, interval: str, start_ms: int, end_ms: int) -> Tuple[np.ndarray, List[tuple]]:
+        """
+        下载开盘时间在 [start_ms, end_ms) 内的K线，同时返回失败的窗口
+
+        返回:
+        - (klines, failed)：klines 为按开盘时间排序的 KLINE_DTYPE 结构化数组，
+          failed 为下载失败的窗口 [(开始毫秒, 结束毫秒)]（这些时间段的K线缺失，调用方不应视为已覆盖）
+        """
+        if interval not in INTERVAL_MS:
+            raise ValueError(f"不支持的K线间隔: {interval}")
+        windows = self.split_windows(interval, start_ms, end_ms)
+
+        t0 = time.perf_counter()
+        if len(windows) <= 1:
+            pages = [self.fetch_window(symbol, interval, w) for w in windows]
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.concurrency, len(windows))) as pool:
+                pages = list(pool.map(lambda w: self.fetch_window(symbol, interval, w), windows))
+        elapsed = time.perf_counter() - t0
+
+        loaded = [page for page in pages if page is not None and len(page)]
+        klines = np.concatenate(loaded) if loaded else empty_records()
+        if len(klines) > 1:
+            # 窗口边界不重叠，这里只是防御性去重（保留开盘时间严格递增的K线）
+            opens = klines['open_time']
+            keep = np.ones(len(klines), dtype=bool)
+            keep[1:] = opens[1:] > np.maximum.accumulate(opens)[:-1]
+            klines = klines[keep]
+
+        failed = [window for window, page in zip(windows, pages) if page is None]
+        self.last_report = {
+            "symbol": symbol,
+            "interval": interval,
+            "windows": len(windows),
+            "failed_windows": len(failed),
+            "failed_ranges": failed,
+            "candles": len(klines),
+            "elapsed_s": round(elapsed, 2),
+            "candles_per_s": round(len(klines) / elapsed, 1) if elapsed > 0 else 0.0,
+            "max_used_weight": self.max_used,
+            "weight_wait_s": round(self.waited_s, 1),
+        }
+        if failed:
+            ranges = ', '.join(f"{datetime.fromtimestamp(a / 1000)} ~ {datetime.fromtimestamp(b / 1000)}"
+                               for a, b in failed)
+            print(f"⚠️  K线下载 {symbol} {interval}: {len(failed)}/{len(windows)} 个窗口失败，缺失 {ranges}",
+                  flush=True)
+        return klines, failed
@@ -0,0 +1,147 @@
+"""价格缓存 - 按交易对的 TTL 缓存 + 并发请求合并（single-flight）"""
+import threading
+import time
+from typing import Callable, Dict, Iterable, Optional
+
+from config import settings
+
+
+class _Flight:
+    """一次进行中的请求，等待者共享其结果"""
+
+    __slots__ = ('event', 'value')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+
+
+class PriceCache:
+    """
+    按交易对的 TTL 价格缓存（线程安全）
+
+    - 缓存未过期：直接返回
+    - 同一交易对已有请求在进行中：等待该请求的结果，不再重复请求
+    - 否则由当前调用方发起请求（多个交易对合并为一次批量请求）
+
+    请求失败（价格为None）不写入缓存，下一次调用会重新请求。
+    """
+
+    def __init__(self, ttl: float = 5.0, wait_timeout: float = 15.0):
+        """
+        初始化缓存
+
+        参数:
+        - ttl: 价格有效期（秒）
+        - wait_timeout: 等待其他调用方请求结果的最长时间（秒）
+        """
+        self.ttl = ttl
+        self.wait_timeout = wait_timeout
+        self._lock = threading.Lock()
+        self._entries: Dict[str, tuple] = {}  # 交易对 -> (价格, 写入时间 monotonic)
+        self._inflight: Dict[str, _Flight] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def get_many(self, keys: Iterable[str],
+                 fetch: Callable[[list], Dict[str, Optional[float]]]) -> Dict[str, Optional[float]]:
+        """
+        获取多个交易对的价格
+
+        参数:
+        - keys: 交易对列表
+        - fetch: 请求函数，参数为需要请求的交易对列表，返回 {交易对: 价格}
+
+        返回:
+        - {交易对: 价格}，获取失败的值为None
+        """
+        result = {}
+        to_fetch = []
+        waits = []
+        now = time.monotonic()
+        with self._lock:
+            for key in keys:
+                if key in result:
+                    continue
+                entry = self._entries.get(key)
+                if entry is not None and now - entry[1] <= self.ttl:
+                    result[key] = entry[0]
+                    self.hits += 1
+                elif key in self._inflight:
+                    waits.append((key, self._inflight[key]))
+                    self.coalesced += 1
+                else:
+                    self._inflight[key] = _Flight()
+                    to_fetch.append(key)
+                    self.misses += 1
+
+        if to_fetch:
+            fetched = {}
+            try:
+                fetched = fetch(to_fetch)
+            finally:
+                fetched_at = time.monotonic()
+                with self._lock:
+                    for key in to_fetch:
+                        value = fetched.get(key)
+                        if value is not None:
+                            self._entries[key] = (value, fetched_at)
+                        flight = self._inflight.pop(key)
+                        flight.value = value
+                        flight.event.set()
+            for key in to_fetch:
+                result[key] = fetched.get(key)
+
+        for key, flight in waits:
+            flight.event.wait(self.wait_timeout)
+            result[key] = flight.value
+        return result
+
+    def get(self, key: str, fetch: Callable[[list], Dict[str, Optional[float]]]) -> Optional[float]:
+        """获取单个交易对的价格（参数同 get_many）"""
+        return self.get_many([key], fetch)[key]
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """
+        获取缓存统计
+
+        返回:
+        - 统计字典（coalesced 为与其他调用方合并的请求数，计入命中）
+        """
+        with self._lock:
+            saved = self.hits + self.coalesced
+            total = saved + self.misses
+            return {
+                "ttl_s": self.ttl,
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "coalesced": self.coalesced,
+                "misses": self.misses,
+                "hit_rate": round(saved / total, 4) if total else 0.0,
+            }
+
+
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_shared_price_cache() -> Optional[PriceCache]:
+    """
+    获取进程内共享的价格缓存（BINANCE_PRICE_CACHE_TTL 为 0 时不使用缓存）
+
+    返回:
+    - PriceCache 或None
+    """
+    global _shared_cache
+    if settings.BINANCE_PRICE_CACHE_TTL <= 0:
+        return None
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = PriceCache(ttl=settings.BINANCE_PRICE_CACHE_TTL)
+        return _shared_cache
@@ -0,0 +1,248 @@
+"""交易对解析 - 根据 Binance exchangeInfo 为每个币种选择计价交易对（带负缓存）"""
+import threading
+import time
+from typing import Dict, Optional
+
+from config import settings
+
+
+# 稳定币（锚定美元，价格直接视为 1.00）
+STABLECOINS = {'USDT', 'USDC', 'BUSD', 'TUSD', 'DAI', 'PAX', 'USDP', 'FDUSD'}
+
+
+def to_trading_pair(symbol: str) -> Optional[str]:
+    """
+    将币种代码转换为 USDT 交易对（未加载 exchangeInfo 时的猜测规则）
+
+    参数:
+    - symbol: 交易对，如 'BTCUSDT'，或币种代码如 'btc'
+
+    返回:
+    - 交易对字符串；稳定币返回None（价格固定为 1.00）
+    """
+    if symbol.upper() in STABLECOINS:
+        return None
+
+    # 如果已经是交易对格式（如 BTCUSDT），直接使用
+    if 'USDT' in symbol.upper() and len(symbol) > 4:
+        return symbol.upper()
+    # 如果是币种代码，转换为交易对
+    return f"{symbol.upper()}USDT"
+
+
+class PriceRoute:
+    """
+    币种的计价方式
+
+    - pair 为None：稳定币，价格固定为 1.00
+    - via 为None：直接使用 pair 的价格（如 BTCUSDT、XYZUSDC）
+    - 否则为交叉报价：pair 的价格乘以 via 的价格（如 XYZBTC × BTCUSDT）
+    """
+
+    __slots__ = ('pair', 'via')
+
+    def __init__(self, pair: Optional[str] = None, via: Optional[str] = None):
+        self.pair = pair
+        self.via = via
+
+    @property
+    def pairs(self) -> tuple:
+        """需要查询价格的交易对"""
+        if self.pair is None:
+            return ()
+        return (self.pair, self.via) if self.via else (self.pair,)
+
+    def price(self, quotes: Dict[str, Optional[float]]) -> Optional[float]:
+        """
+        根据交易对价格计算币种的美元价格
+
+        参数:
+        - quotes: {交易对: 价格}
+
+        返回:
+        - 价格，缺少任一交易对的价格时返回None
+        """
+        if self.pair is None:
+            return 1.0
+        price = quotes.get(self.pair)
+        if price is None or self.via is None:
+            return price
+        via_price = quotes.get(self.via)
+        return None if via_price is None else price * via_price
+
+    def __repr__(self):
+        if self.pair is None:
+            return "PriceRoute(stable)"
+        return f"PriceRoute({self.pair}" + (f" x {self.via})" if self.via else ")")
+
+
+STABLE_ROUTE = PriceRoute()
+_MISSING = object()
+
+
+class SymbolResolver:
+    """
+    币种 → 交易对索引（线程安全）
+
+    由 BinanceCollector / AsyncBinanceCollector 定期加载 exchangeInfo（只包含 TRADING 状态的交易对），
+    按 BINANCE_QUOTE_ASSETS 的顺序选择美元计价交易对，都没有时按 BINANCE_CROSS_ASSETS 使用交叉报价。
+    解析结果（包括无法解析的币种）缓存到下一次刷新，之后的查询不产生任何网络请求。
+    exchangeInfo 尚未加载成功时退回 to_trading_pair 的猜测规则（不缓存）。
+    """
+
+    def __init__(self, refresh_interval: Optional[float] = None, retry_interval: float = 60):
+        """
+        初始化索引（需要调用 load() 加载 exchangeInfo）
+
+        参数:
+        - refresh_interval: 刷新间隔（秒），默认读取 BINANCE_SYMBOLS_REFRESH
+        - retry_interval: 加载失败后多少秒再重试
+        """
+        self.refresh_interval = settings.BINANCE_SYMBOLS_REFRESH if refresh_interval is None else refresh_interval
+        self.retry_interval = retry_interval
+        self.quote_assets = settings.BINANCE_QUOTE_ASSETS
+        self.cross_assets = settings.BINANCE_CROSS_ASSETS
+
+        self._lock = threading.Lock()
+        self._pairs: Dict[tuple, str] = {}  # (基础币种, 计价币种) -> 交易对
+        self._symbols = set()
+        self._routes: Dict[str, Optional[PriceRoute]] = {}  # 币种 -> 计价方式（None 为无法解析）
+        self._next_refresh = 0.0
+        self._refreshing = False
+        self.loaded_at: Optional[float] = None
+        self.loads = 0
+        self.load_errors = 0
+        self.negative_hits = 0
+
+    @property
+    def loaded(self) -> bool:
+        return self.loaded_at is not None
+
+    def claim_refresh(self) -> bool:
+        """
+        是否需要刷新；返回 True 时由调用方负责请求 exchangeInfo 并调用 load()
+        （同一时间只有一个调用方会得到 True，其余调用方继续使用现有索引）
+        """
+        with self._lock:
+            if self._refreshing or time.monotonic() < self._next_refresh:
+                return False
+            self._refreshing = True
+            return True
+
+    def load(self, exchange_info: Optional[dict]) -> bool:
+        """
+        用 exchangeInfo 响应重建索引
+
+        参数:
+        - exchange_info: /exchangeInfo 的响应；None 表示请求失败
+
+        返回:
+        - 是否加载成功（失败时保留现有索引，retry_interval 秒后再试）
+        """
+        pairs = {}
+        try:
+            for item in exchange_info['symbols']:
+                if item.get('status', 'TRADING') != 'TRADING':
+                    continue
+                pairs[(item['baseAsset'], item['quoteAsset'])] = item['symbol']
+        except (TypeError, KeyError):
+            pairs = None
+
+        with self._lock:
+            self._refreshing = False
+            if not pairs:
+                self.load_errors += 1
+                self._next_refresh = time.monotonic() + self.retry_interval
+                return False
+            self._pairs = pairs
+            self._symbols = set(pairs.values())
+            self._routes = {}
+            self.loaded_at = time.monotonic()
+            self._next_refresh = self.loaded_at + self.refresh_interval
+            self.loads += 1
+        print(f"交易对索引已加载: {len(pairs)} 个交易对", flush=True)
+        return True
+
+    def resolve(self, currency: str) -> Optional[PriceRoute]:
+        """
+        解析币种的计价方式
+
+        参数:
+        - currency: 币种代码如 'btc'，或交易对如 'BTCUSDT'
+
+        返回:
+        - PriceRoute；无法解析时返回None
+        """
+        key = currency.upper()
+        route = self._routes.get(key, _MISSING)
+        if route is not _MISSING:
+            if route is None:
+                self.negative_hits += 1
+            return route
+
+        if key in STABLECOINS:
+            route = STABLE_ROUTE
+        elif not self.loaded:
+            return PriceRoute(to_trading_pair(key))
+        else:
+            route = self._build_route(key)
+            if route is None:
+                print(f"⚠️  币种 {key} 在 Binance 上没有可用的交易对，之后不再请求", flush=True)
+        self._routes[key] = route
+        return route
+
+    def _build_route(self, key: str) -> Optional[PriceRoute]:
+        """按优先级查找交易对"""
+        if key in self._symbols:
+            return PriceRoute(key)
+        for quote in self.quote_assets:
+            pair = self._pairs.get((key, quote))
+            if pair:
+                return PriceRoute(pair)
+        for cross in self.cross_assets:
+            pair = self._pairs.get((key, cross))
+            if not pair:
+                continue
+            via = self.resolve(cross)
+            if via is not None and via.pair and via.via is None:
+                return PriceRoute(pair, via.pair)
+        return None
+
+    def stats(self) -> dict:
+        """
+        获取索引统计
+
+        返回:
+        - 统计字典
+        """
+        routes = list(self._routes.items())
+        unresolved = sorted(key for key, route in routes if route is None)
+        return {
+            "loaded": self.loaded,
+            "pairs": len(self._pairs),
+            "loaded_age_s": round(time.monotonic() - self.loaded_at, 1) if self.loaded else -1,
+            "loads": self.loads,
+            "load_errors": self.load_errors,
+            "routes": len(routes),
+            "cross_routes": sum(1 for _, route in routes if route is not None and route.via),
+            "unresolved": ','.join(unresolved),
+            "negative_hits": self.negative_hits,
+        }
+
+
+_shared_resolver = None
+_shared_resolver_lock = threading.Lock()
+
+
+def get_shared_symbol_resolver() -> SymbolResolver:
+    """
+    获取进程内共享的交易对索引（所有收集器只加载一次 exchangeInfo）
+
+    返回:
+    - SymbolResolver
+    """
+    global _shared_resolver
+    with _shared_resolver_lock:
+        if _shared_resolver is None:
+            _shared_resolver = SymbolResolver()
+        return _shared_resolver
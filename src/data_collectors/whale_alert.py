@@ -2,7 +2,7 @@
 import requests
 import pandas as pd
 from datetime import datetime, timedelta
-from typing import Optional, List, Dict
+from typing import Iterator, Optional, List, Dict
 import time
 import urllib3
 
@@ -10,6 +10,8 @@ import urllib3
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
 from config import settings
+from src.storage.address_index import DIRECTION_UNKNOWN, AddressIndex, get_shared_address_index
+from src.storage.rate_limiter import PRIORITY_BACKFILL, get_rate_limiter
 
 
 class WhaleAlertCollector:
@@ -18,12 +20,13 @@ class WhaleAlertCollector:
     # Developer API限制：最多30天（2592000秒）
     MAX_HISTORY_SECONDS = 2592000  # 30天
     
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(self, api_key: Optional[str] = None, priority: str = PRIORITY_BACKFILL):
         """
         初始化收集器
         
         参数:
         - api_key: Whale Alert API密钥，如果不提供则从配置文件读取
+        - priority: 请求优先级（历史数据默认 PRIORITY_BACKFILL），请求频率由共享限流器控制
         """
         self.api_key = api_key or settings.WHALE_ALERT_API_KEY
         if not self.api_key:
@@ -33,6 +36,22 @@ class WhaleAlertCollector:
         self.headers = {
             'X-WA-API-KEY': self.api_key
         }
+        self.rate_limiter = get_rate_limiter()
+        self.priority = priority
+        # 最近一次分页请求失败的原因（成功时为 None）
+        self.last_error: Optional[str] = None
+        self._address_index: Optional[AddressIndex] = None
+
+    @property
+    def address_index(self) -> AddressIndex:
+        """交易所地址索引（首次使用时加载进程内共享的索引）"""
+        if self._address_index is None:
+            self._address_index = get_shared_address_index()
+        return self._address_index
+
+    @address_index.setter
+    def address_index(self, index: AddressIndex):
+        self._address_index = index
     
     def get_transactions(
         self,
@@ -94,8 +113,8 @@ class WhaleAlertCollector:
             print(f"警告: 请求的时间范围 ({time_diff/86400:.1f} 天) 超过API限制 (30天)")
             print(f"将自动分割成多个30天的请求...")
             
-            # 分割成多个30天的请求
-            all_transactions = []
+            # 分割成多个30天的请求（每批已经是处理后的DataFrame，直接拼接）
+            batches = []
             current_start = start
             
             while current_start < end:
@@ -107,24 +126,47 @@ class WhaleAlertCollector:
                 )
                 
                 if not batch_data.empty:
-                    all_transactions.extend(batch_data.to_dict('records'))
+                    batches.append(batch_data)
                 
                 current_start = current_end
-                
-                # 避免请求过快
-                if current_start < end:
-                    time.sleep(1.0)
             
-            # 转换为DataFrame
-            if not all_transactions:
+            if not batches:
                 return pd.DataFrame()
-            
-            df = pd.DataFrame(all_transactions)
-            return self._process_transactions_df(df)
+            return pd.concat(batches, ignore_index=True)
         
         # 时间范围在限制内，直接获取
         return self._get_transactions_single_batch(start, end, min_value, currency, limit)
     
+    def stream_transactions(
+        self,
+        start: datetime,
+        end: datetime,
+        writer,
+        min_value: int = 500000,
+        currency: str = 'btc',
+        limit: int = 100
+    ) -> int:
+        """
+        逐页获取转账数据并写入 writer（如 TransactionStore.writer），内存中只保留一页
+        
+        参数:
+        - start: 开始时间
+        - end: 结束时间（时间范围按 API 限制调整，最多30天）
+        - writer: 带 append(交易列表) 方法的写入器
+        - min_value: 最小转账金额（美元）
+        - currency: 币种
+        - limit: 每次请求的最大记录数
+        
+        返回:
+        - 写入的交易数（请求失败时为已写入的部分，原因记录在 self.last_error）
+        """
+        start_timestamp, end_timestamp = self._clamp_range(start, end)
+        written = 0
+        for transactions, _ in self.iter_pages(start_timestamp, end_timestamp, min_value, currency, limit):
+            if transactions:
+                written += writer.append(transactions)
+        return written
+    
     def _get_transactions_single_batch(
         self,
         start: datetime,
@@ -144,10 +186,32 @@ class WhaleAlertCollector:
         - limit: 每次请求的最大记录数
         
         返回:
-        - DataFrame，包含转账数据
+        - DataFrame，包含转账数据（请求失败时为已获取的部分）
         """
+        start_timestamp, end_timestamp = self._clamp_range(start, end)
+        
         all_transactions = []
+        for transactions, _ in self.iter_pages(start_timestamp, end_timestamp, min_value, currency, limit):
+            all_transactions.extend(transactions)
+        
+        # 转换为DataFrame
+        if not all_transactions:
+            return pd.DataFrame()
+        
+        df = pd.DataFrame(all_transactions)
+        return self._process_transactions_df(df)
+    
+    def _clamp_range(self, start: datetime, end: datetime) -> tuple:
+        """
+        把时间范围调整到 API 允许的范围内（不早于30天前、不晚于当前时间、不超过30天）
         
+        参数:
+        - start: 开始时间
+        - end: 结束时间
+        
+        返回:
+        - (开始时间戳, 结束时间戳)，单位秒
+        """
         # 最终验证：使用最新的当前时间重新计算，确保start时间戳不超过30天前
         now = datetime.now()
         now_timestamp = int(now.timestamp())
@@ -197,7 +261,35 @@ class WhaleAlertCollector:
             end_timestamp = start_timestamp + self.MAX_HISTORY_SECONDS - 1  # 减1秒确保不超过
             end = datetime.fromtimestamp(end_timestamp)
         
-        cursor = None  # cursor用于分页，防止重复或丢失交易
+        print(f"请求参数: start={start_timestamp} ({start.strftime('%Y-%m-%d %H:%M:%S')}), end={end_timestamp} ({end.strftime('%Y-%m-%d %H:%M:%S')})")
+        print(f"时间差: {(end_timestamp - start_timestamp) / 86400:.2f} 天")
+        return start_timestamp, end_timestamp
+    
+    def iter_pages(
+        self,
+        start_timestamp: int,
+        end_timestamp: int,
+        min_value: int,
+        currency: str,
+        limit: int = 100,
+        cursor: Optional[str] = None
+    ) -> Iterator[tuple]:
+        """
+        按 cursor 逐页获取转账数据（每次只在内存中保留一页）
+        
+        请求失败时停止迭代，原因记录在 self.last_error（正常结束时为 None）。
+        
+        参数:
+        - start_timestamp / end_timestamp: 时间范围（秒，已由 _clamp_range 调整）
+        - min_value: 最小转账金额
+        - currency: 币种
+        - limit: 每页最大记录数
+        - cursor: 从该 cursor 继续（断点续传）
+        
+        返回:
+        - 迭代 (本页在时间范围内的交易列表, 下一页的 cursor)，最后一页的 cursor 为 None
+        """
+        self.last_error = None
         
         # 构建基础请求参数（start时间在使用cursor时保持不变）
         base_params = {
@@ -207,187 +299,177 @@ class WhaleAlertCollector:
             'limit': limit
         }
         
-        print(f"请求参数: start={start_timestamp} ({start.strftime('%Y-%m-%d %H:%M:%S')}), end={end_timestamp} ({end.strftime('%Y-%m-%d %H:%M:%S')})")
-        print(f"时间差: {(end_timestamp - start_timestamp) / 86400:.2f} 天")
-        
-        # 第一次请求不使用end参数，后续使用cursor时也不使用end
-        # 只在需要限制结束时间时，在最后一批请求中使用end
-        use_end = True  # 是否使用end参数
-        
         while True:
-            # 构建当前请求的参数
             params = base_params.copy()
-            
-            # 如果接近结束时间，添加end参数
-            if use_end:
-                params['end'] = end_timestamp
-            
-            # 如果有cursor，添加cursor参数
             if cursor:
-                params['cursor'] = cursor
                 # 使用cursor时，不添加end参数（根据文档建议）
-                params.pop('end', None)
+                params['cursor'] = cursor
+            else:
+                params['end'] = end_timestamp
             
-            # 重试逻辑 - 简化版本，避免卡住
-            max_retries = 2  # 减少重试次数，避免长时间等待
-            retry_count = 0
-            success = False
-            response_data = None
+            response_data = self.fetch_page(params)
+            if not response_data:
+                return
             
-            while retry_count < max_retries and not success:
-                try:
-                    # 先尝试正常SSL验证
-                    verify_ssl = retry_count == 0  # 第一次尝试使用SSL验证
-                    
-                    response = requests.get(
-                        f'{self.base_url}/transactions',
-                        headers=self.headers,
-                        params=params,
-                        timeout=30,  # 30秒超时，避免卡住
-                        verify=verify_ssl,
-                        allow_redirects=True
-                    )
-                    
-                    # 检查HTTP状态码
-                    if response.status_code == 400:
-                        # 400错误通常是参数问题，不重试
-                        error_data = response.json() if response.content else {}
-                        error_msg = error_data.get('message', 'Bad Request')
-                        print(f"400错误（参数问题）: {error_msg}")
-                        # 如果是时间范围问题，返回空DataFrame
-                        if 'out of range' in error_msg.lower() or 'maximum transaction history' in error_msg.lower():
-                            print("提示: 时间范围超出API限制，请缩短时间范围")
-                        return pd.DataFrame()
-                    
-                    response.raise_for_status()
-                    response_data = response.json()
-                    success = True
-                    
-                    if not verify_ssl:
-                        print("警告: 使用未验证的SSL连接成功，建议检查网络配置")
-                    
-                except requests.exceptions.SSLError as e:
-                    retry_count += 1
-                    if retry_count < max_retries:
-                        # 第二次尝试禁用SSL验证
-                        print(f"SSL错误，尝试禁用SSL验证重试 ({retry_count}/{max_retries})")
-                        time.sleep(2)  # 短暂等待
-                    else:
-                        print(f"SSL错误，所有重试都失败")
-                        print(f"错误详情: {str(e)[:150]}")
-                        print(f"建议: 检查网络连接或稍后重试")
-                        return pd.DataFrame()
-                        
-                except requests.exceptions.Timeout as e:
+            if response_data.get('result') != 'success' or 'transactions' not in response_data:
+                # API返回失败
+                if response_data.get('result') != 'success':
+                    error_msg = response_data.get('message', 'Unknown error')
+                    print(f"API返回错误: {error_msg}")
+                    self.last_error = error_msg
+                return
+            
+            transactions = response_data['transactions']
+            
+            # 过滤掉超过结束时间的交易
+            filtered_transactions = [
+                tx for tx in transactions
+                if tx.get('timestamp', 0) <= end_timestamp
+            ]
+            
+            # 获取cursor用于下一次请求
+            cursor = response_data.get('cursor')
+            
+            # 没有更多在时间范围内的交易、返回的交易数少于limit、没有cursor或已经超过结束时间，说明已经获取完数据
+            done = (not filtered_transactions or len(transactions) < limit or not cursor
+                    or max(tx.get('timestamp', 0) for tx in filtered_transactions) >= end_timestamp)
+            yield filtered_transactions, None if done else cursor
+            if done:
+                return
+    
+    def fetch_page(self, params: dict) -> Optional[dict]:
+        """
+        请求一页 /transactions（SSL、超时、429 和服务器错误会重试）
+
+        参数:
+        - params: 请求参数
+
+        返回:
+        - 响应 JSON；失败时为 None，原因记录在 self.last_error
+        """
+        # 重试逻辑 - 简化版本，避免卡住
+        max_retries = 2  # 减少重试次数，避免长时间等待
+        retry_count = 0
+        success = False
+        response_data = None
+
+        while retry_count < max_retries and not success:
+            try:
+                # 先尝试正常SSL验证
+                verify_ssl = retry_count == 0  # 第一次尝试使用SSL验证
+
+                # 请求频率由共享限流器控制（所有进程共用 Whale Alert 配额）
+                self.rate_limiter.acquire('whale_alert', 1, priority=self.priority)
+                response = requests.get(
+                    f'{self.base_url}/transactions',
+                    headers=self.headers,
+                    params=params,
+                    timeout=30,  # 30秒超时，避免卡住
+                    verify=verify_ssl,
+                    allow_redirects=True
+                )
+
+                # 检查HTTP状态码
+                if response.status_code == 400:
+                    # 400错误通常是参数问题，不重试
+                    error_data = response.json() if response.content else {}
+                    error_msg = error_data.get('message', 'Bad Request')
+                    print(f"400错误（参数问题）: {error_msg}")
+                    if 'out of range' in error_msg.lower() or 'maximum transaction history' in error_msg.lower():
+                        print("提示: 时间范围超出API限制，请缩短时间范围")
+                    self.last_error = f"HTTP 400: {error_msg}"
+                    return None
+
+                response.raise_for_status()
+                response_data = response.json()
+                success = True
+
+                if not verify_ssl:
+                    print("警告: 使用未验证的SSL连接成功，建议检查网络配置")
+
+            except requests.exceptions.SSLError as e:
+                retry_count += 1
+                if retry_count < max_retries:
+                    # 第二次尝试禁用SSL验证
+                    print(f"SSL错误，尝试禁用SSL验证重试 ({retry_count}/{max_retries})")
+                    time.sleep(2)  # 短暂等待
+                else:
+                    print(f"SSL错误，所有重试都失败")
+                    print(f"错误详情: {str(e)[:150]}")
+                    print(f"建议: 检查网络连接或稍后重试")
+                    return self._fetch_failed(e)
+
+            except requests.exceptions.Timeout as e:
+                retry_count += 1
+                if retry_count < max_retries:
+                    print(f"请求超时，{2}秒后重试 ({retry_count}/{max_retries})")
+                    time.sleep(2)
+                else:
+                    print(f"请求超时，已达到最大重试次数")
+                    return self._fetch_failed(e)
+
+            except requests.exceptions.HTTPError as e:
+                status_code = e.response.status_code if e.response is not None else 0
+
+                # 处理可重试的HTTP错误
+                if status_code in [429, 500, 502, 503, 504]:
+                    # 429: Too Many Requests
+                    # 500, 502, 503, 504: 服务器错误，可以重试
                     retry_count += 1
+                    if status_code == 429:
+                        # 通知所有进程暂停，下一次 acquire() 会等到暂停结束
+                        retry_after = e.response.headers.get('Retry-After')
+                        self.rate_limiter.penalize('whale_alert', float(retry_after) if retry_after else 10)
                     if retry_count < max_retries:
-                        print(f"请求超时，{2}秒后重试 ({retry_count}/{max_retries})")
-                        time.sleep(2)
-                    else:
-                        print(f"请求超时，已达到最大重试次数")
-                        return pd.DataFrame()
-                        
-                except requests.exceptions.HTTPError as e:
-                    status_code = e.response.status_code if e.response else 0
-                    
-                    # 处理可重试的HTTP错误
-                    if status_code in [429, 500, 502, 503, 504]:
-                        # 429: Too Many Requests
-                        # 500, 502, 503, 504: 服务器错误，可以重试
-                        retry_count += 1
-                        if retry_count < max_retries:
-                            if status_code == 429:
-                                wait_time = 10  # 429错误等待更长时间
-                            else:
-                                wait_time = 5  # 服务器错误等待5秒
-                            
-                            error_name = {
-                                429: "请求过于频繁",
-                                500: "服务器内部错误",
-                                502: "网关错误",
-                                503: "服务不可用",
-                                504: "网关超时"
-                            }.get(status_code, f"HTTP {status_code}")
-                            
+                        error_name = {
+                            429: "请求过于频繁",
+                            500: "服务器内部错误",
+                            502: "网关错误",
+                            503: "服务不可用",
+                            504: "网关超时"
+                        }.get(status_code, f"HTTP {status_code}")
+
+                        if status_code == 429:
+                            print(f"{error_name}({status_code})，等待限流器后重试 ({retry_count}/{max_retries})")
+                        else:
+                            wait_time = 5  # 服务器错误等待5秒
                             print(f"{error_name}({status_code})，{wait_time}秒后重试 ({retry_count}/{max_retries})")
                             time.sleep(wait_time)
-                        else:
-                            error_name = {
-                                429: "请求过于频繁",
-                                500: "服务器内部错误",
-                                502: "网关错误",
-                                503: "服务不可用",
-                                504: "网关超时"
-                            }.get(status_code, f"HTTP {status_code}")
-                            print(f"{error_name}({status_code})，已达到最大重试次数")
-                            print("建议: 稍后重试或检查API服务状态")
-                            return pd.DataFrame()
                     else:
-                        # 其他HTTP错误（如400, 401, 403等），不重试
-                        print(f"HTTP错误 {status_code}: {str(e)[:100]}")
-                        if status_code == 401:
-                            print("提示: 可能是API密钥无效或过期")
-                        elif status_code == 403:
-                            print("提示: 可能是API权限不足")
-                        return pd.DataFrame()
-                        
-                except requests.exceptions.RequestException as e:
-                    retry_count += 1
-                    if retry_count < max_retries:
-                        print(f"请求错误，{2}秒后重试 ({retry_count}/{max_retries}): {str(e)[:80]}")
-                        time.sleep(2)
-                    else:
-                        print(f"请求错误，已达到最大重试次数: {str(e)[:80]}")
-                        return pd.DataFrame()
-            
-            # 如果所有重试都失败，返回已收集的数据
-            if not success or not response_data:
-                break
-            
-            # 处理响应数据
-            if response_data.get('result') == 'success' and 'transactions' in response_data:
-                transactions = response_data['transactions']
-                
-                # 过滤掉超过结束时间的交易
-                filtered_transactions = [
-                    tx for tx in transactions 
-                    if tx.get('timestamp', 0) <= end_timestamp
-                ]
-                
-                if not filtered_transactions:
-                    # 没有更多在时间范围内的交易
-                    break
-                
-                all_transactions.extend(filtered_transactions)
-                
-                # 获取cursor用于下一次请求
-                cursor = response_data.get('cursor')
-                
-                # 如果返回的交易数少于limit，或者没有cursor，说明已经获取完数据
-                if len(transactions) < limit or not cursor:
-                    break
-                
-                # 检查是否已经超过结束时间
-                last_timestamp = max(tx.get('timestamp', 0) for tx in filtered_transactions)
-                if last_timestamp >= end_timestamp:
-                    break
-                
-            else:
-                # API返回失败
-                error_msg = response_data.get('message', 'Unknown error')
-                if response_data.get('result') != 'success':
-                    print(f"API返回错误: {error_msg}")
-                break
-            
-            # 避免请求过快
-            time.sleep(1.5)  # 1.5秒间隔，减少请求频率
-        
-        # 转换为DataFrame
-        if not all_transactions:
-            return pd.DataFrame()
-        
-        df = pd.DataFrame(all_transactions)
-        return self._process_transactions_df(df)
+                        error_name = {
+                            429: "请求过于频繁",
+                            500: "服务器内部错误",
+                            502: "网关错误",
+                            503: "服务不可用",
+                            504: "网关超时"
+                        }.get(status_code, f"HTTP {status_code}")
+                        print(f"{error_name}({status_code})，已达到最大重试次数")
+                        print("建议: 稍后重试或检查API服务状态")
+                        return self._fetch_failed(e)
+                else:
+                    # 其他HTTP错误（如400, 401, 403等），不重试
+                    print(f"HTTP错误 {status_code}: {str(e)[:100]}")
+                    if status_code == 401:
+                        print("提示: 可能是API密钥无效或过期")
+                    elif status_code == 403:
+                        print("提示: 可能是API权限不足")
+                    return self._fetch_failed(e)
+
+            except requests.exceptions.RequestException as e:
+                retry_count += 1
+                if retry_count < max_retries:
+                    print(f"请求错误，{2}秒后重试 ({retry_count}/{max_retries}): {str(e)[:80]}")
+                    time.sleep(2)
+                else:
+                    print(f"请求错误，已达到最大重试次数: {str(e)[:80]}")
+                    return self._fetch_failed(e)
+
+        return response_data
+
+    def _fetch_failed(self, error: Exception) -> None:
+        """记录请求失败的原因"""
+        self.last_error = f"{type(error).__name__}: {str(error)[:150]}"
+        return None
     
     def _process_transactions_df(self, df: pd.DataFrame) -> pd.DataFrame:
         """
@@ -406,10 +488,19 @@ class WhaleAlertCollector:
         if 'timestamp' in df.columns:
             df['timestamp'] = pd.to_datetime(df['timestamp'], unit='s')
         
+        # from / to 是 {'address', 'owner', 'owner_type'}，展开为地址和所有者列（与 TransactionStore 的字段相同）
+        for side in ('from', 'to'):
+            if side in df.columns:
+                parties = df[side]
+                df[f'{side}_owner'] = parties.map(lambda p: p.get('owner') if isinstance(p, dict) else None)
+                df[f'{side}_owner_type'] = parties.map(lambda p: p.get('owner_type') if isinstance(p, dict) else None)
+                df[side] = parties.map(lambda p: p.get('address') if isinstance(p, dict) else p)
+        
         # 提取关键字段
         columns_to_keep = [
             'timestamp', 'hash', 'amount', 'amount_usd', 
-            'from', 'to', 'blockchain'
+            'from', 'to', 'blockchain',
+            'from_owner', 'from_owner_type', 'to_owner', 'to_owner_type'
         ]
         available_columns = [col for col in columns_to_keep if col in df.columns]
         df = df[available_columns]
@@ -422,47 +513,44 @@ class WhaleAlertCollector:
         
         return df
     
-    def detect_exchange_direction(self, address: str) -> Optional[str]:
+    def detect_exchange_direction(self, from_address: str, to_address: str) -> Optional[str]:
         """
-        检测地址是否为交易所（简单版本）
-        注意：实际应用中需要维护交易所地址列表
-        
+        判断单笔转账的方向（按地址索引，地址也可以是所有者名称）
+
         参数:
-        - address: 钱包地址
-        
+        - from_address: 发送方地址
+        - to_address: 接收方地址
+
         返回:
         - 'in': 转入交易所
         - 'out': 转出交易所
+        - 'internal': 交易所之间
         - None: 无法判断
         """
-        # 这里应该维护一个交易所地址列表
-        # 简化版本，实际需要从Whale Alert或其他来源获取
-        exchange_addresses = {
-            # 示例：Binance热钱包地址（需要实际维护）
-            # '34xp4vRoCGJym3xR7yCVPFHoCNxv4Twseo': 'binance',
-        }
-        
-        # 如果地址在交易所列表中，判断方向
-        # 这里简化处理，实际需要根据from/to地址判断
-        return None
-    
+        direction = self.address_index.classify(from_address, to_address)
+        return None if direction == DIRECTION_UNKNOWN else direction
+
     def enrich_with_direction(self, df: pd.DataFrame) -> pd.DataFrame:
         """
         为数据添加方向信息（转入/转出交易所）
-        
+
+        整列查找地址索引（ADDRESS_LABELS_PATH 或 Redis 中的交易所地址），
+        另外 Whale Alert 标注的所有者类型为 exchange 或所有者名称是已知交易所时也视为交易所
+
         参数:
         - df: 转账数据DataFrame
-        
+
         返回:
-        - 添加了direction列的DataFrame
+        - 添加了 direction（in / out / internal / unknown）、from_entity 和 to_entity 列的DataFrame
         """
-        # 简化版本：根据from/to地址判断
-        # 实际应用中需要维护交易所地址数据库
-        df['direction'] = 'unknown'
-        
-        # 这里可以添加更复杂的逻辑来判断方向
-        # 例如：检查from_address或to_address是否在交易所地址列表中
-        
+        if df.empty:
+            df['direction'] = pd.Series(dtype=object)
+            return df
+        index = self.address_index
+        df['direction'] = index.classify_frame(df)
+        for side in ('from', 'to'):
+            if f'{side}_address' in df.columns:
+                df[f'{side}_entity'] = index.entity_names(df[f'{side}_address'])
         return df
 
 
@@ -471,7 +559,9 @@ def collect_whale_data(
     end_date: datetime,
     currency: str = 'btc',
     min_value: int = 500000,
-    save_path: Optional[str] = None
+    save_path: Optional[str] = None,
+    use_store: bool = True,
+    columns: Optional[List[str]] = None
 ) -> pd.DataFrame:
     """
     便捷函数：收集Whale Alert数据
@@ -481,18 +571,34 @@ def collect_whale_data(
     - end_date: 结束日期
     - currency: 币种
     - min_value: 最小转账金额（美元）
-    - save_path: 保存路径（可选）
+    - save_path: 保存路径（可选，CSV）
+    - use_store: 逐页写入交易列式存储（TransactionStore，按币种和日期分区的 Parquet），
+      再只读取该币种、时间范围内需要的列
+    - columns: 使用存储时读取的列（默认全部）
     
     返回:
     - DataFrame
     """
     collector = WhaleAlertCollector()
-    df = collector.get_transactions(
-        start=start_date,
-        end=end_date,
-        min_value=min_value,
-        currency=currency
-    )
+    if use_store:
+        from src.storage.transaction_store import TransactionStore
+        store = TransactionStore()
+        with store.writer(currency) as writer:
+            written = collector.stream_transactions(start_date, end_date, writer, min_value=min_value, currency=currency)
+        print(f"新增 {written} 条交易到存储: {store.root}")
+        if columns and 'amount_usd' not in columns:
+            columns = list(columns) + ['amount_usd']
+        df = store.scan([currency], start_date, end_date, columns=columns)
+        # 存储中可能有更低最小金额的回填数据
+        if not df.empty:
+            df = df[df['amount_usd'] >= min_value].reset_index(drop=True)
+    else:
+        df = collector.get_transactions(
+            start=start_date,
+            end=end_date,
+            min_value=min_value,
+            currency=currency
+        )
     
     # 添加方向信息
     df = collector.enrich_with_direction(df)
@@ -0,0 +1,368 @@
+"""Whale Alert 历史数据回填 - 逐页写入磁盘并记录断点，中断后从断点继续；多币种并发回填并合并到交易列式存储"""
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+import pandas as pd
+
+from config import settings
+from src.data_collectors.whale_alert import WhaleAlertCollector
+
+
+# 断点状态
+STATUS_RUNNING = 'running'
+STATUS_FAILED = 'failed'
+STATUS_DONE = 'done'
+
+
+class WhaleBackfill:
+    """
+    Whale Alert 历史数据回填
+
+    每个 (币种, 最小金额) 对应 WHALE_BACKFILL_DIR 下的一个目录：
+    - transactions.jsonl: 只追加的交易记录（每行一条 API 返回的原始交易）
+    - checkpoint.json: 断点（cursor、最后一条交易的时间戳、已提交的文件长度、状态）
+
+    每获取一页就追加写入并 fsync，然后原子替换断点，内存中只保留一页。
+    中断（崩溃、重启、请求失败）后再次运行时：
+    - 先把 transactions.jsonl 截断到断点记录的长度（丢弃写了一半、未提交的页）
+    - 优先用断点中的 cursor 继续；cursor 被拒绝（HTTP 400）时从最后一条交易的时间戳重新查询，
+      跳过该秒内已经写入的交易
+    """
+
+    def __init__(self, collector: Optional[WhaleAlertCollector] = None, root: Optional[str] = None):
+        """
+        初始化回填任务
+
+        参数:
+        - collector: WhaleAlertCollector（默认新建，回填优先级）
+        - root: 存储目录，默认读取 WHALE_BACKFILL_DIR
+        """
+        self.collector = collector or WhaleAlertCollector()
+        self.root = Path(root or settings.WHALE_BACKFILL_DIR)
+
+    def _paths(self, currency: str, min_value: int) -> tuple:
+        job_dir = self.root / f"{currency.lower()}_{int(min_value)}"
+        return job_dir / 'transactions.jsonl', job_dir / 'checkpoint.json'
+
+    def checkpoint(self, currency: str, min_value: int) -> dict:
+        """
+        读取断点
+
+        返回:
+        - 断点字典（没有时为空字典）
+        """
+        _, checkpoint_path = self._paths(currency, min_value)
+        if not checkpoint_path.exists():
+            return {}
+        with open(checkpoint_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _save_checkpoint(self, currency: str, min_value: int, checkpoint: dict):
+        """原子写入断点（先写临时文件再替换）"""
+        _, checkpoint_path = self._paths(currency, min_value)
+        checkpoint['updated_at'] = datetime.now().isoformat()
+        tmp_path = checkpoint_path.with_suffix('.json.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(checkpoint, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, checkpoint_path)
+
+    def run(self, start: datetime, end: datetime, currency: str = 'btc', min_value: int = 500000,
+            limit: int = 100, restart: bool = False) -> dict:
+        """
+        执行（或继续）回填
+
+        已有未完成的断点时继续该断点的时间范围（忽略 start / end），已完成时直接返回。
+
+        参数:
+        - start: 开始时间
+        - end: 结束时间
+        - currency: 币种
+        - min_value: 最小转账金额（美元）
+        - limit: 每页最大记录数
+        - restart: 丢弃已有的断点和数据，重新开始
+
+        返回:
+        - 最新的断点字典
+        """
+        data_path, _ = self._paths(currency, min_value)
+        checkpoint = {} if restart else self.checkpoint(currency, min_value)
+
+        if checkpoint.get('status') == STATUS_DONE:
+            print(f"回填已完成: {checkpoint['transactions']} 条交易（使用 restart 重新开始）", flush=True)
+            return checkpoint
+
+        if not checkpoint:
+            start_ts, end_ts = self.collector._clamp_range(start, end)
+            checkpoint = {
+                'currency': currency.lower(),
+                'min_value': int(min_value),
+                'limit': limit,
+                'start': start_ts,
+                'end': end_ts,
+                'cursor': None,
+                'last_timestamp': None,
+                'boundary_hashes': [],
+                'offset': 0,
+                'pages': 0,
+                'transactions': 0,
+                'status': STATUS_RUNNING,
+                'error': None,
+                'created_at': datetime.now().isoformat(),
+            }
+            data_path.parent.mkdir(parents=True, exist_ok=True)
+            data_path.unlink(missing_ok=True)
+            self._save_checkpoint(currency, min_value, checkpoint)
+        else:
+            print(f"从断点继续: 已有 {checkpoint['pages']} 页 / {checkpoint['transactions']} 条交易，"
+                  f"{'使用 cursor' if checkpoint['cursor'] else '从最后时间戳'}继续", flush=True)
+
+        # 起始时间不能早于 API 允许的最早时间（断点可能是很久以前留下的）
+        earliest = int(time.time()) - self.collector.MAX_HISTORY_SECONDS + 1
+        cursor = checkpoint['cursor']
+        query_start = checkpoint['start'] if cursor else max(checkpoint['start'], checkpoint['last_timestamp'] or 0)
+        query_start = max(query_start, earliest)
+        last_timestamp = checkpoint['last_timestamp']
+        boundary = set(checkpoint['boundary_hashes'])
+        # 不用 cursor 时从最后时间戳重新查询，该秒内已经写入的交易会再次返回
+        resume_timestamp = last_timestamp if not cursor else None
+        resume_hashes = set(boundary)
+
+        checkpoint['status'] = STATUS_RUNNING
+        checkpoint['error'] = None
+        started = time.monotonic()
+        fetched = 0
+        pages_fetched = 0
+
+        with open(data_path, 'a+b') as f:
+            # 丢弃断点之后写了一半的数据
+            f.truncate(checkpoint['offset'])
+            pages = self.collector.iter_pages(query_start, checkpoint['end'], checkpoint['min_value'],
+                                              checkpoint['currency'], checkpoint['limit'], cursor=cursor)
+            for transactions, next_cursor in pages:
+                # 从时间戳继续时，跳过已经写入的交易
+                if resume_timestamp is not None:
+                    transactions = [
+                        tx for tx in transactions
+                        if tx.get('timestamp', 0) > resume_timestamp
+                        or (tx.get('timestamp', 0) == resume_timestamp and tx.get('hash') not in resume_hashes)
+                    ]
+
+                if transactions:
+                    f.write(''.join(json.dumps(tx, ensure_ascii=False) + '\n' for tx in transactions).encode('utf-8'))
+                    f.flush()
+                    os.fsync(f.fileno())
+                    page_last = max(tx.get('timestamp', 0) for tx in transactions)
+                    if page_last != last_timestamp:
+                        boundary = set()
+                        last_timestamp = page_last
+                    boundary.update(tx.get('hash') for tx in transactions if tx.get('timestamp', 0) == page_last)
+
+                fetched += len(transactions)
+                pages_fetched += 1
+                checkpoint.update({
+                    'cursor': next_cursor,
+                    'last_timestamp': last_timestamp,
+                    'boundary_hashes': sorted(h for h in boundary if h),
+                    'offset': f.tell(),
+                    'pages': checkpoint['pages'] + 1,
+                    'transactions': checkpoint['transactions'] + len(transactions),
+                })
+                self._save_checkpoint(currency, min_value, checkpoint)
+                if checkpoint['pages'] % 10 == 0:
+                    progress = ''
+                    if last_timestamp:
+                        progress = f"，进度 {datetime.fromtimestamp(last_timestamp).strftime('%Y-%m-%d %H:%M:%S')}"
+                    print(f"回填 {currency.upper()}: {checkpoint['pages']} 页 / "
+                          f"{checkpoint['transactions']} 条交易{progress}", flush=True)
+
+        error = self.collector.last_error
+        if error:
+            checkpoint['status'] = STATUS_FAILED
+            checkpoint['error'] = error
+            if error.startswith('HTTP 400') and checkpoint['cursor']:
+                # cursor 失效，下次从最后时间戳继续
+                checkpoint['cursor'] = None
+            print(f"❌ 回填中断: {error}（再次运行将从断点继续）", flush=True)
+        else:
+            checkpoint['status'] = STATUS_DONE
+            checkpoint['cursor'] = None
+        elapsed = time.monotonic() - started
+        checkpoint['last_run'] = {'pages': pages_fetched, 'transactions': fetched, 'elapsed_s': round(elapsed, 2)}
+        self._save_checkpoint(currency, min_value, checkpoint)
+        return checkpoint
+
+    def iter_transactions(self, currency: str, min_value: int) -> Iterator[dict]:
+        """
+        逐条读取已提交的交易（不读取断点之后写了一半的数据）
+
+        返回:
+        - 迭代原始交易字典
+        """
+        data_path, _ = self._paths(currency, min_value)
+        if not data_path.exists():
+            return
+        committed = self.checkpoint(currency, min_value).get('offset', 0)
+        with open(data_path, 'rb') as f:
+            while f.tell() < committed:
+                line = f.readline()
+                if not line:
+                    break
+                yield json.loads(line)
+
+    def iter_dataframes(self, currency: str, min_value: int, chunk_size: int = 100000) -> Iterator[pd.DataFrame]:
+        """
+        分块读取已提交的交易（格式与 WhaleAlertCollector.get_transactions 相同）
+
+        参数:
+        - chunk_size: 每块的交易数（避免同时持有全部原始字典）
+
+        返回:
+        - 迭代 DataFrame
+        """
+        chunk = []
+        for tx in self.iter_transactions(currency, min_value):
+            chunk.append(tx)
+            if len(chunk) >= chunk_size:
+                yield self.collector._process_transactions_df(pd.DataFrame(chunk))
+                chunk = []
+        if chunk:
+            yield self.collector._process_transactions_df(pd.DataFrame(chunk))
+
+    def to_dataframe(self, currency: str, min_value: int, chunk_size: int = 100000) -> pd.DataFrame:
+        """
+        把已提交的交易转换为 DataFrame（格式与 WhaleAlertCollector.get_transactions 相同）
+
+        参数:
+        - chunk_size: 每次转换的交易数（分块处理，避免同时持有全部原始字典）
+
+        返回:
+        - DataFrame
+        """
+        frames = list(self.iter_dataframes(currency, min_value, chunk_size))
+        if not frames:
+            return pd.DataFrame()
+        return pd.concat(frames, ignore_index=True)
+
+
+class BackfillOrchestrator:
+    """
+    多币种并发回填
+
+    每个 (币种, 时间范围) 是一个可断点续传的 WhaleBackfill 任务，由线程池并发执行；
+    所有任务通过共享限流器（ratelimit:whale_alert）请求，总请求频率不超过 API 配额。
+    同一币种有多个时间范围时，每个范围使用单独的子目录保存断点。
+    完成后 merge() 把所有任务的交易追加到按币种和日期分区的交易列式存储。
+    """
+
+    def __init__(self, min_value: int = 500000, workers: Optional[int] = None,
+                 root: Optional[str] = None, api_key: Optional[str] = None):
+        """
+        初始化
+
+        参数:
+        - min_value: 最小转账金额（美元）
+        - workers: 同时执行的任务数，默认读取 WHALE_BACKFILL_WORKERS
+        - root: 回填目录，默认读取 WHALE_BACKFILL_DIR
+        - api_key: Whale Alert API密钥（默认读取配置）
+        """
+        self.min_value = int(min_value)
+        self.workers = max(1, workers or settings.WHALE_BACKFILL_WORKERS)
+        self.root = Path(root or settings.WHALE_BACKFILL_DIR)
+        self.api_key = api_key
+        self.last_report: List[dict] = []
+        self.elapsed_s = 0.0
+
+    def _backfill_for(self, jobs: List[tuple], job: tuple) -> WhaleBackfill:
+        """任务对应的 WhaleBackfill（每个任务一个收集器，错误状态互不影响）"""
+        currency, start, end = job
+        root = self.root
+        if sum(1 for c, _, _ in jobs if c.lower() == currency.lower()) > 1:
+            root = root / f"{start.strftime('%Y%m%d%H%M')}-{end.strftime('%Y%m%d%H%M')}"
+        return WhaleBackfill(WhaleAlertCollector(self.api_key), root=root)
+
+    def run(self, jobs: List[tuple], restart: bool = False) -> List[dict]:
+        """
+        并发执行回填任务
+
+        参数:
+        - jobs: [(币种, 开始时间, 结束时间)]
+        - restart: 丢弃已有的断点重新开始
+
+        返回:
+        - 每个任务的报告（币种、状态、页数、交易数、耗时、吞吐量），同时保存在 last_report
+        """
+        backfills = [self._backfill_for(jobs, job) for job in jobs]
+        started = time.monotonic()
+        reports = []
+
+        def run_one(backfill: WhaleBackfill, job: tuple) -> dict:
+            currency, start, end = job
+            try:
+                checkpoint = backfill.run(start, end, currency=currency, min_value=self.min_value,
+                                          restart=restart)
+            except Exception as e:
+                print(f"❌ {currency.upper()} 回填出错: {e}", flush=True)
+                checkpoint = dict(backfill.checkpoint(currency, self.min_value), status=STATUS_FAILED, error=str(e))
+                checkpoint.pop('last_run', None)
+            last_run = checkpoint.get('last_run') or {}
+            elapsed = last_run.get('elapsed_s', 0)
+            report = {
+                'currency': currency.lower(),
+                'start': start,
+                'end': end,
+                'status': checkpoint.get('status'),
+                'error': checkpoint.get('error'),
+                'total_transactions': checkpoint.get('transactions', 0),
+                'pages': last_run.get('pages', 0),
+                'transactions': last_run.get('transactions', 0),
+                'elapsed_s': elapsed,
+                'tx_per_s': round(last_run.get('transactions', 0) / elapsed, 1) if elapsed else 0.0,
+            }
+            print(f"{currency.upper()} 回填{'完成' if report['status'] == STATUS_DONE else '中断'}: "
+                  f"本次 {report['pages']} 页 / {report['transactions']} 条交易 / {elapsed} 秒 "
+                  f"({report['tx_per_s']} 条/秒)，累计 {report['total_transactions']} 条", flush=True)
+            return report
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = [executor.submit(run_one, backfill, job) for backfill, job in zip(backfills, jobs)]
+            for future in futures:
+                reports.append(future.result())
+
+        self.elapsed_s = round(time.monotonic() - started, 2)
+        self.last_report = reports
+        return reports
+
+    def merge(self, jobs: List[tuple], store=None) -> Dict[str, int]:
+        """
+        把回填结果追加到交易列式存储（TransactionStore，按币种和日期分区）
+
+        按页读取每个任务已提交的交易并写入，内存中只保留写入缓冲和涉及分区的交易哈希；
+        存储中已有的交易（包括时间范围重叠造成的重复）会被跳过，重复合并不会产生重复数据。
+
+        参数:
+        - jobs: 与 run() 相同的任务列表
+        - store: TransactionStore（默认使用 WHALE_DATASET_DIR）
+
+        返回:
+        - {币种: 新增的交易数}
+        """
+        from src.storage.transaction_store import TransactionStore
+        store = store or TransactionStore()
+        rows: Dict[str, int] = {}
+        for job in jobs:
+            currency = job[0].lower()
+            backfill = self._backfill_for(jobs, job)
+            with store.writer(currency) as writer:
+                page = []
+                for tx in backfill.iter_transactions(currency, self.min_value):
+                    page.append(tx)
+                    if len(page) >= 10000:
+                        rows[currency] = rows.get(currency, 0) + writer.append(page)
+                        page = []
+                rows[currency] = rows.get(currency, 0) + writer.append(page)
+        return rows
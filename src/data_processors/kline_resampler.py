@@ -0,0 +1,104 @@
+"""K线重采样 - 由 1 分钟K线向量化聚合出更粗的间隔，分桶方式与 Binance 相同"""
+import numpy as np
+
+from src.data_collectors.kline_codec import KLINE_DTYPE, empty_records
+from src.data_collectors.kline_downloader import INTERVAL_MS, DAY_MS
+
+
+# 可以由更细的K线聚合得到的间隔（Binance 的分桶方式）：
+# - 分钟、小时、1d：从 Unix 纪元（UTC 0 点）开始按固定长度对齐
+# - 1w：从周一 UTC 0 点开始（纪元是周四，偏移 4 天）
+# - 1M：自然月
+# 3d 的对齐起点不是纪元，不支持聚合
+_FIXED_OFFSET_MS = {'1w': 4 * DAY_MS}
+DERIVABLE_INTERVALS = ['3m', '5m', '15m', '30m', '1h', '2h', '4h', '6h', '8h', '12h', '1d', '1w', '1M']
+
+# 可求和的字段（按 Binance 的 8 位小数精度取整，与直接下载的值一致）
+_SUM_FIELDS = ['volume', 'quote_volume', 'taker_buy_base', 'taker_buy_quote']
+
+
+def can_derive(interval: str, base: str = '1m') -> bool:
+    """interval 是否可以由 base 间隔的K线聚合得到"""
+    if interval not in DERIVABLE_INTERVALS or base not in INTERVAL_MS or base == '1M':
+        return False
+    if interval == '1M':
+        return INTERVAL_MS[base] <= DAY_MS and DAY_MS % INTERVAL_MS[base] == 0
+    return INTERVAL_MS[interval] > INTERVAL_MS[base] and INTERVAL_MS[interval] % INTERVAL_MS[base] == 0
+
+
+def bucket_bounds(times_ms, interval: str) -> tuple:
+    """
+    计算时间所在K线的开盘时间和下一根K线的开盘时间
+
+    参数:
+    - times_ms: 毫秒时间戳（标量或数组）
+    - interval: K线间隔
+
+    返回:
+    - (开盘时间, 下一根K线开盘时间)，与输入形状相同的 int64
+    """
+    times_ms = np.asarray(times_ms, dtype=np.int64)
+    if interval == '1M':
+        months = times_ms.astype('datetime64[ms]').astype('datetime64[M]')
+        start = months.astype('datetime64[ms]').astype(np.int64)
+        end = (months + 1).astype('datetime64[ms]').astype(np.int64)
+        return start, end
+    step = INTERVAL_MS[interval]
+    offset = _FIXED_OFFSET_MS.get(interval, 0)
+    start = (times_ms - offset) // step * step + offset
+    return start, start + step
+
+
+def resample_records(records: np.ndarray, interval: str) -> np.ndarray:
+    """
+    把按开盘时间排序的K线聚合为更粗的间隔
+
+    open 取桶内第一根、close 取最后一根、high / low 取最大 / 最小、成交量和笔数求和，
+    全部用 ufunc.reduceat 一次完成。不检查桶是否完整（由调用方保证范围对齐）。
+
+    参数:
+    - records: KLINE_DTYPE 结构化数组（如 1m）
+    - interval: 目标间隔（如 '1h'）
+
+    返回:
+    - KLINE_DTYPE 结构化数组
+    """
+    if len(records) == 0:
+        return empty_records()
+    bucket, bucket_end = bucket_bounds(records['open_time'], interval)
+    starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+    ends = np.r_[starts[1:], len(records)] - 1
+
+    out = np.empty(len(starts), dtype=KLINE_DTYPE)
+    out['open_time'] = bucket[starts]
+    out['close_time'] = bucket_end[starts] - 1
+    out['open'] = records['open'][starts]
+    out['close'] = records['close'][ends]
+    out['high'] = np.maximum.reduceat(records['high'], starts)
+    out['low'] = np.minimum.reduceat(records['low'], starts)
+    out['trades'] = np.add.reduceat(records['trades'], starts)
+    for name in _SUM_FIELDS:
+        out[name] = np.round(np.add.reduceat(records[name], starts), 8)
+    return out
+
+
+def complete_bucket_mask(records: np.ndarray, covered: list) -> np.ndarray:
+    """
+    聚合结果中哪些K线的整个时间段都在已下载范围内（范围边缘被截断的桶不完整）
+
+    参数:
+    - records: 聚合后的 KLINE_DTYPE 数组
+    - covered: 基础K线已下载的时间段 [[开始毫秒, 结束毫秒]]（已合并、排序）
+
+    返回:
+    - 布尔数组
+    """
+    if len(records) == 0 or not covered:
+        return np.zeros(len(records), dtype=bool)
+    cov = np.asarray(covered, dtype=np.int64)
+    start = records['open_time']
+    end = records['close_time'] + 1
+    idx = np.searchsorted(cov[:, 0], start, side='right') - 1
+    valid = idx >= 0
+    idx = np.clip(idx, 0, None)
+    return valid & (end <= cov[idx, 1])
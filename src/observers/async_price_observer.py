@@ -0,0 +1,115 @@
+"""异步价格观察器 - 在事件循环中批量检查观察窗口"""
+import asyncio
+import time
+from datetime import datetime
+
+from src.storage.async_redis_client import AsyncRedisClient
+from src.data_collectors.async_binance import AsyncBinanceCollector
+from src.observers.tick import (
+    collect_pending, unindexed_expiries, tick_currencies, compute_price_updates, needs_snapshot_history,
+    build_tick_writes
+)
+
+
+class AsyncPriceObserver:
+    """异步价格观察器 - 与 PriceObserver 逻辑一致，在事件循环中运行"""
+
+    def __init__(self, redis_client: AsyncRedisClient, binance: AsyncBinanceCollector,
+                 check_interval: int = 300, concurrency: int = 20):
+        """
+        初始化异步价格观察器
+
+        参数:
+        - redis_client: 共享的异步 Redis 客户端
+        - binance: 共享的异步 Binance 收集器
+        - check_interval: 检查间隔（秒），默认5分钟
+        - concurrency: 同时读取快照列表的窗口数量上限（只有未记录最大/最小变化的旧窗口需要读取）
+        """
+        self.redis_client = redis_client
+        self.binance = binance
+        self.check_interval = check_interval
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.running = False
+
+    async def load_history(self, event_id: str) -> list:
+        """读取升级前创建的窗口的快照变化（这些窗口没有记录最大/最小变化）"""
+        async with self.semaphore:
+            snapshots = await self.redis_client.get_price_snapshots(event_id)
+            return [float(s.get('change_pct', 0)) for s in snapshots]
+
+    async def check_observations(self):
+        """检查所有活跃的观察窗口（与 PriceObserver.check_observations 相同：Redis 三次往返，每个币种一次价格查询）"""
+        try:
+            active_events, due = await self.redis_client.get_observation_schedule()
+            if active_events:
+                print(f"检查 {len(active_events)} 个活跃观察窗口（{len(due)} 个到期）...", flush=True)
+                states = await self.redis_client.load_observation_states(active_events)
+                pending, stale = collect_pending(active_events, states)
+                stale += sorted(set(due) - set(active_events))
+                # 不在到期索引中的窗口按 expires_at 判断是否到期，并在本次写入时补充到索引
+                expiry = unindexed_expiries(active_events, states)
+                if expiry:
+                    print(f"  {len(expiry)} 个窗口不在到期索引中，已按 expires_at 补充", flush=True)
+                    now = time.time()
+                    due = list(due) + [event_id for event_id, expires in expiry.items() if expires <= now]
+
+                updates = []
+                if pending:
+                    currencies = tick_currencies(pending)
+                    prices = await self.binance.get_current_prices(currencies)
+                    updates = compute_price_updates(pending, prices, due)
+                    if len(updates) < len(pending):
+                        missing = [currency.upper() for currency in currencies if not prices.get(currency)]
+                        print(f"  {len(pending) - len(updates)} 个窗口没有价格，本次跳过（{', '.join(missing)}）",
+                              flush=True)
+
+                # 读取快照失败的窗口本次不更新，下次检查重试
+                legacy = [update[0] for update in updates if needs_snapshot_history(update)]
+                results = await asyncio.gather(*(self.load_history(e) for e in legacy), return_exceptions=True)
+                history = {}
+                failed = set()
+                for event_id, result in zip(legacy, results):
+                    if isinstance(result, BaseException):
+                        print(f"检查观察窗口 {event_id} 时出错: {result}", flush=True)
+                        failed.add(event_id)
+                    else:
+                        history[event_id] = result
+                if failed:
+                    updates = [update for update in updates if update[0] not in failed]
+
+                snapshots, completions = build_tick_writes(updates, history)
+                await self.redis_client.save_tick_updates(snapshots, completions, stale, expiry)
+                for event_id, _, change_pct, direction, _, _ in completions:
+                    print(f"✓ 观察完成: {event_id[:8]}... | 变化: {change_pct:+.2f}% | 方向: {direction}", flush=True)
+        except Exception as e:
+            print(f"检查观察窗口时出错: {e}", flush=True)
+        finally:
+            try:
+                await self.redis_client.update_stats()
+            except Exception:
+                pass  # 如果更新失败，不影响主流程
+
+    async def run(self):
+        """运行观察循环（直到 stop() 或任务被取消）"""
+        self.running = True
+        print(f"异步价格观察器启动，每 {self.check_interval} 秒检查一次", flush=True)
+        try:
+            backfilled = await self.redis_client.backfill_expiry_index()
+            if backfilled:
+                print(f"已为 {backfilled} 个观察窗口补充到期索引", flush=True)
+        except Exception as e:
+            print(f"补充到期索引失败: {e}", flush=True)
+
+        check_count = 0
+        while self.running:
+            await self.check_observations()
+            check_count += 1
+            if check_count % 12 == 0:
+                print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] 心跳: 观察器运行正常，已检查 {check_count} 次", flush=True)
+            await asyncio.sleep(self.check_interval)
+
+        print("异步价格观察器已停止", flush=True)
+
+    def stop(self):
+        """停止观察循环"""
+        self.running = False
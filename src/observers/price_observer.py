@@ -5,107 +5,92 @@ from datetime import datetime, timedelta
 from typing import Optional
 from src.storage.redis_client import RedisClient
 from src.data_collectors.binance import BinanceCollector
+from src.observers.tick import (
+    collect_pending, unindexed_expiries, tick_currencies, compute_price_updates, needs_snapshot_history,
+    build_tick_writes
+)
 
 
 class PriceObserver:
     """价格观察器 - 定期检查所有活跃观察窗口的价格变化"""
     
-    def __init__(self, check_interval: int = 300, window_hours: int = 24):
+    def __init__(self, check_interval: int = 300, window_hours: int = 24,
+                 binance: Optional[BinanceCollector] = None):
         """
         初始化价格观察器
         
         参数:
         - check_interval: 检查间隔（秒），默认5分钟
         - window_hours: 观察窗口小时数，默认24小时
+        - binance: Binance 收集器（默认新建，与其他收集器共用同一个 HTTP 连接池）
         """
         self.check_interval = check_interval
         self.window_hours = window_hours
         self.redis_client = RedisClient()
-        self.binance = BinanceCollector()
+        self.binance = binance or BinanceCollector()
         self.running = False
         self.thread = None
     
     def check_observations(self):
-        """检查所有活跃的观察窗口"""
+        """
+        检查所有活跃的观察窗口
+        
+        Redis 往返次数与窗口数无关：活跃列表和到期窗口（到期索引 ZRANGEBYSCORE）一次，
+        所有观察窗口和事件一次，所有快照和完成的观察一次；每个币种只查询一次价格，变化整列计算
+        """
         try:
-            active_events = self.redis_client.get_active_observations()
+            active_events, due = self.redis_client.get_observation_schedule()
             
             if not active_events:
-                # 即使没有活跃窗口，也更新统计信息（确保 total_events 等是最新的）
-                self.redis_client.update_stats()
                 return
             
-            print(f"检查 {len(active_events)} 个活跃观察窗口...", flush=True)
+            print(f"检查 {len(active_events)} 个活跃观察窗口（{len(due)} 个到期）...", flush=True)
+            
+            # 读取所有观察窗口和事件
+            states = self.redis_client.load_observation_states(active_events)
+            pending, stale = collect_pending(active_events, states)
+            # 已不在活跃列表中的到期索引项
+            stale += sorted(set(due) - set(active_events))
+            # 不在到期索引中的窗口（索引写入失败等）按 expires_at 判断是否到期，并在本次写入时补充到索引
+            expiry = unindexed_expiries(active_events, states)
+            if expiry:
+                print(f"  {len(expiry)} 个窗口不在到期索引中，已按 expires_at 补充", flush=True)
+                now = time.time()
+                due = list(due) + [event_id for event_id, expires in expiry.items() if expires <= now]
             
-            for event_id in active_events:
-                try:
-                    # 获取观察窗口详情
-                    observation = self.redis_client.get_observation(event_id)
-                    if not observation:
-                        # 观察窗口不存在，从活跃列表移除
-                        self.redis_client.client.zrem("observations:active", event_id)
-                        continue
-                    
-                    if observation.get('status') != 'observing':
-                        continue
-                    
-                    # 获取事件信息
-                    event = self.redis_client.get_event(event_id)
-                    if not event:
-                        continue
-                    
-                    currency = event.get('currency', 'btc')
-                    baseline_price = float(event.get('baseline_price', 0))
-                    
-                    if baseline_price == 0:
-                        continue
-                    
-                    # 获取当前价格（BinanceCollector 会处理稳定币和交易对转换）
-                    current_price = self.binance.get_current_price(currency)
-                    if not current_price or current_price == 0:
-                        continue
-                    
-                    # 计算变化
-                    change_pct = ((current_price - baseline_price) / baseline_price) * 100
-                    
-                    # 添加快照
-                    self.redis_client.add_price_snapshot(event_id, current_price, change_pct)
-                    
-                    # 检查是否到期
-                    expires_at_str = observation.get('expires_at')
-                    if expires_at_str:
-                        expires_at = datetime.fromisoformat(expires_at_str)
-                        if datetime.now() >= expires_at:
-                            # 完成观察
-                            # 获取所有快照，计算最大最小变化
-                            snapshots = self.redis_client.get_price_snapshots(event_id)
-                            max_change = change_pct
-                            min_change = change_pct
-                            
-                            if snapshots:
-                                changes = [float(s.get('change_pct', 0)) for s in snapshots]
-                                if changes:
-                                    max_change = max(changes)
-                                    min_change = min(changes)
-                            
-                            direction = "up" if change_pct > 0 else "down"
-                            self.redis_client.complete_observation(
-                                event_id=event_id,
-                                final_price=current_price,
-                                final_change_pct=change_pct,
-                                direction=direction,
-                                max_change_pct=max_change,
-                                min_change_pct=min_change
-                            )
-                            
-                            print(f"✓ 观察完成: {event_id[:8]}... | 变化: {change_pct:+.2f}% | 方向: {direction}", flush=True)
-                            
-                            # 更新统计
-                            self.redis_client.update_stats()
-                
-                except Exception as e:
-                    print(f"检查观察窗口 {event_id} 时出错: {e}", flush=True)
-                    continue
+            updates = []
+            if pending:
+                # 按币种分组：每个币种只查询一次价格（一次批量请求，BinanceCollector 会处理稳定币和交易对转换），
+                # 再整列计算所有窗口的变化和到期状态，耗时取决于币种数而不是窗口数
+                currencies = tick_currencies(pending)
+                prices = self.binance.get_current_prices(currencies)
+                updates = compute_price_updates(pending, prices, due)
+                if len(updates) < len(pending):
+                    missing = [currency.upper() for currency in currencies if not prices.get(currency)]
+                    print(f"  {len(pending) - len(updates)} 个窗口没有价格，本次跳过（{', '.join(missing)}）", flush=True)
+            
+            # 升级前创建的窗口没有记录最大/最小变化，到期时从快照列表计算；
+            # 读取失败的窗口本次不更新（保留在活跃列表中，下次检查重试）
+            history = {}
+            failed = set()
+            for update in updates:
+                if needs_snapshot_history(update):
+                    event_id = update[0]
+                    try:
+                        history[event_id] = [float(s.get('change_pct', 0))
+                                             for s in self.redis_client.get_price_snapshots(event_id)]
+                    except Exception as e:
+                        print(f"检查观察窗口 {event_id} 时出错: {e}", flush=True)
+                        failed.add(event_id)
+            if failed:
+                updates = [update for update in updates if update[0] not in failed]
+            
+            # 写入快照、最大/最小变化和完成的观察
+            snapshots, completions = build_tick_writes(updates, history)
+            self.redis_client.save_tick_updates(snapshots, completions, stale, expiry)
+            
+            for event_id, _, change_pct, direction, _, _ in completions:
+                print(f"✓ 观察完成: {event_id[:8]}... | 变化: {change_pct:+.2f}% | 方向: {direction}", flush=True)
         
         except Exception as e:
             print(f"检查观察窗口时出错: {e}", flush=True)
@@ -120,6 +105,12 @@ class PriceObserver:
         """运行观察器（阻塞）"""
         self.running = True
         print(f"价格观察器启动，每 {self.check_interval} 秒检查一次", flush=True)
+        try:
+            backfilled = self.redis_client.backfill_expiry_index()
+            if backfilled:
+                print(f"已为 {backfilled} 个观察窗口补充到期索引", flush=True)
+        except Exception as e:
+            print(f"补充到期索引失败: {e}", flush=True)
         
         check_count = 0
         while self.running:
@@ -0,0 +1,160 @@
+"""观察器单次检查的批量计算 - 按币种分组取价，向量化计算所有窗口的价格变化和到期状态，整理为一次批量写入"""
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+def collect_pending(event_ids: List[str], states: List[tuple]) -> Tuple[list, list]:
+    """
+    从批量读取的观察窗口和事件中挑出需要更新的窗口
+
+    参数:
+    - event_ids: 活跃观察窗口的事件ID
+    - states: 与 event_ids 对应的 [(observation, event, expiry), ...]（RedisClient.load_observation_states）
+
+    返回:
+    - (pending, stale)：pending 为 [(event_id, observation, currency, baseline_price), ...]，
+      stale 为观察窗口已不存在、需要从活跃列表移除的事件ID
+    """
+    pending = []
+    stale = []
+    for event_id, (observation, event, _) in zip(event_ids, states):
+        # 单个窗口的数据有问题时只跳过该窗口，不影响本次检查的其他窗口
+        try:
+            if not observation:
+                stale.append(event_id)
+                continue
+            if observation.get('status') != 'observing' or not event:
+                continue
+            baseline_price = float(event.get('baseline_price', 0))
+            if not baseline_price:
+                continue
+            pending.append((event_id, observation, event.get('currency', 'btc'), baseline_price))
+        except Exception as e:
+            print(f"检查观察窗口 {event_id} 时出错: {e}", flush=True)
+    return pending, stale
+
+
+def unindexed_expiries(event_ids: List[str], states: List[tuple]) -> Dict[str, float]:
+    """
+    不在到期索引中的观察窗口的到期时间（从 expires_at 解析，与 RedisClient.backfill_expiry_index 相同）
+
+    正常情况下为空；到期索引写入失败或升级后启动前创建的窗口会出现在这里，
+    观察器据此判断是否到期，并在本次写入时补充到到期索引。
+
+    参数:
+    - event_ids: 活跃观察窗口的事件ID
+    - states: 与 event_ids 对应的 [(observation, event, expiry), ...]
+
+    返回:
+    - {event_id: 到期时间（epoch 秒）}，expires_at 缺失或无效时为 0（立即到期）
+    """
+    expiries = {}
+    for event_id, (observation, _, expiry) in zip(event_ids, states):
+        if expiry is not None or not observation:
+            continue
+        try:
+            expiries[event_id] = datetime.fromisoformat(observation['expires_at']).timestamp()
+        except (KeyError, TypeError, ValueError):
+            expiries[event_id] = 0
+    return expiries
+
+
+def tick_currencies(pending: List[tuple]) -> List[str]:
+    """
+    本次检查需要查询价格的币种（去重，保持首次出现的顺序）
+
+    参数:
+    - pending: [(event_id, observation, currency, baseline_price), ...]
+
+    返回:
+    - 币种列表，每个币种只查询一次价格
+    """
+    return list(dict.fromkeys(currency for _, _, currency, _ in pending))
+
+
+def _float_column(observations: List[dict], field: str) -> np.ndarray:
+    """观察窗口中的数值字段（缺失为 NaN）"""
+    return pd.to_numeric(pd.Series([observation.get(field) for observation in observations], dtype=object),
+                         errors='coerce').to_numpy(dtype=float)
+
+
+def compute_price_updates(pending: List[tuple], prices: Dict[str, float], due: Iterable[str] = ()) -> List[tuple]:
+    """
+    把每个币种的当前价格应用到该币种的所有观察窗口
+
+    币种编码为整数后一次性取出每个窗口的当前价格，变化百分比和最大/最小变化都是整列计算，
+    耗时与窗口数量基本无关（同一币种的 200 个窗口与 1 个窗口共用一次价格查询）。
+    到期的窗口来自到期索引（observations:expiry 的 ZRANGEBYSCORE），只有不在索引中的窗口才解析 expires_at
+    （unindexed_expiries）。
+
+    参数:
+    - pending: [(event_id, observation, currency, baseline_price), ...]
+    - prices: {币种: 当前价格}
+    - due: 已到期的事件ID（RedisClient.get_observation_schedule，加上 unindexed_expiries 中已到期的窗口）
+
+    返回:
+    - [(event_id, observation, current_price, change_pct, max_change_pct, min_change_pct, expired), ...]，
+      没有价格的币种的窗口被跳过；最大/最小变化包含本次变化
+    """
+    if not pending:
+        return []
+    codes, currencies = pd.factorize(pd.Series([currency for _, _, currency, _ in pending], dtype=object))
+    currency_prices = np.array([prices.get(currency) or np.nan for currency in currencies], dtype=float)
+    current = currency_prices[codes]
+    baseline = np.array([baseline_price for _, _, _, baseline_price in pending], dtype=float)
+    change_pct = (current - baseline) / baseline * 100
+
+    # 观察窗口中记录的最大/最小变化（每次检查更新，完成时不需要读取全部快照）
+    observations = [observation for _, observation, _, _ in pending]
+    max_change = np.fmax(_float_column(observations, 'max_change_pct'), change_pct)
+    min_change = np.fmin(_float_column(observations, 'min_change_pct'), change_pct)
+
+    due = set(due)
+    expired = np.fromiter((event_id in due for event_id, _, _, _ in pending), dtype=bool, count=len(pending))
+
+    return [
+        (pending[i][0], pending[i][1], float(current[i]), float(change_pct[i]),
+         float(max_change[i]), float(min_change[i]), bool(expired[i]))
+        for i in np.flatnonzero(np.isfinite(current))
+    ]
+
+
+def needs_snapshot_history(update: tuple) -> bool:
+    """
+    到期的窗口是否需要读取快照列表计算最大/最小变化
+
+    升级前创建的观察窗口没有记录最大/最小变化，完成时仍从快照列表计算（只有这些窗口多一次读取）
+    """
+    _, observation, _, _, _, _, expired = update
+    return expired and 'max_change_pct' not in observation
+
+
+def build_tick_writes(updates: List[tuple], history: Optional[Dict[str, List[float]]] = None) -> Tuple[list, list]:
+    """
+    把本次检查的结果整理为一次批量写入
+
+    参数:
+    - updates: compute_price_updates 的结果
+    - history: {event_id: 快照中的变化百分比列表}（needs_snapshot_history 的窗口）
+
+    返回:
+    - (snapshots, completions)：snapshots 为 [(event_id, price, change_pct, max_change_pct, min_change_pct), ...]，
+      completions 为 [(event_id, final_price, final_change_pct, direction, max_change_pct, min_change_pct), ...]
+    """
+    history = history or {}
+    snapshots = []
+    completions = []
+    for event_id, _, current_price, change_pct, max_change, min_change, expired in updates:
+        snapshots.append((event_id, current_price, change_pct, max_change, min_change))
+        if not expired:
+            continue
+        changes = history.get(event_id)
+        if changes:
+            max_change = max(max(changes), change_pct)
+            min_change = min(min(changes), change_pct)
+        direction = "up" if change_pct > 0 else "down"
+        completions.append((event_id, current_price, change_pct, direction, max_change, min_change))
+    return snapshots, completions
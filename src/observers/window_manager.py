@@ -15,9 +15,11 @@ class WindowManager:
         获取所有活跃的观察窗口
         
         返回:
-        - 观察窗口列表，包含事件和观察信息
+        - 观察窗口列表（按到期时间排序，最先到期的在前），包含事件、观察信息和到期时间 expires_ts（epoch 秒，
+          来自到期索引 observations:expiry；不在索引中的旧窗口为 None）
         """
         active_events = self.redis_client.get_active_observations()
+        expiry_times = self.redis_client.get_expiry_times()
         windows = []
         
         for event_id in active_events:
@@ -29,9 +31,11 @@ class WindowManager:
                     'event_id': event_id,
                     'event': event,
                     'observation': observation,
+                    'expires_ts': expiry_times.get(event_id),
                     'snapshots': self.redis_client.get_price_snapshots(event_id)
                 })
         
+        windows.sort(key=lambda w: w['expires_ts'] if w['expires_ts'] is not None else float('inf'))
         return windows
     
     def get_completed_results(self, limit: int = 100) -> List[Dict]:
@@ -0,0 +1,421 @@
+"""地址标签索引 - 把数百万个已标注的地址压缩为排序的 64 位哈希数组，判断转账是否转入 / 转出交易所"""
+import os
+import threading
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from config import settings
+
+
+# 转账方向（aggregate_events_to_time_series 的 net_direction = in - out）
+DIRECTION_IN = 'in'              # 转入交易所
+DIRECTION_OUT = 'out'            # 转出交易所
+DIRECTION_INTERNAL = 'internal'  # 交易所之间
+DIRECTION_UNKNOWN = 'unknown'
+
+# 哈希高位目录的位数：按哈希的前 DIRECTORY_BITS 位分桶，单个地址查找只需比较桶内的几个哈希
+DIRECTORY_BITS = 20
+
+_NO_ENTITY = -1
+
+
+def normalize_address(address) -> str:
+    """
+    规范化单个地址（去掉首尾空白；0x 开头的 EVM 地址不区分大小写，统一为小写）
+
+    参数:
+    - address: 地址（None / NaN 视为空字符串）
+
+    返回:
+    - 规范化后的地址
+    """
+    if not isinstance(address, str):
+        return '' if address is None or address != address else str(address)
+    address = address.strip()
+    return address.lower() if address.startswith('0x') else address
+
+
+def normalize_addresses(addresses: Iterable) -> np.ndarray:
+    """规范化地址序列（与 normalize_address 相同，整列字符串操作），返回 object 数组"""
+    values = addresses if isinstance(addresses, pd.Series) else pd.Series(addresses, dtype=object)
+    values = values.fillna('').astype(str).str.strip()
+    values = values.where(~values.str.startswith('0x'), values.str.lower())
+    return values.to_numpy(dtype=object)
+
+
+def hash_addresses(addresses: Iterable) -> np.ndarray:
+    """
+    计算地址的 64 位哈希（pandas 的 SipHash 实现，向量化，跨进程稳定）
+
+    参数:
+    - addresses: 地址序列
+
+    返回:
+    - uint64 数组
+    """
+    return pd.util.hash_array(normalize_addresses(addresses), categorize=False)
+
+
+class AddressIndex:
+    """
+    地址 → 实体索引
+
+    地址只保存 64 位哈希（排序的 uint64 数组）和实体编号（int32 数组），每个地址 12 字节；
+    1000 万个地址约 120MB，而 Python 字典约 1.5GB。碰撞概率约 n²/2⁶⁵（1000 万个地址约 3×10⁻⁶），可以忽略。
+
+    - 整列查找（DataFrame）: np.searchsorted 向量化
+    - 单个地址查找（WebSocket 警报）: 按哈希高位目录定位到桶，桶内平均只有几个哈希，O(1)
+    - 实体名称（如 "Binance"）也可以直接判断，WebSocket 警报的 from / to 通常是所有者名称而不是地址
+    """
+
+    def __init__(self, hashes: np.ndarray, entity_ids: np.ndarray, entities: List[str],
+                 entity_types: Optional[List[str]] = None):
+        """
+        初始化索引（通常使用 from_labels / from_csv / from_redis / load 构建）
+
+        参数:
+        - hashes: 排序、去重的 uint64 哈希数组
+        - entity_ids: 与 hashes 对应的实体编号
+        - entities: 实体名称列表
+        - entity_types: 实体类型列表（默认全部为 'exchange'）
+        """
+        self.hashes = np.ascontiguousarray(hashes, dtype=np.uint64)
+        self.entity_ids = np.ascontiguousarray(entity_ids, dtype=np.int32)
+        self.entities = list(entities)
+        self.entity_types = list(entity_types) if entity_types is not None else ['exchange'] * len(self.entities)
+        # 每个实体是否为交易所（最后一项对应 _NO_ENTITY）
+        self._exchange = np.array([t == 'exchange' for t in self.entity_types] + [False], dtype=bool)
+        self._entity_names = {name.lower(): i for i, name in enumerate(self.entities)}
+        self._shift = np.uint64(64 - DIRECTORY_BITS)
+        buckets = np.arange(1 << DIRECTORY_BITS, dtype=np.uint64) << self._shift
+        # 每个桶在 hashes 中的起始位置（int32 足够 20 亿个地址，目录只占 4MB）
+        offset_type = np.int32 if len(self.hashes) < 2 ** 31 else np.int64
+        self._directory = np.append(np.searchsorted(self.hashes, buckets), len(self.hashes)).astype(offset_type)
+
+    @classmethod
+    def empty(cls) -> 'AddressIndex':
+        return cls(np.empty(0, dtype=np.uint64), np.empty(0, dtype=np.int32), [])
+
+    @classmethod
+    def _from_parts(cls, hash_parts: list, id_parts: list, entities: List[str],
+                    entity_types: List[str]) -> 'AddressIndex':
+        """合并分块计算的哈希，排序并去掉重复地址（保留最后出现的标签）"""
+        if not hash_parts:
+            return cls(np.empty(0, dtype=np.uint64), np.empty(0, dtype=np.int32), entities, entity_types)
+        hashes = np.concatenate(hash_parts)
+        entity_ids = np.concatenate(id_parts)
+        order = np.argsort(hashes, kind='stable')
+        hashes = hashes[order]
+        entity_ids = entity_ids[order]
+        last = np.r_[hashes[1:] != hashes[:-1], True]
+        return cls(hashes[last], entity_ids[last], entities, entity_types)
+
+    @classmethod
+    def from_labels(cls, addresses: Iterable, entities: Iterable,
+                    entity_types: Optional[Iterable] = None, chunksize: int = 1_000_000) -> 'AddressIndex':
+        """
+        由地址和实体标签构建（分块计算哈希，字符串的临时副本不超过 chunksize 个）
+
+        参数:
+        - addresses: 地址序列
+        - entities: 与地址对应的实体名称（如 'Binance'）
+        - entity_types: 与地址对应的实体类型（默认全部为 'exchange'）
+        - chunksize: 每块的地址数
+
+        返回:
+        - AddressIndex
+        """
+        addresses = np.asarray(addresses, dtype=object)
+        entities = np.asarray(entities, dtype=object)
+        if entity_types is not None:
+            entity_types = np.asarray(entity_types, dtype=object)
+        builder = _LabelBuilder()
+        for i in range(0, len(addresses), chunksize):
+            builder.add(addresses[i:i + chunksize], entities[i:i + chunksize],
+                        entity_types[i:i + chunksize] if entity_types is not None else None)
+        return builder.build()
+
+    @classmethod
+    def from_csv(cls, path: str, chunksize: int = 1_000_000) -> 'AddressIndex':
+        """
+        从 CSV 文件构建（列: address, entity[, entity_type]），分块读取，内存中只保留哈希
+
+        参数:
+        - path: 文件路径
+        - chunksize: 每块的行数
+
+        返回:
+        - AddressIndex
+        """
+        builder = _LabelBuilder()
+        for chunk in pd.read_csv(path, dtype=str, chunksize=chunksize, keep_default_na=False):
+            builder.add(chunk['address'], chunk['entity'],
+                        chunk['entity_type'] if 'entity_type' in chunk.columns else None)
+        return builder.build()
+
+    @classmethod
+    def from_redis(cls, redis_client, prefix: Optional[str] = None, batch_size: int = 100000) -> 'AddressIndex':
+        """
+        从 Redis 集合构建：每个实体一个集合 {prefix}{实体名称}（如 address_labels:Binance），成员为地址
+
+        参数:
+        - redis_client: RedisClient
+        - prefix: 键前缀，默认读取 ADDRESS_LABELS_REDIS_PREFIX
+        - batch_size: 每批处理的地址数
+
+        返回:
+        - AddressIndex（实体类型均为 exchange）
+        """
+        prefix = prefix or settings.ADDRESS_LABELS_REDIS_PREFIX
+        client = redis_client.client
+        builder = _LabelBuilder()
+        for key in sorted(client.scan_iter(match=f"{prefix}*", count=1000)):
+            entity = key[len(prefix):]
+            batch = []
+            for address in client.sscan_iter(key, count=10000):
+                batch.append(address)
+                if len(batch) >= batch_size:
+                    builder.add(batch, [entity] * len(batch))
+                    batch = []
+            if batch:
+                builder.add(batch, [entity] * len(batch))
+        return builder.build()
+
+    def save(self, path: str):
+        """保存为 .npz（先写临时文件再替换），加载比重新解析标签文件快得多"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + '.tmp')
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, hashes=self.hashes, entity_ids=self.entity_ids,
+                     entities=np.array(self.entities, dtype=object),
+                     entity_types=np.array(self.entity_types, dtype=object))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> 'AddressIndex':
+        """加载 save() 保存的索引"""
+        with np.load(path, allow_pickle=True) as data:
+            return cls(data['hashes'], data['entity_ids'], data['entities'].tolist(), data['entity_types'].tolist())
+
+    def __len__(self) -> int:
+        return len(self.hashes)
+
+    @property
+    def nbytes(self) -> int:
+        """哈希、实体编号和目录占用的字节数"""
+        return self.hashes.nbytes + self.entity_ids.nbytes + self._directory.nbytes
+
+    def lookup(self, addresses: Iterable) -> np.ndarray:
+        """
+        整列查找地址的实体编号（向量化）
+
+        参数:
+        - addresses: 地址序列
+
+        返回:
+        - int32 数组，未标注的地址为 -1
+        """
+        hashes = hash_addresses(addresses)
+        if len(self.hashes) == 0:
+            return np.full(len(hashes), _NO_ENTITY, dtype=np.int32)
+        # 先排序查询再二分：顺序访问 hashes，千万级索引比随机查询快一个数量级（缓存命中）
+        order = np.argsort(hashes)
+        idx = np.empty(len(hashes), dtype=np.intp)
+        idx[order] = np.searchsorted(self.hashes, hashes[order])
+        idx = np.minimum(idx, len(self.hashes) - 1)
+        found = self.hashes[idx] == hashes
+        return np.where(found, self.entity_ids[idx], _NO_ENTITY).astype(np.int32)
+
+    def entity_id(self, address: str) -> int:
+        """
+        单个地址或实体名称的实体编号（O(1)，WebSocket 警报使用）
+
+        参数:
+        - address: 地址或所有者名称
+
+        返回:
+        - 实体编号，未知时为 -1
+        """
+        if not address:
+            return _NO_ENTITY
+        entity = self._entity_names.get(address.strip().lower())
+        if entity is not None:
+            return entity
+        h = pd.util.hash_array(np.array([normalize_address(address)], dtype=object), categorize=False)[0]
+        bucket = int(h >> self._shift)
+        lo, hi = int(self._directory[bucket]), int(self._directory[bucket + 1])
+        if lo == hi:
+            return _NO_ENTITY
+        i = lo + int(np.searchsorted(self.hashes[lo:hi], h))
+        if i < hi and self.hashes[i] == h:
+            return int(self.entity_ids[i])
+        return _NO_ENTITY
+
+    def entity_of(self, address: str) -> Optional[str]:
+        """单个地址或实体名称对应的实体名称（未知时为 None）"""
+        entity = self.entity_id(address)
+        return self.entities[entity] if entity != _NO_ENTITY else None
+
+    def is_exchange(self, address: str) -> bool:
+        """单个地址或实体名称是否属于交易所"""
+        return bool(self._exchange[self.entity_id(address)])
+
+    def classify(self, from_key: str, to_key: str) -> str:
+        """
+        单笔转账的方向
+
+        参数:
+        - from_key / to_key: 发送方 / 接收方的地址或所有者名称
+
+        返回:
+        - 'in'（转入交易所）、'out'（转出交易所）、'internal'（交易所之间）或 'unknown'
+        """
+        return _direction(self.is_exchange(from_key), self.is_exchange(to_key))
+
+    def exchange_mask(self, addresses: Iterable, owners: Optional[Iterable] = None,
+                      owner_types: Optional[Iterable] = None) -> np.ndarray:
+        """
+        整列判断是否属于交易所：地址在索引中、所有者名称是已知实体，或 Whale Alert 标注的所有者类型为 exchange
+
+        参数:
+        - addresses: 地址序列
+        - owners: 所有者名称序列（可选）
+        - owner_types: 所有者类型序列（可选）
+
+        返回:
+        - 布尔数组
+        """
+        mask = self._exchange[self.lookup(addresses)]
+        if owners is not None and self._entity_names:
+            names = pd.Series(owners, dtype=object).fillna('').astype(str).str.strip().str.lower()
+            exchange_names = [n for n, i in self._entity_names.items() if self._exchange[i]]
+            mask |= names.isin(exchange_names).to_numpy()
+        if owner_types is not None:
+            mask |= (pd.Series(owner_types, dtype=object) == 'exchange').to_numpy()
+        return mask
+
+    def classify_frame(self, df: pd.DataFrame) -> np.ndarray:
+        """
+        整个 DataFrame 的转账方向（向量化，列与 WhaleAlertCollector.get_transactions 相同）
+
+        参数:
+        - df: 包含 from_address / to_address（以及可选的 from_owner、from_owner_type 等）的 DataFrame
+
+        返回:
+        - 方向字符串数组
+        """
+        sides = []
+        for side in ('from', 'to'):
+            sides.append(self.exchange_mask(
+                df[f'{side}_address'] if f'{side}_address' in df.columns else [''] * len(df),
+                df.get(f'{side}_owner'),
+                df.get(f'{side}_owner_type'),
+            ))
+        from_exchange, to_exchange = sides
+        return np.select(
+            [from_exchange & to_exchange, to_exchange, from_exchange],
+            [DIRECTION_INTERNAL, DIRECTION_IN, DIRECTION_OUT],
+            default=DIRECTION_UNKNOWN
+        )
+
+    def entity_names(self, addresses: Iterable) -> np.ndarray:
+        """整列查找实体名称（未标注的地址为 None）"""
+        names = np.array(self.entities + [None], dtype=object)
+        return names[self.lookup(addresses)]
+
+
+def _direction(from_exchange: bool, to_exchange: bool) -> str:
+    if from_exchange and to_exchange:
+        return DIRECTION_INTERNAL
+    if to_exchange:
+        return DIRECTION_IN
+    if from_exchange:
+        return DIRECTION_OUT
+    return DIRECTION_UNKNOWN
+
+
+class _LabelBuilder:
+    """分块累积地址哈希和实体编号"""
+
+    def __init__(self):
+        self.entities: List[str] = []
+        self.entity_types: List[str] = []
+        self._entity_index = {}
+        self._hashes = []
+        self._ids = []
+
+    def add(self, addresses: Iterable, entities: Iterable, entity_types: Optional[Iterable] = None):
+        # 空地址不加入索引（否则所有缺少地址的交易都会命中），只有空地址的实体也不登记
+        normalized = normalize_addresses(addresses)
+        keep = normalized != ''
+        entities = pd.Series(entities, dtype=object).fillna('').astype(str).str.strip()[keep]
+        types = (pd.Series(entity_types, dtype=object).fillna('').astype(str).str.strip().str.lower()[keep]
+                 if entity_types is not None else pd.Series('exchange', index=entities.index))
+        codes, uniques = pd.factorize(entities)
+        mapping = np.empty(len(uniques), dtype=np.int32)
+        first_type = types.groupby(codes).first() if len(codes) else pd.Series(dtype=object)
+        for code, name in enumerate(uniques):
+            if name not in self._entity_index:
+                self._entity_index[name] = len(self.entities)
+                self.entities.append(name)
+                self.entity_types.append(first_type.get(code) or 'exchange')
+            mapping[code] = self._entity_index[name]
+        self._hashes.append(pd.util.hash_array(normalized[keep], categorize=False))
+        self._ids.append(mapping[codes])
+
+    def build(self) -> AddressIndex:
+        return AddressIndex._from_parts(self._hashes, self._ids, self.entities, self.entity_types)
+
+
+_shared_index = None
+_shared_index_lock = threading.Lock()
+
+
+def load_address_index() -> AddressIndex:
+    """
+    按配置加载索引：
+
+    - ADDRESS_LABELS_PATH 存在时读取该 CSV（编译结果缓存为同名 .npz，CSV 更新后自动重建）
+    - 否则 ADDRESS_LABELS_SOURCE=redis 时读取 Redis 集合 {ADDRESS_LABELS_REDIS_PREFIX}{实体}
+    - 都没有时返回空索引（只使用 Whale Alert 标注的所有者类型）
+
+    返回:
+    - AddressIndex
+    """
+    path = Path(settings.ADDRESS_LABELS_PATH)
+    if path.exists():
+        cache_path = path.with_suffix('.npz')
+        if cache_path.exists() and cache_path.stat().st_mtime >= path.stat().st_mtime:
+            return AddressIndex.load(cache_path)
+        index = AddressIndex.from_csv(path)
+        index.save(cache_path)
+        return index
+    if settings.ADDRESS_LABELS_SOURCE == 'redis':
+        from src.storage.redis_client import RedisClient
+        return AddressIndex.from_redis(RedisClient())
+    return AddressIndex.empty()
+
+
+def get_shared_address_index() -> AddressIndex:
+    """
+    获取进程内共享的地址索引（首次调用时加载，加载失败时为空索引）
+
+    返回:
+    - AddressIndex
+    """
+    global _shared_index
+    with _shared_index_lock:
+        if _shared_index is None:
+            try:
+                _shared_index = load_address_index()
+                if len(_shared_index):
+                    print(f"地址索引已加载: {len(_shared_index)} 个地址 / {len(_shared_index.entities)} 个实体 "
+                          f"({_shared_index.nbytes / 1024 / 1024:.0f}MB)", flush=True)
+            except Exception as e:
+                print(f"加载地址索引失败，只使用 Whale Alert 标注的所有者类型: {e}", flush=True)
+                _shared_index = AddressIndex.empty()
+        return _shared_index
@@ -0,0 +1,305 @@
+"""异步Redis客户端封装（redis.asyncio），键结构与 RedisClient 完全一致"""
+import json
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional, Dict, List, Tuple
+
+import redis
+import redis.asyncio as aioredis
+
+from config import settings
+from src.storage.redis_client import HSET_IF_EXISTS_SCRIPT, log_pipeline_errors, queue_tick_writes, result_mapping
+
+
+class AsyncRedisClient:
+    """异步Redis客户端封装，用于在单个事件循环中并发读写事件和观察数据"""
+
+    def __init__(self, redis_url: Optional[str] = None, max_connections: int = 50):
+        """
+        初始化异步Redis客户端（需要 await connect() 后使用）
+
+        参数:
+        - redis_url: Redis连接URL，默认读取 REDIS_URL；未配置时使用 REDIS_HOST 等配置
+        - max_connections: 连接池大小（决定最多同时进行的 Redis 请求数）
+        """
+        self.redis_url = redis_url or getattr(settings, 'REDIS_URL', '')
+        if self.redis_url:
+            self.client = aioredis.from_url(
+                self.redis_url,
+                decode_responses=True,
+                socket_connect_timeout=5,
+                max_connections=max_connections
+            )
+        else:
+            self.client = aioredis.Redis(
+                host=getattr(settings, 'REDIS_HOST', 'localhost'),
+                port=getattr(settings, 'REDIS_PORT', 6379),
+                db=getattr(settings, 'REDIS_DB', 0),
+                password=getattr(settings, 'REDIS_PASSWORD', None),
+                decode_responses=True,
+                socket_connect_timeout=5,
+                max_connections=max_connections
+            )
+
+    async def connect(self):
+        """测试连接"""
+        try:
+            await self.client.ping()
+            print("Redis连接成功（异步）", flush=True)
+        except redis.ConnectionError as e:
+            print(f"Redis连接失败: {e}", flush=True)
+            print(f"请确保Redis服务正在运行: docker-compose up -d", flush=True)
+            raise
+
+    async def close(self):
+        """关闭连接池"""
+        await self.client.aclose()
+
+    async def save_event(self, event_id: str, event_data: dict):
+        """保存事件数据（与 RedisClient.save_event 相同）"""
+        key = f"event:{event_id}"
+        event_data_str = {k: str(v) for k, v in event_data.items()}
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.hset(key, mapping=event_data_str)
+            pipe.expire(key, 86400 * 7)  # 7天过期
+            await pipe.execute()
+
+    async def get_event(self, event_id: str) -> Optional[Dict]:
+        """获取事件数据"""
+        data = await self.client.hgetall(f"event:{event_id}")
+        return data if data else None
+
+    async def create_observation(self, event_id: str, baseline_price: float,
+                                 window_hours: int = 24):
+        """创建观察窗口（与 RedisClient.create_observation 相同）"""
+        baseline_time = datetime.now()
+        expires_at = baseline_time + timedelta(hours=window_hours)
+
+        obs_key = f"observation:{event_id}"
+        obs_data = {
+            "baseline_price": str(baseline_price),
+            "baseline_time": baseline_time.isoformat(),
+            "window_hours": str(window_hours),
+            "status": "observing",
+            "expires_at": expires_at.isoformat()
+        }
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.hset(obs_key, mapping=obs_data)
+            # TTL设置为窗口时间 + 1小时缓冲
+            pipe.expire(obs_key, window_hours * 3600 + 3600)
+            pipe.zadd("observations:active", {event_id: baseline_time.timestamp()})
+            pipe.zadd("observations:expiry", {event_id: expires_at.timestamp()})
+            await pipe.execute()
+
+    async def save_alert_observations(self, items: List[tuple], window_hours: int = 24):
+        """在一个 pipeline 中保存事件并创建观察窗口（与 RedisClient.save_alert_observations 相同）"""
+        if not items:
+            return
+        baseline_time = datetime.now()
+        expires_at = baseline_time + timedelta(hours=window_hours)
+        active = {}
+        async with self.client.pipeline(transaction=False) as pipe:
+            for event_id, event_data, baseline_price in items:
+                event_key = f"event:{event_id}"
+                pipe.hset(event_key, mapping={k: str(v) for k, v in event_data.items()})
+                pipe.expire(event_key, 86400 * 7)
+                obs_key = f"observation:{event_id}"
+                pipe.hset(obs_key, mapping={
+                    "baseline_price": str(baseline_price),
+                    "baseline_time": baseline_time.isoformat(),
+                    "window_hours": str(window_hours),
+                    "status": "observing",
+                    "expires_at": expires_at.isoformat()
+                })
+                pipe.expire(obs_key, window_hours * 3600 + 3600)
+                active[event_id] = baseline_time.timestamp()
+            pipe.zadd("observations:active", active)
+            pipe.zadd("observations:expiry", {event_id: expires_at.timestamp() for event_id in active})
+            await pipe.execute()
+
+    async def get_observation(self, event_id: str) -> Optional[Dict]:
+        """获取观察窗口详情"""
+        data = await self.client.hgetall(f"observation:{event_id}")
+        return data if data else None
+
+    async def add_price_snapshot(self, event_id: str, price: float, change_pct: float):
+        """添加价格快照"""
+        key = f"snapshots:{event_id}"
+        snapshot = {
+            "time": datetime.now().isoformat(),
+            "price": str(price),
+            "change_pct": str(change_pct)
+        }
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.rpush(key, json.dumps(snapshot))
+            pipe.expire(key, 86400 * 7)  # 7天过期
+            await pipe.execute()
+
+    async def get_price_snapshots(self, event_id: str) -> List[Dict]:
+        """获取价格快照列表"""
+        snapshots = await self.client.lrange(f"snapshots:{event_id}", 0, -1)
+        return [json.loads(s) for s in snapshots]
+
+    async def complete_observation(self, event_id: str, final_price: float,
+                                   final_change_pct: float, direction: str,
+                                   max_change_pct: Optional[float] = None,
+                                   min_change_pct: Optional[float] = None):
+        """完成观察窗口（与 RedisClient.complete_observation 相同）"""
+        result_key = f"result:{event_id}"
+        result_data = result_mapping(final_price, final_change_pct, direction, max_change_pct, min_change_pct)
+
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.hset(result_key, mapping=result_data)
+            pipe.expire(result_key, 86400 * 30)  # 30天过期
+            pipe.eval(HSET_IF_EXISTS_SCRIPT, 1, f"observation:{event_id}", "status", "completed")
+            pipe.zrem("observations:active", event_id)
+            pipe.zrem("observations:expiry", event_id)
+            await pipe.execute()
+
+    async def load_observation_states(self, event_ids: List[str]) -> List[Tuple[Optional[Dict], Optional[Dict], Optional[float]]]:
+        """在一个 pipeline 中读取所有观察窗口、事件和到期时间（与 RedisClient.load_observation_states 相同）"""
+        if not event_ids:
+            return []
+        async with self.client.pipeline(transaction=False) as pipe:
+            for event_id in event_ids:
+                pipe.hgetall(f"observation:{event_id}")
+                pipe.hgetall(f"event:{event_id}")
+                pipe.zscore("observations:expiry", event_id)
+            results = await pipe.execute()
+        return [(results[i] or None, results[i + 1] or None, results[i + 2]) for i in range(0, len(results), 3)]
+
+    async def save_tick_updates(self, snapshots: List[tuple], completions: List[tuple], stale: List[str] = (),
+                                expiry: Optional[Dict[str, float]] = None):
+        """在一个 pipeline 中写入一次检查的所有快照和完成的观察（与 RedisClient.save_tick_updates 相同）"""
+        if not (snapshots or completions or stale or expiry):
+            return
+        async with self.client.pipeline(transaction=False) as pipe:
+            queue_tick_writes(pipe, snapshots, completions, stale, expiry)
+            log_pipeline_errors(await pipe.execute(raise_on_error=False), "写入观察窗口")
+
+    async def remove_active(self, event_id: str):
+        """从活跃列表和到期索引移除"""
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.zrem("observations:active", event_id)
+            pipe.zrem("observations:expiry", event_id)
+            await pipe.execute()
+
+    async def get_observation_schedule(self, now: Optional[float] = None) -> Tuple[List[str], List[str]]:
+        """读取活跃观察窗口和已到期的窗口（与 RedisClient.get_observation_schedule 相同）"""
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.zrange("observations:active", 0, -1)
+            pipe.zrangebyscore("observations:expiry", "-inf", now or time.time())
+            active, due = await pipe.execute()
+        return active, due
+
+    async def backfill_expiry_index(self) -> int:
+        """为到期索引之前创建的活跃观察窗口补充到期时间（与 RedisClient.backfill_expiry_index 相同）"""
+        active = await self.get_active_observations()
+        if not active:
+            return 0
+        async with self.client.pipeline(transaction=False) as pipe:
+            for event_id in active:
+                pipe.zscore("observations:expiry", event_id)
+            scores = await pipe.execute()
+        missing = [event_id for event_id, score in zip(active, scores) if score is None]
+        if not missing:
+            return 0
+        async with self.client.pipeline(transaction=False) as pipe:
+            for event_id in missing:
+                pipe.hget(f"observation:{event_id}", "expires_at")
+            values = await pipe.execute()
+        expiries = {}
+        for event_id, expires_at in zip(missing, values):
+            try:
+                expiries[event_id] = datetime.fromisoformat(expires_at).timestamp() if expires_at else 0
+            except ValueError:
+                expiries[event_id] = 0
+        await self.client.zadd("observations:expiry", expiries)
+        return len(expiries)
+
+    async def get_active_observations(self) -> List[str]:
+        """获取所有活跃的观察窗口"""
+        return await self.client.zrange("observations:active", 0, -1)
+
+    async def update_stats(self):
+        """更新统计信息（与 RedisClient.update_stats 相同）"""
+        total_events = 0
+        async for _ in self.client.scan_iter("event:*"):
+            total_events += 1
+        active_count = await self.client.zcard("observations:active")
+
+        completed_count = 0
+        up_count = 0
+        down_count = 0
+        async for key in self.client.scan_iter("result:*"):
+            completed_count += 1
+            direction = await self.client.hget(key, "direction")
+            if direction == 'up':
+                up_count += 1
+            elif direction == 'down':
+                down_count += 1
+
+        stats = {
+            "total_events": str(total_events),
+            "observing_count": str(active_count),
+            "completed_count": str(completed_count),
+            "up_count": str(up_count),
+            "down_count": str(down_count),
+            "updated_at": datetime.now().isoformat()
+        }
+        await self.client.hset("stats:summary", mapping=stats)
+
+    async def save_metrics(self, name: str, metrics: dict):
+        """保存运行指标到 metrics:{name}"""
+        key = f"metrics:{name}"
+        data = {k: str(v) for k, v in metrics.items()}
+        data["updated_at"] = datetime.now().isoformat()
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.hset(key, mapping=data)
+            pipe.expire(key, 86400)
+            await pipe.execute()
+
+    async def get_subscription_id(self, preferred: Optional[str] = None) -> str:
+        """获取稳定的 Whale Alert 订阅ID（与 RedisClient.get_subscription_id 相同）"""
+        if preferred:
+            return preferred
+        await self.client.set("ws:subscription_id", uuid.uuid4().hex, nx=True)
+        return await self.client.get("ws:subscription_id")
+
+    async def touch_alive(self):
+        """记录 WebSocket 最后存活时间（epoch 秒）"""
+        await self.client.set("ws:last_alive", str(time.time()))
+
+    async def get_last_alive(self) -> Optional[float]:
+        """获取 WebSocket 最后存活时间"""
+        value = await self.client.get("ws:last_alive")
+        return float(value) if value else None
+
+    async def clear_alive(self):
+        """正常停止时删除最后存活时间"""
+        await self.client.delete("ws:last_alive")
+
+    async def record_outage(self, record: dict, keep: int = 100):
+        """保存一次断线记录（最新的在前）"""
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.lpush("ws:outages", json.dumps(record))
+            pipe.ltrim("ws:outages", 0, keep - 1)
+            await pipe.execute()
+
+    async def claim_alert(self, tx_hash: str, ttl: int = 172800) -> bool:
+        """原子地占位一笔交易（与 RedisClient.claim_alert 相同）"""
+        now = time.time()
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.zremrangebyscore("alerts:seen", "-inf", now - ttl)
+            pipe.zadd("alerts:seen", {tx_hash: now}, nx=True)
+            _, added = await pipe.execute()
+        return bool(added)
+
+    async def release_alert(self, tx_hash: str):
+        """释放交易的占位（与 RedisClient.release_alert 相同）"""
+        await self.client.zrem("alerts:seen", tx_hash)
+
+    async def get_recent_alerts(self, ttl: int = 172800) -> List[str]:
+        """获取去重窗口内处理过的交易哈希"""
+        return await self.client.zrangebyscore("alerts:seen", time.time() - ttl, "+inf")
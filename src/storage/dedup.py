@@ -0,0 +1,185 @@
+"""警报去重 - 进程内布隆过滤器 + Redis 中的权威集合（alerts:seen）"""
+import hashlib
+import math
+import threading
+from typing import Iterable
+
+
+class BloomFilter:
+    """
+    布隆过滤器（线程安全）
+
+    使用两代位数组轮换：当前代写满 capacity 个元素后成为旧代，查询时同时检查两代，
+    因此内存有上限，且最近 capacity ~ 2*capacity 个元素一定可以查到。
+    """
+
+    def __init__(self, capacity: int = 100000, error_rate: float = 1e-6):
+        """
+        初始化布隆过滤器
+
+        参数:
+        - capacity: 每一代的元素数量
+        - error_rate: 每一代的误判率（两代合计约为 2 倍）
+        """
+        self.capacity = capacity
+        self.error_rate = error_rate
+        # 最优位数 m = -n ln(p) / (ln2)^2，哈希函数个数 k = m/n ln2
+        optimal_bits = -capacity * math.log(error_rate) / (math.log(2) ** 2)
+        self.num_hashes = max(1, round(optimal_bits / capacity * math.log(2)))
+        # 位数取 2 的幂，取位置时用位与代替取模
+        self.num_bits = 1 << max(6, math.ceil(math.log2(optimal_bits)))
+        self._mask = self.num_bits - 1
+        self._lock = threading.Lock()
+        self._current = bytearray((self.num_bits + 7) // 8)
+        self._previous = None
+        self._count = 0
+        self.rotations = 0
+
+    def _positions(self, item: str):
+        """增强双重哈希生成 k 个位置（普通双重哈希在位数较小时误判率明显偏高）"""
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little')
+        mask = self._mask
+        positions = []
+        for i in range(self.num_hashes):
+            positions.append(h1 & mask)
+            h1 += h2
+            h2 += i
+        return positions
+
+    @staticmethod
+    def _test(bits: bytearray, positions) -> bool:
+        for pos in positions:
+            if not bits[pos >> 3] & (1 << (pos & 7)):
+                return False
+        return True
+
+    def add(self, item: str):
+        """添加元素"""
+        positions = self._positions(item)
+        with self._lock:
+            if self._count >= self.capacity:
+                self._previous = self._current
+                self._current = bytearray(len(self._previous))
+                self._count = 0
+                self.rotations += 1
+            bits = self._current
+            for pos in positions:
+                bits[pos >> 3] |= 1 << (pos & 7)
+            self._count += 1
+
+    def __contains__(self, item: str) -> bool:
+        positions = self._positions(item)
+        with self._lock:
+            if self._test(self._current, positions):
+                return True
+            return self._previous is not None and self._test(self._previous, positions)
+
+    def __len__(self):
+        with self._lock:
+            return self._count + (self.capacity if self._previous is not None else 0)
+
+    @property
+    def size_bytes(self) -> int:
+        """占用的内存（字节）"""
+        return len(self._current) * (2 if self._previous is not None else 1)
+
+
+class AlertDeduplicator:
+    """
+    按交易哈希去重（同步和异步客户端共用，不做任何 I/O）
+
+    - 布隆过滤器命中：本进程已处理过（重连补发、同一警报的重复投递），直接丢弃，只需几微秒
+    - 布隆过滤器未命中：由调用方在 Redis 中原子地占位（ZADD NX alerts:seen），
+      占位失败说明其他实例或重启前的进程已处理过
+    - 只有保存成功的警报（mark_processed）才加入布隆过滤器；处理失败时调用方释放占位
+      （RedisClient.release_alert），重新投递的同一警报仍可以再次处理
+    """
+
+    def __init__(self, capacity: int = 100000, error_rate: float = 1e-6):
+        """
+        初始化去重器
+
+        参数:
+        - capacity: 布隆过滤器每一代的容量
+        - error_rate: 布隆过滤器误判率（误判的新警报会被丢弃，应设置得足够小）
+        """
+        self.bloom = BloomFilter(capacity, error_rate)
+        self._lock = threading.Lock()
+        self.local_hits = 0  # 布隆过滤器判定为重复
+        self.redis_hits = 0  # Redis 判定为重复（其他实例或重启前已处理）
+        self.misses = 0      # 新警报
+        self.errors = 0      # Redis 不可用，按新警报处理
+
+    def warm_up(self, tx_hashes: Iterable[str]) -> int:
+        """
+        用 Redis 中最近处理过的交易哈希预热布隆过滤器（启动时调用，重启后的补发也能在本地命中）
+
+        返回:
+        - 加载的数量
+        """
+        count = 0
+        for tx_hash in tx_hashes:
+            self.bloom.add(tx_hash)
+            count += 1
+        return count
+
+    def seen_locally(self, tx_hash: str) -> bool:
+        """
+        检查本进程是否处理过该交易（命中时计入 local_hits）
+
+        返回:
+        - True 表示重复
+        """
+        if tx_hash in self.bloom:
+            with self._lock:
+                self.local_hits += 1
+            return True
+        return False
+
+    def record_claim(self, tx_hash: str, claimed: bool):
+        """
+        记录 Redis 占位结果
+
+        参数:
+        - tx_hash: 交易哈希
+        - claimed: True 表示首次出现，False 表示其他实例已处理过
+        """
+        with self._lock:
+            if claimed:
+                self.misses += 1
+            else:
+                self.redis_hits += 1
+
+    def record_error(self, tx_hash: str):
+        """Redis 占位失败时调用（按新警报处理，不影响主流程）"""
+        with self._lock:
+            self.errors += 1
+            self.misses += 1
+
+    def mark_processed(self, tx_hash: str):
+        """警报保存成功后调用，之后的重复投递在本地直接丢弃"""
+        self.bloom.add(tx_hash)
+
+    def stats(self) -> dict:
+        """
+        获取去重统计
+
+        返回:
+        - 统计字典
+        """
+        with self._lock:
+            hits = self.local_hits + self.redis_hits
+            total = hits + self.misses
+            return {
+                "checked": total,
+                "duplicates": hits,
+                "local_hits": self.local_hits,
+                "redis_hits": self.redis_hits,
+                "misses": self.misses,
+                "errors": self.errors,
+                "hit_rate": round(hits / total, 4) if total else 0.0,
+                "bloom_items": len(self.bloom),
+                "bloom_bytes": self.bloom.size_bytes,
+            }
@@ -0,0 +1,270 @@
+"""K线本地存储 - 按 (交易对, 间隔) 保存为 NumPy 二进制文件，只下载缺失的时间段"""
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+from config import settings
+from src.data_collectors.kline_codec import KLINE_DTYPE, records_to_dataframe
+from src.data_collectors.kline_downloader import INTERVAL_MS, KlineDownloader
+from src.data_processors.kline_resampler import (
+    bucket_bounds, can_derive, complete_bucket_mask, resample_records
+)
+from src.storage.rate_limiter import PRIORITY_BACKFILL
+
+
+def _merge_ranges(ranges: List[list]) -> List[list]:
+    """合并重叠或相邻的 [开始, 结束) 区间"""
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def _subtract_ranges(start: int, end: int, covered: List[list]) -> List[tuple]:
+    """[start, end) 中未被 covered 覆盖的部分"""
+    missing = []
+    cursor = start
+    for c_start, c_end in covered:
+        if c_end <= cursor:
+            continue
+        if c_start >= end:
+            break
+        if c_start > cursor:
+            missing.append((cursor, c_start))
+        cursor = max(cursor, c_end)
+    if cursor < end:
+        missing.append((cursor, end))
+    return missing
+
+
+class KlineStore:
+    """
+    K线本地存储
+
+    每个 (交易对, 间隔) 对应两个文件：
+    - {SYMBOL}_{interval}.npy: 按 open_time 排序的 KLINE_DTYPE 数组（读取时内存映射）
+    - {SYMBOL}_{interval}.json: 已下载的时间段（包括 Binance 上没有数据的时间段，如上线之前）
+
+    请求某个时间段时只下载未覆盖的部分；未收盘的K线不会写入存储。
+    """
+
+    def __init__(self, root: Optional[str] = None, collector=None, downloader: Optional[KlineDownloader] = None):
+        """
+        初始化存储
+
+        参数:
+        - root: 存储目录，默认读取 KLINE_CACHE_DIR
+        - collector: BinanceCollector（下载缺失时间段时使用，默认新建）
+        - downloader: K线下载器（默认用 collector 新建）
+        """
+        self.root = Path(root or settings.KLINE_CACHE_DIR)
+        self._collector = collector
+        self._downloader = downloader
+        self._lock = threading.Lock()
+
+    @property
+    def downloader(self) -> KlineDownloader:
+        if self._downloader is None:
+            if self._collector is None:
+                from src.data_collectors.binance import BinanceCollector
+                self._collector = BinanceCollector(priority=PRIORITY_BACKFILL)
+            self._downloader = KlineDownloader(self._collector)
+        return self._downloader
+
+    def _paths(self, symbol: str, interval: str) -> tuple:
+        name = f"{symbol.upper()}_{interval}"
+        return self.root / f"{name}.npy", self.root / f"{name}.json"
+
+    def load(self, symbol: str, interval: str) -> np.ndarray:
+        """
+        读取已存储的全部K线（内存映射，只读）
+
+        返回:
+        - KLINE_DTYPE 结构化数组（没有数据时为空数组）
+        """
+        data_path, _ = self._paths(symbol, interval)
+        if not data_path.exists():
+            return np.empty(0, dtype=KLINE_DTYPE)
+        try:
+            return np.load(data_path, mmap_mode='r')
+        except ValueError:
+            # 空数组无法内存映射
+            return np.load(data_path)
+
+    def covered_ranges(self, symbol: str, interval: str) -> List[list]:
+        """
+        已下载的时间段
+
+        返回:
+        - [[开始毫秒, 结束毫秒]]，已合并、按时间排序
+        """
+        return self._read_meta(symbol, interval).get('covered', [])
+
+    def missing_ranges(self, symbol: str, interval: str, start_ms: int, end_ms: int) -> List[tuple]:
+        """
+        [start_ms, end_ms) 中尚未下载的时间段
+
+        返回:
+        - [(开始毫秒, 结束毫秒)]
+        """
+        return _subtract_ranges(start_ms, end_ms, self.covered_ranges(symbol, interval))
+
+    def _read_meta(self, symbol: str, interval: str) -> dict:
+        _, meta_path = self._paths(symbol, interval)
+        if not meta_path.exists():
+            return {}
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _save(self, symbol: str, interval: str, records: np.ndarray, covered: List[list], **meta):
+        """原子写入数据和覆盖范围（先写临时文件再替换）"""
+        self.root.mkdir(parents=True, exist_ok=True)
+        data_path, meta_path = self._paths(symbol, interval)
+        tmp_data = data_path.with_suffix('.npy.tmp')
+        with open(tmp_data, 'wb') as f:
+            np.save(f, records)
+        os.replace(tmp_data, data_path)
+        tmp_meta = meta_path.with_suffix('.json.tmp')
+        with open(tmp_meta, 'w', encoding='utf-8') as f:
+            json.dump({'symbol': symbol.upper(), 'interval': interval, 'covered': covered, **meta}, f)
+        os.replace(tmp_meta, meta_path)
+
+    def fill(self, symbol: str, interval: str, start_ms: int, end_ms: int) -> int:
+        """
+        下载 [start_ms, end_ms) 中缺失的时间段并合并到存储
+
+        返回:
+        - 新增的K线数量
+        """
+        # 只存储已收盘的K线：覆盖范围不超过当前K线的开盘时间
+        step = INTERVAL_MS[interval]
+        now_ms = int(time.time() * 1000)
+        end_ms = min(end_ms, now_ms - now_ms % step) if step <= INTERVAL_MS['1d'] else min(end_ms, now_ms - step)
+
+        with self._lock:
+            covered = self.covered_ranges(symbol, interval)
+            missing = _subtract_ranges(start_ms, end_ms, covered)
+            if not missing:
+                return 0
+
+            downloaded = []
+            fetched = []
+            for gap_start, gap_end in missing:
+                klines, failed = self.downloader.fetch_range(symbol.upper(), interval, gap_start, gap_end)
+                downloaded.append(klines[klines['close_time'] < now_ms])
+                # 失败的窗口不计入覆盖范围，下次请求时重新下载
+                fetched.extend(list(r) for r in _subtract_ranges(gap_start, gap_end, [list(w) for w in failed]))
+            if not fetched:
+                return 0
+
+            existing = np.asarray(self.load(symbol, interval))
+            new = np.concatenate(downloaded)
+            merged = np.concatenate([existing, new]) if len(existing) else new
+            merged = np.sort(merged, order='open_time', kind='stable')
+            _, first = np.unique(merged['open_time'], return_index=True)
+            merged = merged[first]
+            self._save(symbol, interval, merged, _merge_ranges(covered + fetched))
+            print(f"K线存储 {symbol.upper()} {interval}: 新增 {len(new)} 根，共 {len(merged)} 根", flush=True)
+            return len(new)
+
+    def get(self, symbol: str, interval: str, start_time: datetime, end_time: Optional[datetime] = None,
+            offline: bool = False) -> np.ndarray:
+        """
+        获取开盘时间在 [start_time, end_time) 内的K线（先补齐缺失的时间段）
+
+        参数:
+        - symbol: 交易对，如 'BTCUSDT'
+        - interval: K线间隔，如 '1m', '1h'
+        - start_time: 开始时间
+        - end_time: 结束时间（默认当前时间）
+        - offline: 只读本地存储，不下载
+
+        返回:
+        - KLINE_DTYPE 结构化数组（内存映射的切片视图）
+        """
+        if interval not in INTERVAL_MS:
+            raise ValueError(f"不支持的K线间隔: {interval}")
+        start_ms = int(start_time.timestamp() * 1000)
+        end_ms = int((end_time or datetime.now()).timestamp() * 1000)
+        if not offline:
+            self.fill(symbol, interval, start_ms, end_ms)
+
+        records = self.load(symbol, interval)
+        opens = records['open_time']
+        lo, hi = np.searchsorted(opens, [start_ms, end_ms], side='left')
+        return records[lo:hi]
+
+    def derived(self, symbol: str, interval: str, base: str = '1m') -> np.ndarray:
+        """
+        由已存储的 base K线聚合出的 interval K线（只包含完整的桶）
+
+        结果保存为 {SYMBOL}_{base}-{interval}.npy，base 的已下载范围不变时直接读取，
+        否则重新聚合（向量化，一年的 1m K线约几十毫秒）。
+
+        返回:
+        - KLINE_DTYPE 结构化数组
+        """
+        key = f"{base}-{interval}"
+        base_covered = self.covered_ranges(symbol, base)
+        if self._read_meta(symbol, key).get('base_covered') == base_covered:
+            return self.load(symbol, key)
+
+        with self._lock:
+            records = resample_records(np.asarray(self.load(symbol, base)), interval)
+            records = records[complete_bucket_mask(records, base_covered)]
+            covered = [[int(s), int(e)] for s, e in zip(records['open_time'], records['close_time'] + 1)]
+            self._save(symbol, key, records, _merge_ranges(covered), base_covered=base_covered)
+        return records
+
+    def get_derived(self, symbol: str, interval: str, start_time: datetime, end_time: Optional[datetime] = None,
+                    offline: bool = False, base: str = '1m') -> np.ndarray:
+        """
+        获取开盘时间在 [start_time, end_time) 内的K线，由本地 base K线聚合得到（只需下载一种间隔）
+
+        参数同 get；base 为基础间隔（默认 '1m'）
+
+        返回:
+        - KLINE_DTYPE 结构化数组
+        """
+        if not can_derive(interval, base):
+            raise ValueError(f"K线间隔 {interval} 不能由 {base} 聚合得到")
+        start_ms = int(start_time.timestamp() * 1000)
+        end_ms = int((end_time or datetime.now()).timestamp() * 1000)
+        if not offline:
+            # 补齐首尾两个桶覆盖的全部基础K线，保证请求范围内的桶完整
+            first_start, _ = bucket_bounds(start_ms, interval)
+            _, last_end = bucket_bounds(end_ms - 1, interval)
+            self.fill(symbol, base, int(first_start), int(last_end))
+
+        records = self.derived(symbol, interval, base)
+        lo, hi = np.searchsorted(records['open_time'], [start_ms, end_ms], side='left')
+        return records[lo:hi]
+
+    def get_dataframe(self, symbol: str, interval: str, start_time: datetime,
+                      end_time: Optional[datetime] = None, offline: bool = False,
+                      derive: bool = False) -> pd.DataFrame:
+        """
+        获取K线 DataFrame（参数同 get，格式与 BinanceCollector.get_klines 相同）
+
+        参数:
+        - derive: 由 KLINE_BASE_INTERVAL 的K线聚合得到（interval 可以聚合时）
+
+        返回:
+        - 以 open_time 为索引的 DataFrame
+        """
+        base = settings.KLINE_BASE_INTERVAL
+        if derive and base and can_derive(interval, base):
+            records = self.get_derived(symbol, interval, start_time, end_time, offline, base=base)
+        else:
+            records = self.get(symbol, interval, start_time, end_time, offline)
+        return records_to_dataframe(records)
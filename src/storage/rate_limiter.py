@@ -0,0 +1,261 @@
+"""API 限流器 - Redis 令牌桶，所有进程共享 Binance / Whale Alert 的请求配额"""
+import math
+import random
+import threading
+import time
+from typing import Dict, Optional
+
+from config import settings
+
+
+# 优先级：实时监控（警报基准价格、观察器采样）优先于历史回填
+PRIORITY_LIVE = 'live'
+PRIORITY_BACKFILL = 'backfill'
+
+# KEYS[1]: 令牌桶 hash；KEYS[2]: 封禁标记（429/418 后设置）
+# ARGV: 容量, 每秒补充的令牌数, 本次消耗, 消耗后至少保留的令牌数
+# 返回：0 表示已取得令牌，否则为需要等待的毫秒数
+_ACQUIRE_SCRIPT = """
+if redis.replicate_commands then
+    redis.replicate_commands()  -- Redis < 7 需要显式开启才能在写入前调用 TIME
+end
+local blocked = redis.call('PTTL', KEYS[2])
+if blocked > 0 then
+    return blocked
+end
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local reserve = tonumber(ARGV[4])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or capacity
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate / 1000)
+local wait = 0
+if tokens - cost >= reserve then
+    tokens = tokens - cost
+else
+    wait = math.ceil((cost + reserve - tokens) * 1000 / rate)
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity * 1000 / rate) + 60000)
+return wait
+"""
+
+
+class _LocalBucket:
+    """进程内令牌桶（Redis 不可用时使用，算法与 Lua 脚本相同）"""
+
+    def __init__(self, capacity: float, rate: float):
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = capacity
+        self.ts = time.monotonic()
+        self.blocked_until = 0.0
+
+    def take(self, cost: float, reserve: float) -> float:
+        """返回需要等待的秒数，0 表示已取得令牌（调用方持有锁）"""
+        now = time.monotonic()
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        self.tokens = min(self.capacity, self.tokens + (now - self.ts) * self.rate)
+        self.ts = now
+        if self.tokens - cost >= reserve:
+            self.tokens -= cost
+            return 0.0
+        return (cost + reserve - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """
+    API 限流器
+
+    每个 API 一个令牌桶（Redis 中的 ratelimit:{api}），每分钟补充 rate_per_minute 个令牌，最多积累 burst 个；
+    调用方在每次请求前按请求权重 acquire()，令牌不足时等待。所有进程（WebSocket 客户端、观察器、脚本）
+    共用同一个桶，历史回填（backfill）必须在桶中留出 BACKFILL_RESERVE 比例的令牌，保证实时监控优先。
+    收到 429/418 时调用 penalize()，在 Retry-After 期间所有进程都暂停请求该 API。
+    Redis 不可用时退回进程内令牌桶。
+    """
+
+    def __init__(self, redis_client=None, limits: Optional[Dict[str, tuple]] = None,
+                 backfill_reserve: Optional[float] = None):
+        """
+        初始化限流器
+
+        参数:
+        - redis_client: RedisClient（None 表示只使用进程内令牌桶）
+        - limits: {api: (每分钟令牌数, 最大积累令牌数)}，默认读取配置
+        - backfill_reserve: 回填请求需要保留的令牌比例，默认读取 RATE_LIMIT_BACKFILL_RESERVE
+        """
+        self.redis = redis_client.client if redis_client is not None else None
+        self.limits = limits or {
+            'binance': (settings.BINANCE_WEIGHT_BUDGET, settings.BINANCE_WEIGHT_BURST),
+            'whale_alert': (settings.WHALE_ALERT_REQUESTS_PER_MIN, settings.WHALE_ALERT_REQUESTS_BURST),
+        }
+        self.backfill_reserve = (settings.RATE_LIMIT_BACKFILL_RESERVE
+                                 if backfill_reserve is None else backfill_reserve)
+        self._script = self.redis.register_script(_ACQUIRE_SCRIPT) if self.redis is not None else None
+        self._lock = threading.Lock()
+        self._local: Dict[str, _LocalBucket] = {}
+        self._stats: Dict[str, dict] = {}
+
+    @property
+    def backend(self) -> str:
+        return 'redis' if self.redis is not None else 'local'
+
+    def _bucket_args(self, api: str, priority: str) -> tuple:
+        per_minute, burst = self.limits[api]
+        rate = per_minute / 60
+        reserve = burst * self.backfill_reserve if priority == PRIORITY_BACKFILL else 0
+        return burst, rate, reserve
+
+    def _stat(self, api: str) -> dict:
+        return self._stats.setdefault(api, {"acquired": 0, "cost": 0, "waits": 0, "wait_s": 0.0,
+                                            "penalties": 0, "redis_errors": 0})
+
+    def _try(self, api: str, cost: float, priority: str) -> float:
+        """尝试取得令牌，返回需要等待的秒数"""
+        burst, rate, reserve = self._bucket_args(api, priority)
+        if self._script is not None:
+            try:
+                wait_ms = self._script(keys=[f"ratelimit:{api}", f"ratelimit:{api}:blocked"],
+                                       args=[burst, rate, cost, reserve])
+                return int(wait_ms) / 1000
+            except Exception as e:
+                # Redis 故障时退回进程内令牌桶，不阻塞请求
+                with self._lock:
+                    self._stat(api)['redis_errors'] += 1
+                print(f"限流器 Redis 调用失败，使用进程内令牌桶: {e}", flush=True)
+        with self._lock:
+            bucket = self._local.get(api)
+            if bucket is None:
+                bucket = self._local[api] = _LocalBucket(burst, rate)
+            return bucket.take(cost, reserve)
+
+    def acquire(self, api: str, cost: float = 1, priority: str = PRIORITY_LIVE,
+                timeout: Optional[float] = None) -> bool:
+        """
+        请求前取得令牌（不足时阻塞等待）
+
+        参数:
+        - api: 'binance' 或 'whale_alert'
+        - cost: 请求权重（Binance 按接口权重，Whale Alert 为 1）
+        - priority: PRIORITY_LIVE 或 PRIORITY_BACKFILL
+        - timeout: 最长等待秒数（None 表示一直等待）
+
+        返回:
+        - 是否取得令牌（只有超时时为 False）
+
+        异常:
+        - ValueError: cost 超过该优先级可用的桶容量（永远无法取得）
+        """
+        if api not in self.limits:
+            return True
+        burst, _, reserve = self._bucket_args(api, priority)
+        if cost > burst - reserve:
+            raise ValueError(f"请求权重 {cost} 超过 {api} 令牌桶容量 {burst - reserve:g}（priority={priority}）")
+        deadline = None if timeout is None else time.monotonic() + timeout
+        waited = 0.0
+        while True:
+            wait = self._try(api, cost, priority)
+            if wait <= 0:
+                with self._lock:
+                    stat = self._stat(api)
+                    stat['acquired'] += 1
+                    stat['cost'] += cost
+                    if waited:
+                        stat['waits'] += 1
+                        stat['wait_s'] += waited
+                return True
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            # 多个等待者同时醒来时错开一点，避免一起重试
+            wait += random.uniform(0, 0.01)
+            time.sleep(wait)
+            waited += wait
+
+    def penalize(self, api: str, seconds: float):
+        """
+        收到 429/418 后暂停该 API 的所有请求（所有进程）
+
+        参数:
+        - api: API 名称
+        - seconds: 暂停秒数（通常为 Retry-After）
+        """
+        seconds = max(1.0, float(seconds))
+        with self._lock:
+            self._stat(api)['penalties'] += 1
+        print(f"⚠️  {api} 请求被限流，所有进程暂停 {seconds:.0f} 秒", flush=True)
+        if self.redis is not None:
+            try:
+                self.redis.set(f"ratelimit:{api}:blocked", '1', px=int(seconds * 1000))
+                return
+            except Exception as e:
+                print(f"限流器 Redis 调用失败: {e}", flush=True)
+        with self._lock:
+            bucket = self._local.get(api)
+            if bucket is None:
+                burst, rate, _ = self._bucket_args(api, PRIORITY_LIVE)
+                bucket = self._local[api] = _LocalBucket(burst, rate)
+            bucket.blocked_until = max(bucket.blocked_until, time.monotonic() + seconds)
+
+    def observe_binance_weight(self, used_header: Optional[str]):
+        """
+        根据响应头 X-MBX-USED-WEIGHT-1M 校准：Binance 按每分钟固定窗口计数，
+        已用权重达到上限（6000）的 95% 时暂停到本分钟结束，避免其他程序共用 IP 时触发 429
+
+        参数:
+        - used_header: 响应头的值
+        """
+        if not used_header:
+            return
+        try:
+            used = int(used_header)
+        except ValueError:
+            return
+        if used >= settings.BINANCE_WEIGHT_LIMIT * 0.95:
+            self.penalize('binance', math.ceil(60 - time.time() % 60))
+
+    def stats(self) -> dict:
+        """
+        获取本进程的限流统计
+
+        返回:
+        - 统计字典（字段为 {api}_{指标}）
+        """
+        stats = {"backend": self.backend}
+        with self._lock:
+            for api, stat in self._stats.items():
+                for name, value in stat.items():
+                    stats[f"{api}_{name}"] = round(value, 2) if isinstance(value, float) else value
+        return stats
+
+
+_shared_limiter = None
+_shared_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter:
+    """
+    获取进程内共享的限流器（RATE_LIMIT_BACKEND=redis 时连接 Redis，失败则使用进程内令牌桶）
+
+    返回:
+    - RateLimiter
+    """
+    global _shared_limiter
+    with _shared_limiter_lock:
+        if _shared_limiter is None:
+            redis_client = None
+            if settings.RATE_LIMIT_BACKEND == 'redis':
+                try:
+                    from src.storage.redis_client import RedisClient
+                    redis_client = RedisClient()
+                except Exception as e:
+                    print(f"限流器无法连接 Redis，使用进程内令牌桶: {e}", flush=True)
+            _shared_limiter = RateLimiter(redis_client)
+        return _shared_limiter
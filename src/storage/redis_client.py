@@ -1,11 +1,86 @@
 """Redis客户端封装"""
 import redis
 import json
+import time
+import uuid
 from datetime import datetime, timedelta
-from typing import Optional, Dict, List
+from typing import Optional, Dict, List, Tuple
 from config import settings
 
 
+def result_mapping(final_price: float, final_change_pct: float, direction: str,
+                   max_change_pct: Optional[float] = None, min_change_pct: Optional[float] = None) -> dict:
+    """观察结果 result:{event_id} 的字段"""
+    result_data = {
+        "final_price": str(final_price),
+        "final_change_pct": str(final_change_pct),
+        "direction": direction,
+        "completed_at": datetime.now().isoformat()
+    }
+    if max_change_pct is not None:
+        result_data["max_change_pct"] = str(max_change_pct)
+    if min_change_pct is not None:
+        result_data["min_change_pct"] = str(min_change_pct)
+    return result_data
+
+
+# 只更新仍存在的 hash（HSET 会重新创建已过期的观察窗口，新 hash 既没有 status 也没有 TTL）
+# KEYS[1]: observation:{event_id}；ARGV: 字段, 值, 字段, 值, ...
+HSET_IF_EXISTS_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    return redis.call('HSET', KEYS[1], unpack(ARGV))
+end
+return 0
+"""
+
+
+def log_pipeline_errors(results: list, action: str) -> int:
+    """
+    打印 pipeline 中出错的命令（execute(raise_on_error=False) 时其他命令照常生效）
+    
+    返回:
+    - 出错的命令数
+    """
+    errors = [result for result in results if isinstance(result, Exception)]
+    if errors:
+        print(f"{action}: {len(errors)} 个命令出错，其余已写入（{errors[0]}）", flush=True)
+    return len(errors)
+
+
+def queue_tick_writes(pipe, snapshots: List[tuple], completions: List[tuple], stale: List[str] = (),
+                      expiry: Optional[Dict[str, float]] = None):
+    """
+    把一次检查的写入加入 pipeline（同步和异步 pipeline 的命令入队方式相同，由调用方执行）
+    
+    参数:
+    - pipe: Redis pipeline
+    - snapshots: [(event_id, price, change_pct, max_change_pct, min_change_pct), ...]
+    - completions: [(event_id, final_price, final_change_pct, direction, max_change_pct, min_change_pct), ...]
+    - stale: 需要从活跃列表移除的事件ID
+    - expiry: 需要补充到到期索引的 {event_id: 到期时间}（在移除完成的窗口之前写入）
+    """
+    if expiry:
+        pipe.zadd("observations:expiry", expiry)
+    now = datetime.now().isoformat()
+    for event_id, price, change_pct, max_change_pct, min_change_pct in snapshots:
+        key = f"snapshots:{event_id}"
+        pipe.rpush(key, json.dumps({"time": now, "price": str(price), "change_pct": str(change_pct)}))
+        pipe.expire(key, 86400 * 7)  # 7天过期
+        # 观察窗口中记录最大/最小变化，完成时不需要读取全部快照
+        pipe.eval(HSET_IF_EXISTS_SCRIPT, 1, f"observation:{event_id}",
+                  "max_change_pct", str(max_change_pct), "min_change_pct", str(min_change_pct))
+    for event_id, final_price, final_change_pct, direction, max_change_pct, min_change_pct in completions:
+        result_key = f"result:{event_id}"
+        pipe.hset(result_key, mapping=result_mapping(final_price, final_change_pct, direction,
+                                                     max_change_pct, min_change_pct))
+        pipe.expire(result_key, 86400 * 30)  # 30天过期
+        pipe.eval(HSET_IF_EXISTS_SCRIPT, 1, f"observation:{event_id}", "status", "completed")
+    finished = [completion[0] for completion in completions] + list(stale)
+    if finished:
+        pipe.zrem("observations:active", *finished)
+        pipe.zrem("observations:expiry", *finished)
+
+
 class RedisClient:
     """Redis客户端封装，用于存储事件和观察数据"""
     
@@ -105,25 +180,64 @@ class RedisClient:
         - window_hours: 观察窗口小时数
         """
         baseline_time = datetime.now()
-        expires_at = baseline_time + timedelta(hours=window_hours)
         
-        # 保存观察窗口详情
+        # 观察窗口详情、活跃列表和到期索引在一个 pipeline 中写入（一次往返）
         obs_key = f"observation:{event_id}"
-        obs_data = {
+        obs_data = self._observation_data(baseline_price, baseline_time, window_hours)
+        pipe = self.client.pipeline(transaction=False)
+        pipe.hset(obs_key, mapping=obs_data)
+        # TTL设置为窗口时间 + 1小时缓冲
+        pipe.expire(obs_key, window_hours * 3600 + 3600)
+        
+        # 添加到活跃观察列表（使用时间戳作为score，便于排序）
+        pipe.zadd("observations:active", {
+            event_id: baseline_time.timestamp()
+        })
+        # 到期索引（score 为到期时间），观察器用 ZRANGEBYSCORE 找出到期的窗口
+        pipe.zadd("observations:expiry", {
+            event_id: (baseline_time + timedelta(hours=window_hours)).timestamp()
+        })
+        pipe.execute()
+    
+    @staticmethod
+    def _observation_data(baseline_price: float, baseline_time: datetime,
+                          window_hours: int) -> dict:
+        """构建观察窗口详情"""
+        expires_at = baseline_time + timedelta(hours=window_hours)
+        return {
             "baseline_price": str(baseline_price),
             "baseline_time": baseline_time.isoformat(),
             "window_hours": str(window_hours),
             "status": "observing",
             "expires_at": expires_at.isoformat()
         }
-        self.client.hset(obs_key, mapping=obs_data)
-        # TTL设置为窗口时间 + 1小时缓冲
-        self.client.expire(obs_key, window_hours * 3600 + 3600)
+    
+    def save_alert_observations(self, items: List[tuple], window_hours: int = 24):
+        """
+        在一个 pipeline 中保存同一条警报的所有事件并创建观察窗口（一次往返）
         
-        # 添加到活跃观察列表（使用时间戳作为score，便于排序）
-        self.client.zadd("observations:active", {
-            event_id: baseline_time.timestamp()
-        })
+        参数:
+        - items: [(event_id, event_data, baseline_price), ...]
+        - window_hours: 观察窗口小时数
+        """
+        if not items:
+            return
+        baseline_time = datetime.now()
+        pipe = self.client.pipeline(transaction=False)
+        active = {}
+        for event_id, event_data, baseline_price in items:
+            event_key = f"event:{event_id}"
+            pipe.hset(event_key, mapping={k: str(v) for k, v in event_data.items()})
+            pipe.expire(event_key, 86400 * 7)  # 7天过期
+            
+            obs_key = f"observation:{event_id}"
+            pipe.hset(obs_key, mapping=self._observation_data(baseline_price, baseline_time, window_hours))
+            pipe.expire(obs_key, window_hours * 3600 + 3600)
+            active[event_id] = baseline_time.timestamp()
+        pipe.zadd("observations:active", active)
+        expires_at = (baseline_time + timedelta(hours=window_hours)).timestamp()
+        pipe.zadd("observations:expiry", {event_id: expires_at for event_id in active})
+        pipe.execute()
     
     def get_observation(self, event_id: str) -> Optional[Dict]:
         """
@@ -188,26 +302,58 @@ class RedisClient:
         """
         # 保存结果
         result_key = f"result:{event_id}"
-        result_data = {
-            "final_price": str(final_price),
-            "final_change_pct": str(final_change_pct),
-            "direction": direction,
-            "completed_at": datetime.now().isoformat()
-        }
-        if max_change_pct is not None:
-            result_data["max_change_pct"] = str(max_change_pct)
-        if min_change_pct is not None:
-            result_data["min_change_pct"] = str(min_change_pct)
+        result_data = result_mapping(final_price, final_change_pct, direction, max_change_pct, min_change_pct)
         
-        self.client.hset(result_key, mapping=result_data)
-        self.client.expire(result_key, 86400 * 30)  # 30天过期
+        pipe = self.client.pipeline(transaction=False)
+        pipe.hset(result_key, mapping=result_data)
+        pipe.expire(result_key, 86400 * 30)  # 30天过期
         
-        # 更新观察窗口状态
-        obs_key = f"observation:{event_id}"
-        self.client.hset(obs_key, "status", "completed")
+        # 更新观察窗口状态（只在窗口仍存在时更新）
+        pipe.eval(HSET_IF_EXISTS_SCRIPT, 1, f"observation:{event_id}", "status", "completed")
+        
+        # 从活跃列表和到期索引移除
+        pipe.zrem("observations:active", event_id)
+        pipe.zrem("observations:expiry", event_id)
+        pipe.execute()
+    
+    def load_observation_states(self, event_ids: List[str]) -> List[Tuple[Optional[Dict], Optional[Dict], Optional[float]]]:
+        """
+        在一个 pipeline 中读取所有观察窗口、事件和到期索引中的到期时间（一次往返）
+        
+        参数:
+        - event_ids: 事件ID列表
+        
+        返回:
+        - 与 event_ids 对应的 [(observation, event, expiry), ...]，不存在的为 None
+          （expiry 为 None 表示窗口不在到期索引中，见 tick.unindexed_expiries）
+        """
+        if not event_ids:
+            return []
+        pipe = self.client.pipeline(transaction=False)
+        for event_id in event_ids:
+            pipe.hgetall(f"observation:{event_id}")
+            pipe.hgetall(f"event:{event_id}")
+            pipe.zscore("observations:expiry", event_id)
+        results = pipe.execute()
+        return [(results[i] or None, results[i + 1] or None, results[i + 2]) for i in range(0, len(results), 3)]
+    
+    def save_tick_updates(self, snapshots: List[tuple], completions: List[tuple], stale: List[str] = (),
+                          expiry: Optional[Dict[str, float]] = None):
+        """
+        在一个 pipeline 中写入一次检查的所有快照和完成的观察（一次往返）
         
-        # 从活跃列表移除
-        self.client.zrem("observations:active", event_id)
+        参数:
+        - snapshots: [(event_id, price, change_pct, max_change_pct, min_change_pct), ...]
+        - completions: [(event_id, final_price, final_change_pct, direction, max_change_pct, min_change_pct), ...]
+        - stale: 观察窗口已不存在的事件ID（从活跃列表移除）
+        - expiry: 需要补充到到期索引的 {event_id: 到期时间}（tick.unindexed_expiries）
+        """
+        if not (snapshots or completions or stale or expiry):
+            return
+        pipe = self.client.pipeline(transaction=False)
+        queue_tick_writes(pipe, snapshots, completions, stale, expiry)
+        # 个别窗口的写入出错（如键类型错误）不影响其他窗口
+        log_pipeline_errors(pipe.execute(raise_on_error=False), "写入观察窗口")
     
     def get_active_observations(self) -> List[str]:
         """
@@ -218,6 +364,71 @@ class RedisClient:
         """
         return self.client.zrange("observations:active", 0, -1)
     
+    def get_observation_schedule(self, now: Optional[float] = None) -> Tuple[List[str], List[str]]:
+        """
+        在一个 pipeline 中读取活跃观察窗口和已到期的窗口（到期索引 ZRANGEBYSCORE，不解析每个窗口的 expires_at）
+        
+        参数:
+        - now: 当前时间（epoch 秒，默认 time.time()）
+        
+        返回:
+        - (活跃的事件ID列表, 已到期的事件ID列表)
+        """
+        pipe = self.client.pipeline(transaction=False)
+        pipe.zrange("observations:active", 0, -1)
+        pipe.zrangebyscore("observations:expiry", "-inf", now or time.time())
+        active, due = pipe.execute()
+        return active, due
+    
+    def get_due_observations(self, now: Optional[float] = None) -> List[str]:
+        """
+        获取已到期的观察窗口（按到期时间排序）
+        
+        参数:
+        - now: 当前时间（epoch 秒，默认 time.time()）
+        
+        返回:
+        - 事件ID列表
+        """
+        return self.client.zrangebyscore("observations:expiry", "-inf", now or time.time())
+    
+    def get_expiry_times(self) -> Dict[str, float]:
+        """
+        获取所有观察窗口的到期时间
+        
+        返回:
+        - {event_id: 到期时间（epoch 秒）}，按到期时间排序
+        """
+        return dict(self.client.zrange("observations:expiry", 0, -1, withscores=True))
+    
+    def backfill_expiry_index(self) -> int:
+        """
+        为到期索引之前创建的活跃观察窗口补充到期时间（重复调用无影响）
+        
+        返回:
+        - 补充的窗口数
+        """
+        active = self.get_active_observations()
+        if not active:
+            return 0
+        pipe = self.client.pipeline(transaction=False)
+        for event_id in active:
+            pipe.zscore("observations:expiry", event_id)
+        missing = [event_id for event_id, score in zip(active, pipe.execute()) if score is None]
+        if not missing:
+            return 0
+        for event_id in missing:
+            pipe.hget(f"observation:{event_id}", "expires_at")
+        expiries = {}
+        for event_id, expires_at in zip(missing, pipe.execute()):
+            try:
+                # 没有观察窗口的事件立即到期，由观察器从活跃列表移除
+                expiries[event_id] = datetime.fromisoformat(expires_at).timestamp() if expires_at else 0
+            except ValueError:
+                expiries[event_id] = 0
+        self.client.zadd("observations:expiry", expiries)
+        return len(expiries)
+    
     def get_result(self, event_id: str) -> Optional[Dict]:
         """
         获取观察结果
@@ -277,3 +488,128 @@ class RedisClient:
         stats = self.client.hgetall("stats:summary")
         return stats if stats else {}
 
+    def save_metrics(self, name: str, metrics: dict):
+        """
+        保存运行指标（如摄取队列深度、延迟）
+
+        参数:
+        - name: 指标组名称，保存到 metrics:{name}
+        - metrics: 指标字典
+        """
+        key = f"metrics:{name}"
+        data = {k: str(v) for k, v in metrics.items()}
+        data["updated_at"] = datetime.now().isoformat()
+        self.client.hset(key, mapping=data)
+        self.client.expire(key, 86400)  # 1天过期，进程停止后自动清理
+
+    def get_metrics(self, name: str) -> Dict:
+        """
+        获取运行指标
+
+        参数:
+        - name: 指标组名称
+
+        返回:
+        - 指标字典
+        """
+        metrics = self.client.hgetall(f"metrics:{name}")
+        return metrics if metrics else {}
+
+
+    def get_subscription_id(self, preferred: Optional[str] = None) -> str:
+        """
+        获取稳定的 Whale Alert 订阅ID
+        
+        参数:
+        - preferred: 配置中指定的ID（优先使用）
+        
+        返回:
+        - 订阅ID；首次调用时生成并持久化到 ws:subscription_id，重启后保持不变
+        """
+        if preferred:
+            return preferred
+        # SET NX 保证多个实例并发启动时得到同一个ID
+        self.client.set("ws:subscription_id", uuid.uuid4().hex, nx=True)
+        return self.client.get("ws:subscription_id")
+    
+    def touch_alive(self):
+        """记录 WebSocket 最后存活时间（epoch 秒）"""
+        self.client.set("ws:last_alive", str(time.time()))
+    
+    def get_last_alive(self) -> Optional[float]:
+        """
+        获取 WebSocket 最后存活时间
+        
+        返回:
+        - epoch 秒，从未记录时返回None
+        """
+        value = self.client.get("ws:last_alive")
+        return float(value) if value else None
+    
+    def clear_alive(self):
+        """正常停止时删除最后存活时间（下次启动不再把停机时间记为断线）"""
+        self.client.delete("ws:last_alive")
+    
+    def record_outage(self, record: dict, keep: int = 100):
+        """
+        保存一次断线记录（最新的在前）
+        
+        参数:
+        - record: 断线记录（started_at, ended_at, duration_s, reason, replayed）
+        - keep: 保留的记录数
+        """
+        pipe = self.client.pipeline(transaction=False)
+        pipe.lpush("ws:outages", json.dumps(record))
+        pipe.ltrim("ws:outages", 0, keep - 1)
+        pipe.execute()
+    
+    def get_outages(self, limit: int = 10) -> List[Dict]:
+        """
+        获取最近的断线记录
+        
+        参数:
+        - limit: 返回数量
+        
+        返回:
+        - 断线记录列表（最新的在前）
+        """
+        return [json.loads(r) for r in self.client.lrange("ws:outages", 0, limit - 1)]
+    
+    def claim_alert(self, tx_hash: str, ttl: int = 172800) -> bool:
+        """
+        原子地占位一笔交易（去重的权威判断，多个实例共享）
+        
+        参数:
+        - tx_hash: 交易哈希
+        - ttl: 去重窗口（秒），超过窗口的记录在占位时一并清理
+        
+        返回:
+        - True 表示首次出现，False 表示已经处理过
+        """
+        now = time.time()
+        pipe = self.client.pipeline(transaction=False)
+        pipe.zremrangebyscore("alerts:seen", "-inf", now - ttl)
+        pipe.zadd("alerts:seen", {tx_hash: now}, nx=True)
+        _, added = pipe.execute()
+        return bool(added)
+    
+    def release_alert(self, tx_hash: str):
+        """
+        释放交易的占位（处理失败时调用，重新投递的同一警报可以再次处理）
+        
+        参数:
+        - tx_hash: 交易哈希
+        """
+        self.client.zrem("alerts:seen", tx_hash)
+    
+    def get_recent_alerts(self, ttl: int = 172800) -> List[str]:
+        """
+        获取去重窗口内处理过的交易哈希（用于预热布隆过滤器）
+        
+        参数:
+        - ttl: 去重窗口（秒）
+        
+        返回:
+        - 交易哈希列表
+        """
+        return self.client.zrangebyscore("alerts:seen", time.time() - ttl, "+inf")
@@ -0,0 +1,317 @@
+"""Whale Alert 交易列式存储 - 按币种和日期分区的 Parquet 数据集，逐页追加写入，按需读取分区和列"""
+import os
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from config import settings
+
+
+# 交易字段（分区字段 currency / date 保存在目录名中）
+TRANSACTION_SCHEMA = pa.schema([
+    ('timestamp', pa.timestamp('s')),
+    ('hash', pa.string()),
+    ('blockchain', pa.string()),
+    ('symbol', pa.string()),
+    ('transaction_type', pa.string()),
+    ('amount', pa.float64()),
+    ('amount_usd', pa.float64()),
+    ('from_address', pa.string()),
+    ('from_owner', pa.string()),
+    ('from_owner_type', pa.string()),
+    ('to_address', pa.string()),
+    ('to_owner', pa.string()),
+    ('to_owner_type', pa.string()),
+])
+
+PARTITION_SCHEMA = pa.schema([('currency', pa.string()), ('date', pa.string())])
+
+# 每个分区缓冲多少条交易后写入一个文件（也是 Parquet 行组大小）
+FLUSH_ROWS = 50000
+
+
+def _party(tx: dict, side: str, key: str) -> Optional[str]:
+    """取 from / to 中的字段（API 返回的是 {'address', 'owner', 'owner_type'}）"""
+    value = tx.get(side)
+    if isinstance(value, dict):
+        value = value.get(key)
+    elif key != 'address':
+        return None
+    return str(value) if value not in (None, '') else None
+
+
+def transactions_to_table(transactions: List[dict]) -> pa.Table:
+    """
+    把 API 返回的原始交易转换为 TRANSACTION_SCHEMA 的 Arrow 表
+
+    参数:
+    - transactions: 原始交易字典列表
+
+    返回:
+    - pyarrow.Table
+    """
+    columns = {
+        'timestamp': [int(tx.get('timestamp', 0)) for tx in transactions],
+        'hash': [tx.get('hash') for tx in transactions],
+        'blockchain': [tx.get('blockchain') for tx in transactions],
+        'symbol': [tx.get('symbol') for tx in transactions],
+        'transaction_type': [tx.get('transaction_type') for tx in transactions],
+        'amount': [tx.get('amount') for tx in transactions],
+        'amount_usd': [tx.get('amount_usd') for tx in transactions],
+    }
+    for side in ('from', 'to'):
+        for key in ('address', 'owner', 'owner_type'):
+            columns[f'{side}_{key}'] = [_party(tx, side, key) for tx in transactions]
+    return pa.Table.from_pydict(columns, schema=TRANSACTION_SCHEMA)
+
+
+def _utc_date(timestamp: int) -> str:
+    return time.strftime('%Y-%m-%d', time.gmtime(timestamp))
+
+
+class TransactionWriter:
+    """
+    单个币种的追加写入器
+
+    按日期（UTC）缓冲交易，达到 flush_rows 或关闭时每个分区写入一个新文件（先写隐藏的临时文件再改名，
+    读取方不会看到写了一半的文件）。同一分区中已存在的交易哈希会被跳过（只读取 hash 列）。
+    """
+
+    def __init__(self, store: 'TransactionStore', currency: str, flush_rows: int = FLUSH_ROWS):
+        self.store = store
+        self.currency = currency.lower()
+        self.flush_rows = flush_rows
+        self.rows_written = 0
+        self._buffer: Dict[str, List[dict]] = {}
+        self._buffered = 0
+        self._hashes: Dict[str, set] = {}
+
+    def _known_hashes(self, date: str) -> set:
+        hashes = self._hashes.get(date)
+        if hashes is None:
+            partition_dir = self.store.partition_dir(self.currency, date)
+            hashes = set()
+            if partition_dir.exists():
+                table = ds.dataset(partition_dir, format='parquet').to_table(columns=['hash'])
+                hashes.update(table.column('hash').to_pylist())
+            self._hashes[date] = hashes
+        return hashes
+
+    def append(self, transactions: List[dict]) -> int:
+        """
+        追加一页交易
+
+        参数:
+        - transactions: API 返回的原始交易字典列表
+
+        返回:
+        - 新增的交易数（已存在的哈希不计入）
+        """
+        added = 0
+        for tx in transactions:
+            date = _utc_date(int(tx.get('timestamp', 0)))
+            hashes = self._known_hashes(date)
+            tx_hash = tx.get('hash')
+            if tx_hash in hashes:
+                continue
+            hashes.add(tx_hash)
+            self._buffer.setdefault(date, []).append(tx)
+            added += 1
+        self._buffered += added
+        if self._buffered >= self.flush_rows:
+            self.flush()
+        return added
+
+    def flush(self):
+        """把缓冲的交易写入分区文件"""
+        for date, transactions in self._buffer.items():
+            table = transactions_to_table(transactions).sort_by('timestamp')
+            self.store.write_partition(self.currency, date, table)
+            self.rows_written += len(transactions)
+        self._buffer = {}
+        self._buffered = 0
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self) -> 'TransactionWriter':
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class TransactionStore:
+    """
+    Whale Alert 交易列式存储
+
+    目录结构为 {root}/currency={币种}/date={YYYY-MM-DD}/part-*.parquet（Hive 分区，日期为 UTC），
+    字段类型固定（TRANSACTION_SCHEMA）。读取时按币种和日期跳过不需要的分区，只解码请求的列，
+    时间过滤利用行组统计信息；iter_batches 可以按批处理任意长的时间范围。
+    """
+
+    def __init__(self, root: Optional[str] = None):
+        """
+        初始化存储
+
+        参数:
+        - root: 存储目录，默认读取 WHALE_DATASET_DIR
+        """
+        self.root = Path(root or settings.WHALE_DATASET_DIR)
+
+    def partition_dir(self, currency: str, date: str) -> Path:
+        return self.root / f"currency={currency.lower()}" / f"date={date}"
+
+    def write_partition(self, currency: str, date: str, table: pa.Table):
+        """把一个 Arrow 表写入分区（新文件，原子改名）"""
+        partition_dir = self.partition_dir(currency, date)
+        partition_dir.mkdir(parents=True, exist_ok=True)
+        name = f"part-{time.time_ns()}-{os.getpid()}.parquet"
+        tmp_path = partition_dir / f".{name}.tmp"
+        pq.write_table(table, tmp_path, row_group_size=FLUSH_ROWS, compression='zstd')
+        os.replace(tmp_path, partition_dir / name)
+
+    def writer(self, currency: str, flush_rows: int = FLUSH_ROWS) -> TransactionWriter:
+        """
+        获取币种的追加写入器（用 with 语句，退出时写入剩余的缓冲）
+
+        参数:
+        - currency: 币种
+        - flush_rows: 缓冲多少条交易后写入
+
+        返回:
+        - TransactionWriter
+        """
+        return TransactionWriter(self, currency, flush_rows)
+
+    def append(self, currency: str, transactions: List[dict]) -> int:
+        """
+        一次性追加交易并立即写入
+
+        返回:
+        - 新增的交易数
+        """
+        with self.writer(currency) as writer:
+            return writer.append(transactions)
+
+    def dataset(self) -> Optional[ds.Dataset]:
+        """整个存储的 Arrow 数据集（没有数据时为 None）"""
+        if not self.root.exists() or not any(self.root.glob('currency=*/date=*/*.parquet')):
+            return None
+        return ds.dataset(self.root, format='parquet', schema=pa.unify_schemas([TRANSACTION_SCHEMA, PARTITION_SCHEMA]),
+                          partitioning=ds.partitioning(PARTITION_SCHEMA, flavor='hive'))
+
+    def _filter(self, currencies: Optional[List[str]], start: Optional[datetime],
+                end: Optional[datetime]) -> Optional[ds.Expression]:
+        """分区过滤（币种、日期）和时间过滤"""
+        conditions = []
+        if currencies:
+            conditions.append(ds.field('currency').isin([c.lower() for c in currencies]))
+        if start is not None:
+            start_ts = int(start.timestamp())
+            conditions.append(ds.field('date') >= _utc_date(start_ts))
+            conditions.append(ds.field('timestamp') >= pa.scalar(start_ts, pa.timestamp('s')))
+        if end is not None:
+            end_ts = int(end.timestamp())
+            conditions.append(ds.field('date') <= _utc_date(end_ts))
+            conditions.append(ds.field('timestamp') <= pa.scalar(end_ts, pa.timestamp('s')))
+        expression = None
+        for condition in conditions:
+            expression = condition if expression is None else expression & condition
+        return expression
+
+    def iter_batches(self, currencies: Optional[List[str]] = None, start: Optional[datetime] = None,
+                     end: Optional[datetime] = None, columns: Optional[List[str]] = None,
+                     batch_size: int = 100000) -> Iterator[pd.DataFrame]:
+        """
+        按批读取交易（内存占用与时间范围无关）
+
+        参数:
+        - currencies: 币种列表（默认全部）
+        - start / end: 时间范围（默认全部）
+        - columns: 需要的列（默认全部，包括 currency）
+        - batch_size: 每批最多的交易数
+
+        返回:
+        - 迭代 DataFrame（批内按文件顺序，不保证跨批排序）
+        """
+        dataset = self.dataset()
+        if dataset is None:
+            return
+        columns = columns or TRANSACTION_SCHEMA.names + ['currency']
+        scanner = dataset.scanner(columns=columns, filter=self._filter(currencies, start, end), batch_size=batch_size)
+        for batch in scanner.to_batches():
+            if batch.num_rows:
+                yield batch.to_pandas(coerce_temporal_nanoseconds=True)
+
+    def scan(self, currencies: Optional[List[str]] = None, start: Optional[datetime] = None,
+             end: Optional[datetime] = None, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        读取交易为 DataFrame（只读取需要的分区和列，按时间排序）
+
+        参数同 iter_batches
+
+        返回:
+        - DataFrame（没有数据时为空 DataFrame）
+        """
+        dataset = self.dataset()
+        if dataset is None:
+            return pd.DataFrame()
+        columns = columns or TRANSACTION_SCHEMA.names + ['currency']
+        table = dataset.to_table(columns=columns, filter=self._filter(currencies, start, end))
+        if 'timestamp' in columns:
+            table = table.sort_by('timestamp')
+        return table.to_pandas(coerce_temporal_nanoseconds=True)
+
+    def partitions(self) -> List[dict]:
+        """
+        列出所有分区
+
+        返回:
+        - [{'currency', 'date', 'files', 'rows', 'bytes'}]，按币种和日期排序
+        """
+        result = []
+        for partition_dir in sorted(self.root.glob('currency=*/date=*')):
+            files = sorted(partition_dir.glob('*.parquet'))
+            result.append({
+                'currency': partition_dir.parent.name.split('=', 1)[1],
+                'date': partition_dir.name.split('=', 1)[1],
+                'files': len(files),
+                'rows': sum(pq.ParquetFile(f).metadata.num_rows for f in files),
+                'bytes': sum(f.stat().st_size for f in files),
+            })
+        return result
+
+    def compact(self, currency: Optional[str] = None) -> int:
+        """
+        把每个分区的多个文件合并为一个（按时间排序、去掉重复哈希）
+
+        参数:
+        - currency: 只合并该币种（默认全部）
+
+        返回:
+        - 合并的分区数
+        """
+        pattern = f"currency={currency.lower()}/date=*" if currency else 'currency=*/date=*'
+        compacted = 0
+        for partition_dir in sorted(self.root.glob(pattern)):
+            files = sorted(partition_dir.glob('*.parquet'))
+            if len(files) <= 1:
+                continue
+            table = ds.dataset(files, format='parquet', schema=TRANSACTION_SCHEMA).to_table()
+            df = table.to_pandas().drop_duplicates('hash').sort_values('timestamp')
+            table = pa.Table.from_pandas(df, schema=TRANSACTION_SCHEMA, preserve_index=False)
+            name = f"part-{time.time_ns()}-{os.getpid()}.parquet"
+            tmp_path = partition_dir / f".{name}.tmp"
+            pq.write_table(table, tmp_path, row_group_size=FLUSH_ROWS, compression='zstd')
+            os.replace(tmp_path, partition_dir / name)
+            for f in files:
+                f.unlink()
+            compacted += 1
+        return compacted
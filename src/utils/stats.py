@@ -0,0 +1,18 @@
+"""统计工具"""
+
+
+def percentile(samples: list, pct: float) -> float:
+    """
+    计算分位数（最近秩法）
+
+    参数:
+    - samples: 已排序的样本
+    - pct: 百分位（0-100）
+
+    返回:
+    - 分位数，样本为空时返回 0.0
+    """
+    if not samples:
+        return 0.0
+    index = min(len(samples) - 1, int(round(pct / 100 * (len(samples) - 1))))
+    return samples[index]
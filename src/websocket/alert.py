@@ -0,0 +1,277 @@
+"""警报解析工具 - 同步与异步客户端共用的 AlertJSON 处理逻辑"""
+from datetime import datetime
+from typing import Optional, Tuple, List
+
+from config import settings
+
+
+def build_subscription(subscription_id: Optional[str] = None) -> dict:
+    """
+    构建 subscribe_alerts 订阅消息
+
+    根据官方文档，订阅消息格式：
+    - type: "subscribe_alerts" (必需)
+    - id: string (可选) - 用于重连后接收错过的警报
+    - blockchains: []string (可选) - 如果省略，自动包含所有区块链
+    - symbols: []string (可选) - 如果省略，自动包含所有币种
+    - tx_types: []string (可选) - 如果省略，自动包含所有交易类型
+    - min_value_usd: float (必需) - 最小转账金额（美元）
+
+    参数:
+    - subscription_id: 稳定的订阅ID，重连时使用同一个ID以接收错过的警报
+
+    返回:
+    - 订阅消息字典
+    """
+    subscription = {
+        "type": "subscribe_alerts",
+        "min_value_usd": settings.WHALE_ALERT_MIN_VALUE_USD  # 必需参数
+    }
+    if subscription_id:
+        subscription["id"] = subscription_id
+
+    # 添加可选参数（如果配置了）
+    # 注意：如果不提供 symbols / blockchains，API 会自动包含所有币种 / 区块链
+    if settings.SYMBOLS:
+        subscription["symbols"] = settings.SYMBOLS
+    if settings.BLOCKCHAINS:
+        subscription["blockchains"] = settings.BLOCKCHAINS
+
+    return subscription
+
+
+def get_event_id(alert_data: dict) -> str:
+    """
+    获取事件ID（根据官方文档，使用 transaction.hash）
+
+    参数:
+    - alert_data: AlertJSON 字典
+
+    返回:
+    - 交易哈希，不存在时返回空字符串
+    """
+    transaction = alert_data.get('transaction') or {}
+    return transaction.get('hash', '')
+
+
+def parse_amount(amount_entry: dict) -> Tuple[str, float, float]:
+    """
+    解析 amounts 数组中的一项
+
+    参数:
+    - amount_entry: amounts 中的元素
+
+    返回:
+    - (币种小写, 数量, 美元金额)
+    """
+    currency = amount_entry.get('symbol', 'btc').lower()
+    amount = float(amount_entry.get('amount', 0))
+    amount_usd = float(amount_entry.get('value_usd', 0))
+    return currency, amount, amount_usd
+
+
+def parse_amounts(alert_data: dict) -> List[Tuple[str, float, float]]:
+    """
+    解析 amounts 数组中的所有币种（多币种交易会包含多项）
+
+    同一币种出现多次时合并数量和金额，保持首次出现的顺序。
+
+    参数:
+    - alert_data: AlertJSON 字典
+
+    返回:
+    - [(币种, 数量, 美元金额), ...]，没有金额信息时返回空列表
+    """
+    merged = {}
+    for entry in alert_data.get('amounts') or []:
+        currency, amount, amount_usd = parse_amount(entry)
+        if currency in merged:
+            prev_amount, prev_usd = merged[currency]
+            merged[currency] = (prev_amount + amount, prev_usd + amount_usd)
+        else:
+            merged[currency] = (amount, amount_usd)
+    return [(currency, amount, amount_usd) for currency, (amount, amount_usd) in merged.items()]
+
+
+class AlertAmount:
+    """amounts 数组中的一项（同一币种已合并）"""
+
+    __slots__ = ('currency', 'amount', 'amount_usd')
+
+    def __init__(self, currency: str, amount: float, amount_usd: float):
+        self.currency = currency
+        self.amount = amount
+        self.amount_usd = amount_usd
+
+    def __repr__(self):
+        return f"AlertAmount({self.currency!r}, {self.amount!r}, {self.amount_usd!r})"
+
+
+class Alert:
+    """
+    解码后的 AlertJSON
+
+    接收线程解码一次后在摄取队列、价格查询和 Redis 写入之间传递，
+    避免在处理流程中反复对原始字典做 dict.get 链式查找。
+    """
+
+    __slots__ = ('tx_hash', 'timestamp', 'blockchain', 'transaction_type', 'from_owner',
+                 'to_owner', 'channel_id', 'text', 'amounts', 'exchange_flow', '_timestamp_iso')
+
+    def __init__(self, tx_hash: str, timestamp, blockchain: str = '', transaction_type: str = '',
+                 from_owner: str = '', to_owner: str = '', channel_id: str = '', text: str = '',
+                 amounts: Optional[List[AlertAmount]] = None):
+        self.tx_hash = tx_hash
+        self.timestamp = timestamp
+        self.blockchain = blockchain
+        self.transaction_type = transaction_type
+        self.from_owner = from_owner
+        self.to_owner = to_owner
+        self.channel_id = channel_id
+        self.text = text
+        self.amounts = amounts or []
+        # 交易所资金流向（in / out / internal / unknown），由 WebSocket 客户端按地址索引设置
+        self.exchange_flow = ''
+        self._timestamp_iso = None
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'Alert':
+        """
+        从解码后的 AlertJSON 字典构建
+
+        参数:
+        - data: AlertJSON 字典
+
+        返回:
+        - Alert 实例（同一币种的多个 amounts 已合并，见 parse_amounts）
+        """
+        return cls(
+            tx_hash=get_event_id(data),
+            timestamp=data.get('timestamp', 0),
+            blockchain=data.get('blockchain', ''),
+            transaction_type=data.get('transaction_type', ''),
+            from_owner=data.get('from', ''),
+            to_owner=data.get('to', ''),
+            channel_id=data.get('channel_id', ''),
+            text=data.get('text', ''),
+            amounts=[AlertAmount(c, a, u) for c, a, u in parse_amounts(data)]
+        )
+
+    @property
+    def timestamp_iso(self) -> str:
+        """交易时间的 ISO 字符串（时间戳无效时使用当前时间，只计算一次）"""
+        if self._timestamp_iso is None:
+            ts = self.timestamp
+            if isinstance(ts, (int, float)) and ts > 0:
+                self._timestamp_iso = datetime.fromtimestamp(ts).isoformat()
+            else:
+                self._timestamp_iso = datetime.now().isoformat()
+        return self._timestamp_iso
+
+    def __repr__(self):
+        return (f"Alert(tx_hash={self.tx_hash!r}, timestamp={self.timestamp!r}, "
+                f"blockchain={self.blockchain!r}, amounts={self.amounts!r})")
+
+
+def make_event_id(tx_hash: str, currency: str, asset_count: int) -> str:
+    """
+    生成事件ID
+
+    单币种交易直接使用交易哈希（与历史数据保持一致）；
+    多币种交易每个币种一个观察窗口，使用 "{hash}:{币种}"。
+
+    参数:
+    - tx_hash: 交易哈希
+    - currency: 币种
+    - asset_count: 该交易包含的币种数量
+
+    返回:
+    - 事件ID
+    """
+    if asset_count <= 1:
+        return tx_hash
+    return f"{tx_hash}:{currency}"
+
+
+def build_event_data(alert: Alert, asset: AlertAmount, baseline_price: float,
+                     baseline_time: Optional[str] = None) -> dict:
+    """
+    构建保存到 Redis 的事件数据（所有值都已是字符串，写入时无需再转换）
+
+    参数:
+    - alert: 解码后的警报
+    - asset: 该观察窗口对应的币种
+    - baseline_price: 基准价格
+    - baseline_time: 基准时间 ISO 字符串，默认当前时间（同一警报的多个币种共用）
+
+    返回:
+    - 事件数据字典
+    """
+    event_data = {
+        "timestamp": alert.timestamp_iso,
+        "amount": str(asset.amount),
+        "amount_usd": str(asset.amount_usd),
+        "currency": asset.currency,
+        "from_address": alert.from_owner,
+        "to_address": alert.to_owner,
+        "blockchain": alert.blockchain,
+        "transaction_type": alert.transaction_type,
+        "channel_id": alert.channel_id,
+        "text": alert.text,
+        "baseline_price": str(baseline_price),
+        "baseline_time": baseline_time or datetime.now().isoformat(),
+        "status": "observing"
+    }
+    if alert.exchange_flow:
+        event_data["exchange_flow"] = alert.exchange_flow
+    if len(alert.amounts) > 1:
+        # 多币种交易：记录原始交易哈希，便于关联同一笔交易的其他币种
+        event_data["tx_hash"] = alert.tx_hash
+        event_data["asset_count"] = str(len(alert.amounts))
+    return event_data
+
+
+def build_alert_observations(alert: Alert, prices: dict) -> Tuple[list, list]:
+    """
+    把一条警报展开为每个币种一个观察窗口
+
+    参数:
+    - alert: 解码后的警报
+    - prices: {币种: 基准价格}
+
+    返回:
+    - (items, skipped)：items 为 [(event_id, event_data, baseline_price, asset), ...]，
+      skipped 为无法获取价格的币种列表
+    """
+    items = []
+    skipped = []
+    asset_count = len(alert.amounts)
+    baseline_time = datetime.now().isoformat()
+    for asset in alert.amounts:
+        price = prices.get(asset.currency)
+        if not price:
+            skipped.append(asset.currency)
+            continue
+        event_id = make_event_id(alert.tx_hash, asset.currency, asset_count)
+        event_data = build_event_data(alert, asset, price, baseline_time)
+        items.append((event_id, event_data, price, asset))
+    return items, skipped
+
+
+def format_event_line(event_id: str, alert: Alert, asset: AlertAmount, price: float) -> str:
+    """
+    格式化新事件的日志行
+
+    返回:
+    - 日志字符串
+    """
+    from_addr = alert.from_owner or 'Unknown'
+    to_addr = alert.to_owner or 'Unknown'
+    # 如果地址太长，截断显示
+    from_display = from_addr[:20] + '...' if len(from_addr) > 20 else from_addr
+    to_display = to_addr[:20] + '...' if len(to_addr) > 20 else to_addr
+
+    return (f"✓ 新事件: {event_id[:16]}... | "
+            f"从 {from_display} → {to_display} | "
+            f"{asset.amount:,.2f} {asset.currency.upper()} (${asset.amount_usd:,.0f}) | "
+            f"价格: ${price:,.2f}")
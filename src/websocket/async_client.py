@@ -0,0 +1,310 @@
+"""Whale Alert WebSocket异步客户端（asyncio + websockets）"""
+import asyncio
+import json
+from typing import Optional
+
+import websockets
+
+from src.storage.async_redis_client import AsyncRedisClient
+from src.storage.dedup import AlertDeduplicator
+from src.storage.address_index import get_shared_address_index
+from src.data_collectors.async_binance import AsyncBinanceCollector
+from src.observers.async_price_observer import AsyncPriceObserver
+from src.websocket.alert import (
+    Alert, build_subscription, build_alert_observations, format_event_line
+)
+from src.websocket import codec
+from src.websocket.whale_alert_ws import print_subscription_error
+from src.websocket.supervisor import ReconnectSupervisor
+from config import settings
+
+
+class AsyncWhaleAlertWebSocket:
+    """
+    Whale Alert WebSocket异步客户端
+
+    订阅、价格查询和 Redis 写入都在同一个事件循环中执行，
+    多条警报的 I/O 可以同时进行，不需要额外线程。
+    """
+
+    def __init__(self, redis_client: AsyncRedisClient, binance: AsyncBinanceCollector,
+                 api_key: Optional[str] = None, max_inflight: Optional[int] = None):
+        """
+        初始化异步WebSocket客户端
+
+        参数:
+        - redis_client: 共享的异步 Redis 客户端
+        - binance: 共享的异步 Binance 收集器
+        - api_key: Whale Alert API密钥
+        - max_inflight: 同时处理的警报数量上限，默认读取 WS_ASYNC_MAX_INFLIGHT
+        """
+        self.api_key = api_key or settings.WHALE_ALERT_API_KEY
+        if not self.api_key:
+            raise ValueError("需要提供Whale Alert API密钥")
+
+        # 与同步客户端相同：优先使用自定义端点
+        self.ws_url = settings.WHALE_ALERT_WS_URL or f"wss://leviathan.whale-alert.io/ws?api_key={self.api_key}"
+
+        self.redis_client = redis_client
+        self.binance = binance
+
+        self.max_inflight = max_inflight or settings.WS_ASYNC_MAX_INFLIGHT
+        self.inflight = asyncio.Semaphore(self.max_inflight)
+        self.tasks = set()
+
+        self.running = False
+        self.subscribed = False
+        self.consecutive_429_errors = 0
+        self.subscription_id = None
+        self.supervisor = ReconnectSupervisor(
+            base_delay=settings.WS_RECONNECT_BASE_DELAY,
+            max_delay=settings.WS_RECONNECT_MAX_DELAY,
+            jitter=settings.WS_RECONNECT_JITTER,
+            on_outage=self._save_outage
+        )
+        self.dedup = None
+        if settings.WS_DEDUP_ENABLED:
+            self.dedup = AlertDeduplicator(settings.WS_DEDUP_CAPACITY, settings.WS_DEDUP_ERROR_RATE)
+        self.address_index = get_shared_address_index()
+
+    async def is_duplicate(self, tx_hash: str) -> bool:
+        """检查交易是否已经处理过（与 WhaleAlertWebSocket.is_duplicate 相同）"""
+        if not self.dedup:
+            return False
+        if self.dedup.seen_locally(tx_hash):
+            return True
+        try:
+            claimed = await self.redis_client.claim_alert(tx_hash, settings.WS_DEDUP_TTL)
+        except Exception as e:
+            print(f"去重检查失败: {e}", flush=True)
+            self.dedup.record_error(tx_hash)
+            return False
+        self.dedup.record_claim(tx_hash, claimed)
+        return not claimed
+
+    async def _finish_claim(self, tx_hash: str, saved: bool):
+        """处理结束后确认或释放去重占位（与 WhaleAlertWebSocket._finish_claim 相同）"""
+        if not self.dedup:
+            return
+        if saved:
+            self.dedup.mark_processed(tx_hash)
+            return
+        try:
+            await self.redis_client.release_alert(tx_hash)
+        except Exception as e:
+            print(f"释放去重占位失败: {e}", flush=True)
+
+    async def handle_alert(self, alert: Alert):
+        """
+        处理警报数据，逻辑与 WhaleAlertWebSocket.handle_alert 一致
+
+        参数:
+        - alert: 解码后的警报
+        """
+        event_id = alert.tx_hash
+        if not event_id:
+            print("警告: 收到的事件没有交易哈希", flush=True)
+            return
+        if await self.is_duplicate(event_id):
+            return
+
+        saved = False
+        try:
+            if not alert.amounts:
+                print(f"警告: 事件 {event_id[:8]}... 没有金额信息", flush=True)
+                return
+
+            prices = await self.binance.get_current_prices([asset.currency for asset in alert.amounts])
+            alert.exchange_flow = self.address_index.classify(alert.from_owner, alert.to_owner)
+            items, skipped = build_alert_observations(alert, prices)
+            for currency in skipped:
+                print(f"无法获取价格: {currency.upper()}，跳过事件 {event_id[:8]}... 的该币种", flush=True)
+            if not items:
+                return
+
+            await self.redis_client.save_alert_observations(
+                [(item_id, event_data, price) for item_id, event_data, price, _ in items],
+                window_hours=24
+            )
+            saved = True
+            # 统计信息（全量扫描）由观察器在每次检查后更新，这里不再逐条刷新
+
+            for item_id, _, price, asset in items:
+                print(format_event_line(item_id, alert, asset, price), flush=True)
+
+        except Exception as e:
+            print(f"处理警报错误: {e}, 数据: {alert}", flush=True)
+        finally:
+            await self._finish_claim(event_id, saved)
+
+    def _save_outage(self, record: dict):
+        """保存断线记录（监督器回调是同步的，这里创建后台任务写入 Redis）"""
+        task = asyncio.get_running_loop().create_task(self._persist_outage(record))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def _persist_outage(self, record: dict):
+        """写入断线记录和重连统计"""
+        try:
+            await self.redis_client.record_outage(record)
+            await self.redis_client.save_metrics('reconnect', self.supervisor.stats())
+        except Exception as e:
+            print(f"保存断线记录失败: {e}", flush=True)
+
+    async def dispatch_alert(self, alert: Alert):
+        """
+        为警报创建处理任务；达到并发上限时等待（背压），不阻塞 ping/pong
+
+        参数:
+        - alert: 解码后的警报
+        """
+        self.supervisor.on_alert(alert.timestamp)
+        await self.inflight.acquire()
+        task = asyncio.create_task(self.handle_alert(alert))
+        self.tasks.add(task)
+
+        def _done(t):
+            self.tasks.discard(t)
+            self.inflight.release()
+
+        task.add_done_callback(_done)
+
+    async def handle_message(self, message):
+        """处理接收到的消息"""
+        try:
+            data = codec.loads(message)
+        except codec.DecodeError as e:
+            print(f"JSON解析错误: {e}, 消息: {str(message)[:100]}", flush=True)
+            return
+
+        if 'error' in data:
+            print_subscription_error(data)
+            return
+
+        msg_type = data.get('type', '')
+        if msg_type == 'subscribed_alerts':
+            self.subscribed = True
+            self.consecutive_429_errors = 0
+            self.supervisor.on_subscribed()
+            await self.redis_client.touch_alive()
+            print(f"✓ 订阅成功: ID={data.get('id', 'N/A')}, "
+                  f"区块链={data.get('blockchains', [])}, "
+                  f"币种={data.get('symbols', [])}, "
+                  f"最小金额=${data.get('min_value_usd', 0):,.0f}", flush=True)
+        elif 'channel_id' in data or 'transaction' in data:
+            await self.dispatch_alert(Alert.from_dict(data))
+        else:
+            print(f"收到消息: {data}", flush=True)
+
+    async def _keep_alive(self):
+        """连接期间每30秒刷新最后存活时间，用于计算进程重启造成的断线时长"""
+        while True:
+            await asyncio.sleep(30)
+            if self.subscribed:
+                try:
+                    await self.redis_client.touch_alive()
+                    if self.dedup:
+                        await self.redis_client.save_metrics('dedup', self.dedup.stats())
+                except Exception as e:
+                    print(f"更新存活时间失败: {e}", flush=True)
+
+    async def run(self):
+        """连接并持续接收消息，断开后按监督器的退避时间重连（循环，而非递归）"""
+        self.running = True
+        display_url = self.ws_url.split('?')[0] if '?' in self.ws_url else self.ws_url
+
+        self.subscription_id = await self.redis_client.get_subscription_id(settings.WHALE_ALERT_SUBSCRIPTION_ID)
+        if self.dedup:
+            try:
+                count = self.dedup.warm_up(await self.redis_client.get_recent_alerts(settings.WS_DEDUP_TTL))
+                print(f"去重过滤器已加载 {count} 个最近处理的交易", flush=True)
+            except Exception as e:
+                print(f"加载去重记录失败: {e}", flush=True)
+        last_alive = await self.redis_client.get_last_alive()
+        if last_alive:
+            self.supervisor.on_disconnected(reason="进程重启", since=last_alive)
+
+        keep_alive = asyncio.create_task(self._keep_alive())
+        try:
+            while self.running:
+                try:
+                    print(f"正在连接到 {display_url}...", flush=True)
+                    async with websockets.connect(
+                        self.ws_url,
+                        ping_interval=30,  # 每30秒发送ping保持连接
+                        ping_timeout=10,   # ping超时10秒
+                        user_agent_header='WhaleAlertTrends/1.0'
+                    ) as ws:
+                        await ws.send(json.dumps(build_subscription(self.subscription_id)))
+                        print(f"已发送订阅请求: 订阅ID={self.subscription_id}", flush=True)
+                        async for message in ws:
+                            await self.handle_message(message)
+                        self.supervisor.on_disconnected(reason=f"close {ws.close_code}")
+
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    error_str = str(e)
+                    print(f"WebSocket错误: {error_str}", flush=True)
+                    if "429" in error_str:
+                        self.consecutive_429_errors += 1
+                        self.supervisor.on_rate_limited()
+                        print(f"⚠️  请求过于频繁 (429)，连续 {self.consecutive_429_errors} 次", flush=True)
+                    self.supervisor.on_disconnected(reason=error_str[:100])
+
+                self.subscribed = False
+                if self.running:
+                    delay = self.supervisor.next_delay()
+                    print(f"{delay:.1f}秒后尝试重连...", flush=True)
+                    await asyncio.sleep(delay)
+        finally:
+            keep_alive.cancel()
+            self.supervisor.close()
+            if not self.running:
+                # 正常停止（stop()）：删除最后存活时间，下次启动时不把停机时间记为断线
+                try:
+                    await self.redis_client.clear_alive()
+                except Exception as e:
+                    print(f"清除存活时间失败: {e}", flush=True)
+
+    async def drain(self, timeout: float = 10):
+        """等待正在处理的警报完成"""
+        if self.tasks:
+            await asyncio.wait(set(self.tasks), timeout=timeout)
+
+    def stop(self):
+        """停止重连循环"""
+        self.running = False
+
+
+async def run_async_monitor(check_interval: int = 300):
+    """
+    在一个事件循环中运行订阅、价格查询、Redis 写入和观察器
+
+    参数:
+    - check_interval: 观察器检查间隔（秒）
+    """
+    redis_client = AsyncRedisClient()
+    await redis_client.connect()
+    binance = AsyncBinanceCollector()
+    await binance.start()
+
+    client = AsyncWhaleAlertWebSocket(redis_client, binance)
+    observer = AsyncPriceObserver(redis_client, binance, check_interval=check_interval,
+                                  concurrency=settings.OBSERVER_ASYNC_CONCURRENCY)
+
+    tasks = [
+        asyncio.create_task(client.run(), name='whale-alert-ws'),
+        asyncio.create_task(observer.run(), name='price-observer'),
+    ]
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        client.stop()
+        observer.stop()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await client.drain()
+        await binance.close()
+        await redis_client.close()
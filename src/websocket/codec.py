@@ -0,0 +1,61 @@
+"""WebSocket 消息 JSON 解码器 - 优先使用 orjson / msgspec，未安装时回退到标准库 json"""
+import json
+from typing import Callable, Optional, Tuple
+
+from config import settings
+
+DECODERS = ('orjson', 'msgspec', 'json')
+
+
+def load_decoder(name: str) -> Optional[Tuple[Callable, tuple]]:
+    """
+    加载指定的解码器
+
+    参数:
+    - name: 'orjson'、'msgspec' 或 'json'
+
+    返回:
+    - (loads 函数, 解码失败时抛出的异常类型元组)，未安装时返回None
+    """
+    if name == 'orjson':
+        try:
+            import orjson
+        except ImportError:
+            return None
+        # orjson.JSONDecodeError 是 json.JSONDecodeError 的子类
+        return orjson.loads, (json.JSONDecodeError,)
+    if name == 'msgspec':
+        try:
+            import msgspec
+        except ImportError:
+            return None
+        return msgspec.json.Decoder().decode, (msgspec.DecodeError, json.JSONDecodeError)
+    if name == 'json':
+        return json.loads, (json.JSONDecodeError,)
+    return None
+
+
+def get_decoder(name: str = 'auto') -> Tuple[str, Callable, tuple]:
+    """
+    选择 JSON 解码器
+
+    参数:
+    - name: 'auto'（按 orjson → msgspec → json 顺序选择第一个已安装的）或指定的解码器名
+
+    返回:
+    - (解码器名, loads 函数, 解码失败时抛出的异常类型元组)
+    """
+    if name != 'auto':
+        loaded = load_decoder(name)
+        if loaded:
+            return (name,) + loaded
+        print(f"JSON 解码器 {name} 不可用，回退到自动选择", flush=True)
+    for candidate in DECODERS:
+        loaded = load_decoder(candidate)
+        if loaded:
+            return (candidate,) + loaded
+    return 'json', json.loads, (json.JSONDecodeError,)
+
+
+# 模块级默认解码器（WS_JSON_DECODER 可强制指定，用于对比测试）
+DECODER_NAME, loads, DecodeError = get_decoder(settings.WS_JSON_DECODER)
@@ -0,0 +1,179 @@
+"""原始 WebSocket 帧的录制与回放"""
+import gzip
+import os
+import struct
+import threading
+import time
+from typing import Iterator, Optional, Tuple
+
+from src.utils.stats import percentile
+
+# 文件格式：魔数 + 若干条记录
+# 每条记录：<接收时间 float64 epoch 秒><帧长度 uint32><UTF-8 帧内容>
+# 以 .gz 结尾的路径会使用 gzip 压缩
+MAGIC = b'WAFRAME1'
+RECORD_HEADER = struct.Struct('<dI')
+
+
+def _open(path: str, mode: str):
+    """按扩展名选择普通文件或 gzip 文件"""
+    if str(path).endswith('.gz'):
+        return gzip.open(path, mode)
+    return open(path, mode)
+
+
+class FrameRecorder:
+    """把接收到的每一帧原始消息追加写入磁盘（线程安全）"""
+
+    def __init__(self, path: str, flush_interval: float = 1.0):
+        """
+        初始化录制器
+
+        参数:
+        - path: 日志文件路径（追加写入，不存在时创建）
+        - flush_interval: 刷盘间隔（秒）
+        """
+        self.path = str(path)
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        # 按磁盘上的文件大小判断是否新文件：gzip 追加时每次启动都会开始一个新的 member，
+        # 其 tell() 为 0，不能据此重复写入魔数（读取时 gzip 会把多个 member 连成一个流）
+        is_new = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+        self._file = _open(self.path, 'ab')
+        if is_new:
+            self._file.write(MAGIC)
+        self._last_flush = time.monotonic()
+        self.frames = 0
+        print(f"WebSocket 帧录制已启用: {self.path}", flush=True)
+
+    def record(self, message, received_at: Optional[float] = None):
+        """
+        追加一帧
+
+        参数:
+        - message: 原始消息（str 或 bytes）
+        - received_at: 接收时间（epoch 秒），默认当前时间
+        """
+        data = message.encode('utf-8') if isinstance(message, str) else bytes(message)
+        header = RECORD_HEADER.pack(received_at or time.time(), len(data))
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(header)
+            self._file.write(data)
+            self.frames += 1
+            now = time.monotonic()
+            if now - self._last_flush >= self.flush_interval:
+                self._file.flush()
+                self._last_flush = now
+
+    def close(self):
+        """关闭文件"""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def iter_frames(path: str) -> Iterator[Tuple[float, str]]:
+    """
+    读取录制的帧
+
+    参数:
+    - path: 日志文件路径
+
+    返回:
+    - 迭代器，每项为 (接收时间, 帧内容)
+    """
+    with _open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"不是有效的帧日志文件: {path}")
+        while True:
+            try:
+                header = f.read(RECORD_HEADER.size)
+                if len(header) < RECORD_HEADER.size:
+                    break  # 文件结束（或最后一条写入不完整）
+                received_at, length = RECORD_HEADER.unpack(header)
+                data = f.read(length)
+            except EOFError:
+                break  # 进程被杀时最后一个 gzip member 没有写完，视为日志结束
+            if len(data) < length:
+                break
+            yield received_at, data.decode('utf-8')
+
+
+class FrameReplayer:
+    """把录制的帧按原始节奏（或加速）送回 WhaleAlertWebSocket.on_message"""
+
+    def __init__(self, client, path: str, speed: float = 1.0):
+        """
+        初始化回放器
+
+        参数:
+        - client: WhaleAlertWebSocket 实例（走与线上相同的 on_message 代码路径）
+        - path: 日志文件路径
+        - speed: 回放速度，1 为实时，N 为 N 倍速，0 为尽可能快
+        """
+        self.client = client
+        self.path = path
+        self.speed = speed
+
+    def run(self) -> dict:
+        """
+        执行回放
+
+        返回:
+        - 回放报告：帧数、警报数、耗时、alerts/sec、延迟分位数（毫秒）
+        """
+        client = self.client
+        queue = getattr(client, 'ingest_queue', None)
+        if queue and not queue.running:
+            queue.start()
+
+        alerts_before = client.alerts_received
+        latencies = []
+        frames = 0
+        first_ts = None
+        started = time.monotonic()
+
+        for received_at, message in iter_frames(self.path):
+            if self.speed > 0:
+                # 按录制时的时间间隔（除以速度）等待
+                if first_ts is None:
+                    first_ts = received_at
+                target = started + (received_at - first_ts) / self.speed
+                delay = target - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+
+            count_before = client.alerts_received
+            t0 = time.perf_counter()
+            client.on_message(None, message)
+            elapsed = time.perf_counter() - t0
+            if client.alerts_received > count_before:
+                latencies.append(elapsed)
+            frames += 1
+
+        # 使用摄取队列时，等待工作线程处理完所有警报
+        if queue and queue.running:
+            queue.queue.join()
+        duration = time.monotonic() - started
+        alerts = client.alerts_received - alerts_before
+
+        report = {
+            "frames": frames,
+            "alerts": alerts,
+            "duration_s": round(duration, 3),
+            "alerts_per_sec": round(alerts / duration, 1) if duration > 0 else 0.0,
+        }
+        if queue:
+            # 入队只是接收线程的开销，端到端延迟以队列统计为准
+            stats = queue.stats()
+            report["p50_ms"] = stats["total_p50_ms"]
+            report["p99_ms"] = stats["total_p99_ms"]
+            report["dropped"] = stats["dropped"]
+        else:
+            latencies.sort()
+            report["p50_ms"] = round(percentile(latencies, 50) * 1000, 2)
+            report["p99_ms"] = round(percentile(latencies, 99) * 1000, 2)
+        return report
@@ -0,0 +1,220 @@
+"""警报摄取队列 - 接收线程只负责入队，由工作线程池处理警报"""
+import queue
+import threading
+import time
+from collections import deque
+from typing import Callable, Optional
+
+from src.utils.stats import percentile
+from src.websocket.alert import Alert
+
+
+class AlertIngestQueue:
+    """
+    有界警报队列 + 工作线程池
+
+    WebSocket 接收线程只调用 submit() 入队，耗时的价格查询和 Redis 写入
+    全部在工作线程中完成，避免突发警报阻塞连接（ping 超时）。
+    """
+
+    # 队列满时的处理策略
+    # - block: 阻塞接收线程最多 block_timeout 秒（背压），超时后丢弃新警报
+    # - drop_newest: 直接丢弃新到的警报
+    # - drop_oldest: 丢弃队列中最旧的警报，为新警报腾出位置
+    POLICIES = ('block', 'drop_newest', 'drop_oldest')
+
+    def __init__(self, handler: Callable[[Alert], None], workers: int = 4,
+                 maxsize: int = 1000, policy: str = 'drop_oldest',
+                 block_timeout: float = 1.0, report_interval: int = 60,
+                 reporter: Optional[Callable[[dict], None]] = None,
+                 latency_window: int = 1000):
+        """
+        初始化摄取队列
+
+        参数:
+        - handler: 处理单条警报的函数（参数为解码后的 Alert）
+        - workers: 工作线程数量
+        - maxsize: 队列最大长度
+        - policy: 队列满时的处理策略（见 POLICIES）
+        - block_timeout: block 策略下的最长等待时间（秒）
+        - report_interval: 指标汇报间隔（秒），0 表示不汇报
+        - reporter: 指标汇报回调，参数为 stats() 返回的字典
+        - latency_window: 计算延迟分位数时保留的最近样本数
+        """
+        if policy not in self.POLICIES:
+            raise ValueError(f"未知的队列策略: {policy}，可选: {', '.join(self.POLICIES)}")
+        if workers < 1:
+            raise ValueError("工作线程数量至少为 1")
+
+        self.handler = handler
+        self.workers = workers
+        self.maxsize = maxsize
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.report_interval = report_interval
+        self.reporter = reporter
+
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.threads = []
+        self.running = False
+
+        # 计数器（在锁内更新）
+        self._lock = threading.Lock()
+        self.enqueued = 0
+        self.processed = 0
+        self.failed = 0
+        self.dropped = 0
+        self.max_depth = 0
+        # 最近样本：处理耗时与端到端耗时（入队 -> 处理完成），单位秒
+        self._process_latencies = deque(maxlen=latency_window)
+        self._total_latencies = deque(maxlen=latency_window)
+        self._last_report = time.monotonic()
+
+    def start(self):
+        """启动工作线程"""
+        if self.running:
+            return
+        self.running = True
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"alert-worker-{i}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        print(f"警报摄取队列已启动: {self.workers} 个工作线程, 队列上限 {self.maxsize}, 策略 {self.policy}", flush=True)
+
+    def stop(self, timeout: float = 5.0):
+        """
+        停止工作线程（会先尽量处理完队列中剩余的警报）
+
+        参数:
+        - timeout: 等待每个线程退出的最长时间（秒）
+        """
+        if not self.running:
+            return
+        self.running = False
+        for _ in self.threads:
+            try:
+                self.queue.put_nowait(None)  # 哨兵，通知线程退出
+            except queue.Full:
+                break
+        for thread in self.threads:
+            thread.join(timeout=timeout)
+        self.threads = []
+        print(f"警报摄取队列已停止: 剩余 {self.queue.qsize()} 条未处理", flush=True)
+
+    def submit(self, alert: Alert) -> bool:
+        """
+        提交一条警报（在接收线程中调用，不做任何网络操作）
+
+        参数:
+        - alert: 解码后的警报（Alert.from_dict）
+
+        返回:
+        - True 表示已入队，False 表示被丢弃
+        """
+        item = (time.monotonic(), alert)
+        try:
+            if self.policy == 'block':
+                self.queue.put(item, timeout=self.block_timeout)
+            else:
+                self.queue.put_nowait(item)
+        except queue.Full:
+            if self.policy != 'drop_oldest':
+                return self._drop()
+            # 丢弃最旧的一条，再尝试入队
+            try:
+                self.queue.get_nowait()
+                self.queue.task_done()
+                self._drop()
+                self.queue.put_nowait(item)
+            except (queue.Empty, queue.Full):
+                return self._drop()
+
+        with self._lock:
+            self.enqueued += 1
+            depth = self.queue.qsize()
+            if depth > self.max_depth:
+                self.max_depth = depth
+        return True
+
+    def _drop(self) -> bool:
+        """记录一次丢弃"""
+        with self._lock:
+            self.dropped += 1
+            dropped = self.dropped
+        # 避免突发时刷屏：只打印前几次和之后每 100 次
+        if dropped <= 5 or dropped % 100 == 0:
+            print(f"⚠️  警报队列已满（{self.maxsize}），已丢弃 {dropped} 条警报（策略: {self.policy}）", flush=True)
+        return False
+
+    def _worker(self):
+        """工作线程：从队列取出警报并处理"""
+        while True:
+            item = self.queue.get()
+            if item is None:
+                self.queue.task_done()
+                break
+
+            enqueued_at, alert = item
+            started = time.monotonic()
+            ok = True
+            try:
+                self.handler(alert)
+            except Exception as e:
+                ok = False
+                print(f"工作线程处理警报错误: {e}", flush=True)
+            finished = time.monotonic()
+
+            with self._lock:
+                if ok:
+                    self.processed += 1
+                else:
+                    self.failed += 1
+                self._process_latencies.append(finished - started)
+                self._total_latencies.append(finished - enqueued_at)
+            self.queue.task_done()
+
+            self._maybe_report()
+
+    def _maybe_report(self):
+        """按间隔汇报指标"""
+        if not self.report_interval or not self.reporter:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_report < self.report_interval:
+                return
+            self._last_report = now
+        try:
+            self.reporter(self.stats())
+        except Exception as e:
+            print(f"汇报队列指标失败: {e}", flush=True)
+
+    def stats(self) -> dict:
+        """
+        获取队列指标
+
+        返回:
+        - 包含队列深度、计数器和延迟分位数（毫秒）的字典
+        """
+        with self._lock:
+            process = sorted(self._process_latencies)
+            total = sorted(self._total_latencies)
+            stats = {
+                "depth": self.queue.qsize(),
+                "max_depth": self.max_depth,
+                "maxsize": self.maxsize,
+                "workers": self.workers,
+                "policy": self.policy,
+                "enqueued": self.enqueued,
+                "processed": self.processed,
+                "failed": self.failed,
+                "dropped": self.dropped,
+            }
+        stats.update({
+            "process_p50_ms": round(percentile(process, 50) * 1000, 2),
+            "process_p99_ms": round(percentile(process, 99) * 1000, 2),
+            "process_max_ms": round((process[-1] if process else 0.0) * 1000, 2),
+            "total_p50_ms": round(percentile(total, 50) * 1000, 2),
+            "total_p99_ms": round(percentile(total, 99) * 1000, 2),
+        })
+        return stats
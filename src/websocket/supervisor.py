@@ -0,0 +1,189 @@
+"""重连监督器 - 抖动指数退避 + 断线时长 / 补发警报统计"""
+import random
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Callable, Optional
+
+
+class ReconnectSupervisor:
+    """
+    重连监督器（同步和异步客户端共用，不做任何 I/O）
+
+    - next_delay(): 计算下一次重连前的等待时间（指数退避 + 随机抖动）
+    - on_disconnected() / on_subscribed(): 记录每次断线的起止时间
+    - on_alert(): 重连后 catchup_window 秒内、时间戳在 [断线时刻, 重连时刻] 内的警报视为 Whale Alert 补发的警报
+
+    一次断线在收到第一条实时警报、补发窗口结束、再次断线或 close() 时结束，
+    结束后通过 on_outage 回调交给调用方持久化。
+    """
+
+    def __init__(self, base_delay: float = 5, max_delay: float = 300, jitter: float = 0.5,
+                 rate_limit_min_delay: float = 30, catchup_window: float = 60,
+                 on_outage: Optional[Callable[[dict], None]] = None,
+                 history: int = 50):
+        """
+        初始化重连监督器
+
+        参数:
+        - base_delay: 首次重连等待时间（秒）
+        - max_delay: 最大等待时间（秒）
+        - jitter: 抖动比例，实际等待时间在 [delay*(1-jitter), delay] 之间均匀分布
+        - rate_limit_min_delay: 遇到 429 时的最小等待时间（秒）
+        - catchup_window: 重连后统计补发警报的时间窗口（秒）
+        - on_outage: 一次断线结束时的回调，参数为断线记录字典
+        - history: 内存中保留的断线记录数
+        """
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.rate_limit_min_delay = rate_limit_min_delay
+        self.catchup_window = catchup_window
+        self.on_outage = on_outage
+
+        self._lock = threading.Lock()
+        self.attempts = 0  # 连续失败的连接次数（订阅成功后清零）
+        self.rate_limited = False
+        self.disconnected_at: Optional[float] = None  # 当前断线开始时间（epoch 秒）
+        self.disconnect_reason = ''
+        self.pending: Optional[dict] = None  # 已重连、正在统计补发警报的断线记录
+        self.outages = deque(maxlen=history)
+        self.total_outages = 0
+        self.total_downtime = 0.0
+        self.total_replayed = 0
+
+    def next_delay(self) -> float:
+        """
+        计算下一次重连前的等待时间，并递增失败次数
+
+        返回:
+        - 等待秒数
+        """
+        with self._lock:
+            delay = min(self.base_delay * (2 ** self.attempts), self.max_delay)
+            if self.rate_limited:
+                delay = max(delay, self.rate_limit_min_delay)
+            self.attempts += 1
+        # 抖动：避免多个实例（或 Railway 重启后）同时重连
+        return delay * (1 - self.jitter * random.random())
+
+    def on_rate_limited(self):
+        """收到 429 时调用"""
+        with self._lock:
+            self.rate_limited = True
+
+    def on_disconnected(self, reason: str = '', since: Optional[float] = None):
+        """
+        连接断开（或启动时发现上次运行中断）时调用
+
+        参数:
+        - reason: 断开原因（关闭代码或错误信息）
+        - since: 断线开始时间（epoch 秒），默认当前时间
+        """
+        finished = None
+        with self._lock:
+            if self.pending:
+                finished = self._finish_pending()
+            if self.disconnected_at is None:
+                self.disconnected_at = since or time.time()
+                self.disconnect_reason = reason
+        if finished:
+            self._emit(finished)
+
+    def on_subscribed(self):
+        """订阅确认后调用：结束断线计时，进入补发警报统计阶段"""
+        with self._lock:
+            self.attempts = 0
+            self.rate_limited = False
+            if self.disconnected_at is None:
+                return
+            now = time.time()
+            self.pending = {
+                "started_at": datetime.fromtimestamp(self.disconnected_at).isoformat(),
+                "ended_at": datetime.fromtimestamp(now).isoformat(),
+                "duration_s": round(now - self.disconnected_at, 1),
+                "reason": self.disconnect_reason,
+                "disconnected_ts": self.disconnected_at,
+                "reconnected_ts": now,
+                "replayed": 0,
+            }
+            self.disconnected_at = None
+            self.disconnect_reason = ''
+
+    def on_alert(self, alert_timestamp) -> bool:
+        """
+        收到警报时调用
+
+        参数:
+        - alert_timestamp: 警报自身的时间戳（epoch 秒）
+
+        返回:
+        - True 表示该警报是重连后补发的（发生在断线期间）
+        """
+        finished = None
+        replayed = False
+        with self._lock:
+            if not self.pending:
+                return False
+            in_window = time.time() - self.pending["reconnected_ts"] <= self.catchup_window
+            if (in_window and isinstance(alert_timestamp, (int, float))
+                    and alert_timestamp <= self.pending["reconnected_ts"]):
+                # 只统计发生在断线期间的警报；更早的是断线前已收到过的重复投递，不计数也不结束补发
+                if alert_timestamp >= self.pending["disconnected_ts"]:
+                    self.pending["replayed"] += 1
+                    replayed = True
+            else:
+                # 第一条实时警报（或补发窗口已过）：补发结束
+                finished = self._finish_pending()
+        if finished:
+            self._emit(finished)
+        return replayed
+
+    def close(self):
+        """停止时调用，结束正在统计的断线记录"""
+        with self._lock:
+            finished = self._finish_pending() if self.pending else None
+        if finished:
+            self._emit(finished)
+
+    def _finish_pending(self) -> dict:
+        """结束当前断线记录（需持有锁）"""
+        record = self.pending
+        self.pending = None
+        record.pop("disconnected_ts", None)
+        record.pop("reconnected_ts", None)
+        self.outages.append(record)
+        self.total_outages += 1
+        self.total_downtime += record["duration_s"]
+        self.total_replayed += record["replayed"]
+        return record
+
+    def _emit(self, record: dict):
+        """打印并回调断线记录"""
+        print(f"[重连] 断线 {record['duration_s']:.1f} 秒（{record['reason'] or '未知原因'}），"
+              f"重连后补发 {record['replayed']} 条警报", flush=True)
+        if self.on_outage:
+            try:
+                self.on_outage(record)
+            except Exception as e:
+                print(f"保存断线记录失败: {e}", flush=True)
+
+    def stats(self) -> dict:
+        """
+        获取重连统计
+
+        返回:
+        - 统计字典
+        """
+        with self._lock:
+            last = self.outages[-1] if self.outages else {}
+            return {
+                "total_outages": self.total_outages,
+                "total_downtime_s": round(self.total_downtime, 1),
+                "total_replayed": self.total_replayed,
+                "last_outage_duration_s": last.get("duration_s", 0),
+                "last_outage_replayed": last.get("replayed", 0),
+                "consecutive_failures": self.attempts,
+                "connected": self.disconnected_at is None,
+            }
@@ -2,24 +2,97 @@
 import websocket
 import json
 import threading
-from datetime import datetime
 from typing import Optional
 import time
 
 from src.storage.redis_client import RedisClient
+from src.storage.dedup import AlertDeduplicator
+from src.storage.address_index import get_shared_address_index
 from src.data_collectors.binance import BinanceCollector
+from src.websocket.ingest_queue import AlertIngestQueue
+from src.websocket.supervisor import ReconnectSupervisor
+from src.websocket.frame_log import FrameRecorder
+from src.websocket.alert import (
+    Alert, build_subscription, build_alert_observations, format_event_line
+)
+from src.websocket import codec
 from config import settings
 
 
+def print_subscription_error(data: dict):
+    """
+    打印订阅错误及排查建议
+    
+    参数:
+    - data: 包含 error 字段的消息
+    """
+    error_msg = data.get('error', 'Unknown error')
+    print(f"✗ 订阅错误: {error_msg}", flush=True)
+    print(f"完整错误信息: {data}", flush=True)
+    
+    # 处理不同类型的错误
+    error_lower = error_msg.lower()
+    
+    if 'rate limit' in error_lower or 'limit exceeded' in error_lower:
+        print("\n⚠️  警报速率限制超出！", flush=True)
+        print("Whale Alert API 每小时最多接收 100 条警报", flush=True)
+        print("\n解决方案：", flush=True)
+        print("1. 减少订阅的币种数量（建议 3-5 个主要币种）", flush=True)
+        print("2. 减少订阅的区块链数量（或留空以监测所有链）", flush=True)
+        print("3. 增加最小转账金额（WHALE_ALERT_MIN_VALUE_USD）", flush=True)
+        print("\n当前订阅配置：", flush=True)
+        print(f"  - 币种: {settings.SYMBOLS if settings.SYMBOLS else '所有币种'}", flush=True)
+        print(f"  - 区块链: {settings.BLOCKCHAINS if settings.BLOCKCHAINS else '所有链'}", flush=True)
+        print(f"  - 最小金额: ${settings.WHALE_ALERT_MIN_VALUE_USD:,.0f}", flush=True)
+        print("\n建议配置（在 .env 文件中设置）：", flush=True)
+        print("  SYMBOLS=btc,eth,sol", flush=True)
+        print("  BLOCKCHAINS=  # 留空，监测所有链", flush=True)
+        print("  WHALE_ALERT_MIN_VALUE_USD=1000000  # 增加到 100 万美元", flush=True)
+        
+    elif 'symbol' in error_lower:
+        print("\n⚠️  币种符号错误", flush=True)
+        print("可能某些币种符号不正确或不被支持", flush=True)
+        print("\n排查步骤：", flush=True)
+        print("1. 先测试单个币种，例如: SYMBOLS=btc", flush=True)
+        print("2. 如果成功，逐个添加其他币种", flush=True)
+        print("3. 常见可能的问题币种：", flush=True)
+        print("   - matic 可能应该是 polygon 或其他", flush=True)
+        print("   - avax 可能应该是 avalanche 或其他", flush=True)
+        print("   - bnb 可能应该是 binance-coin 或其他", flush=True)
+        print("4. 可以查看 Whale Alert 官方文档或使用 /status API 获取有效币种列表", flush=True)
+        print(f"\n当前尝试的币种: {settings.SYMBOLS}", flush=True)
+        print("建议: 先只测试 btc 或 eth，确认配置正确后再添加其他币种", flush=True)
+        print("\n临时解决方案（在 .env 中设置）：", flush=True)
+        print("  SYMBOLS=btc,eth,usdt", flush=True)
+        print("  BLOCKCHAINS=", flush=True)
+        
+    elif 'blockchain' in error_lower:
+        print("\n⚠️  区块链名称错误", flush=True)
+        print("可能某些区块链名称不正确", flush=True)
+        print("\n常见正确的区块链名称: bitcoin, ethereum, solana, avalanche, polygon, bsc, ripple, tron", flush=True)
+        print("如果只想订阅币种，可以尝试不提供 blockchains 参数（留空）", flush=True)
+        print(f"\n当前尝试的区块链: {settings.BLOCKCHAINS}", flush=True)
+        print("\n建议（在 .env 中设置）：", flush=True)
+        print("  BLOCKCHAINS=  # 留空，让 API 自动监测所有链", flush=True)
+        
+    elif 'api' in error_lower or 'key' in error_lower or 'auth' in error_lower:
+        print("\n⚠️  API 认证错误", flush=True)
+        print("请检查 WHALE_ALERT_API_KEY 环境变量是否正确设置", flush=True)
+
+
 class WhaleAlertWebSocket:
     """Whale Alert WebSocket客户端"""
     
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(self, api_key: Optional[str] = None, ingest_workers: Optional[int] = None,
+                 binance: Optional[BinanceCollector] = None, record: bool = True):
         """
         初始化WebSocket客户端
         
         参数:
         - api_key: Whale Alert API密钥
+        - ingest_workers: 警报处理工作线程数，默认读取 WS_INGEST_WORKERS；0 表示在接收线程中直接处理
+        - binance: Binance 收集器（默认新建；可传入带行情流价格簿的收集器，与观察器共用）
+        - record: 是否按 WS_RECORD_PATH 录制原始帧（回放时传 False，不会打开录制文件）
         """
         self.api_key = api_key or settings.WHALE_ALERT_API_KEY
         if not self.api_key:
@@ -36,75 +109,60 @@ class WhaleAlertWebSocket:
         
         # 初始化Redis和Binance客户端
         self.redis_client = RedisClient()
-        self.binance = BinanceCollector()
+        self.binance = binance or BinanceCollector()
         
         self.ws = None
         self.running = False
-        self.reconnect_delay = 5  # 重连延迟（秒）
         self.subscribed = False  # 订阅状态
         self.consecutive_429_errors = 0  # 连续 429 错误计数
-        self.max_reconnect_delay = 300  # 最大重连延迟（5分钟）
+        
+        # 重连监督器：单循环重连 + 抖动指数退避，记录断线时长和补发警报数
+        self.supervisor = ReconnectSupervisor(
+            base_delay=settings.WS_RECONNECT_BASE_DELAY,
+            max_delay=settings.WS_RECONNECT_MAX_DELAY,
+            jitter=settings.WS_RECONNECT_JITTER,
+            on_outage=self._save_outage
+        )
+        # 稳定的订阅ID：重连（包括进程重启）后 Whale Alert 会补发断线期间错过的警报
+        self.subscription_id = None
+        
+        # 收到的警报数（回放时用于统计吞吐量）
+        self.alerts_received = 0
+        # 原始帧录制（配置 WS_RECORD_PATH 时启用，可用 scripts/replay_frames.py 回放）
+        self.recorder = FrameRecorder(settings.WS_RECORD_PATH) if record and settings.WS_RECORD_PATH else None
+        
+        # 按交易哈希去重：重连补发或重复投递的警报在查询价格之前丢弃
+        self.dedup = None
+        if settings.WS_DEDUP_ENABLED:
+            self.dedup = AlertDeduplicator(settings.WS_DEDUP_CAPACITY, settings.WS_DEDUP_ERROR_RATE)
+        
+        # 交易所地址索引：判断每条警报是转入还是转出交易所（单次查找 O(1)）
+        self.address_index = get_shared_address_index()
+        
+        # 警报摄取队列：接收线程只入队，由工作线程池处理
+        workers = settings.WS_INGEST_WORKERS if ingest_workers is None else ingest_workers
+        self.ingest_queue = None
+        if workers > 0:
+            self.ingest_queue = AlertIngestQueue(
+                handler=self.handle_alert,
+                workers=workers,
+                maxsize=settings.WS_INGEST_QUEUE_SIZE,
+                policy=settings.WS_INGEST_POLICY,
+                block_timeout=settings.WS_INGEST_BLOCK_TIMEOUT,
+                report_interval=settings.WS_INGEST_REPORT_INTERVAL,
+                reporter=self._report_ingest_metrics
+            )
     
     def on_message(self, ws, message):
         """处理接收到的消息"""
+        if self.recorder:
+            self.recorder.record(message)
         try:
-            data = json.loads(message)
+            data = codec.loads(message)
             
             # 检查是否有错误
             if 'error' in data:
-                error_msg = data.get('error', 'Unknown error')
-                print(f"✗ 订阅错误: {error_msg}", flush=True)
-                print(f"完整错误信息: {data}", flush=True)
-                
-                # 处理不同类型的错误
-                error_lower = error_msg.lower()
-                
-                if 'rate limit' in error_lower or 'limit exceeded' in error_lower:
-                    print("\n⚠️  警报速率限制超出！", flush=True)
-                    print("Whale Alert API 每小时最多接收 100 条警报", flush=True)
-                    print("\n解决方案：", flush=True)
-                    print("1. 减少订阅的币种数量（建议 3-5 个主要币种）", flush=True)
-                    print("2. 减少订阅的区块链数量（或留空以监测所有链）", flush=True)
-                    print("3. 增加最小转账金额（WHALE_ALERT_MIN_VALUE_USD）", flush=True)
-                    print("\n当前订阅配置：", flush=True)
-                    print(f"  - 币种: {settings.SYMBOLS if settings.SYMBOLS else '所有币种'}", flush=True)
-                    print(f"  - 区块链: {settings.BLOCKCHAINS if settings.BLOCKCHAINS else '所有链'}", flush=True)
-                    print(f"  - 最小金额: ${settings.WHALE_ALERT_MIN_VALUE_USD:,.0f}", flush=True)
-                    print("\n建议配置（在 .env 文件中设置）：", flush=True)
-                    print("  SYMBOLS=btc,eth,sol", flush=True)
-                    print("  BLOCKCHAINS=  # 留空，监测所有链", flush=True)
-                    print("  WHALE_ALERT_MIN_VALUE_USD=1000000  # 增加到 100 万美元", flush=True)
-                    
-                elif 'symbol' in error_lower:
-                    print("\n⚠️  币种符号错误", flush=True)
-                    print("可能某些币种符号不正确或不被支持", flush=True)
-                    print("\n排查步骤：", flush=True)
-                    print("1. 先测试单个币种，例如: SYMBOLS=btc", flush=True)
-                    print("2. 如果成功，逐个添加其他币种", flush=True)
-                    print("3. 常见可能的问题币种：", flush=True)
-                    print("   - matic 可能应该是 polygon 或其他", flush=True)
-                    print("   - avax 可能应该是 avalanche 或其他", flush=True)
-                    print("   - bnb 可能应该是 binance-coin 或其他", flush=True)
-                    print("4. 可以查看 Whale Alert 官方文档或使用 /status API 获取有效币种列表", flush=True)
-                    print(f"\n当前尝试的币种: {settings.SYMBOLS}", flush=True)
-                    print("建议: 先只测试 btc 或 eth，确认配置正确后再添加其他币种", flush=True)
-                    print("\n临时解决方案（在 .env 中设置）：", flush=True)
-                    print("  SYMBOLS=btc,eth,usdt", flush=True)
-                    print("  BLOCKCHAINS=", flush=True)
-                    
-                elif 'blockchain' in error_lower:
-                    print("\n⚠️  区块链名称错误", flush=True)
-                    print("可能某些区块链名称不正确", flush=True)
-                    print("\n常见正确的区块链名称: bitcoin, ethereum, solana, avalanche, polygon, bsc, ripple, tron", flush=True)
-                    print("如果只想订阅币种，可以尝试不提供 blockchains 参数（留空）", flush=True)
-                    print(f"\n当前尝试的区块链: {settings.BLOCKCHAINS}", flush=True)
-                    print("\n建议（在 .env 中设置）：", flush=True)
-                    print("  BLOCKCHAINS=  # 留空，让 API 自动监测所有链", flush=True)
-                    
-                elif 'api' in error_lower or 'key' in error_lower or 'auth' in error_lower:
-                    print("\n⚠️  API 认证错误", flush=True)
-                    print("请检查 WHALE_ALERT_API_KEY 环境变量是否正确设置", flush=True)
-                    
+                print_subscription_error(data)
                 return
             
             # 根据官方文档，消息类型通过 'type' 字段判断
@@ -113,111 +171,192 @@ class WhaleAlertWebSocket:
             if msg_type == 'subscribed_alerts':
                 # 订阅确认消息（注意：返回的是 'subscribed_alerts' 不是 'subscribe_alerts'）
                 self.subscribed = True
-                # 成功订阅后，重置 429 错误计数
+                # 成功订阅后，重置 429 错误计数和退避
                 self.consecutive_429_errors = 0
-                self.reconnect_delay = 5
+                self.supervisor.on_subscribed()
+                self.redis_client.touch_alive()
                 print(f"✓ 订阅成功: ID={data.get('id', 'N/A')}, "
                       f"区块链={data.get('blockchains', [])}, "
                       f"币种={data.get('symbols', [])}, "
                       f"交易类型={data.get('tx_types', [])}, "
                       f"最小金额=${data.get('min_value_usd', 0):,.0f}", flush=True)
             elif 'channel_id' in data or 'transaction' in data:
-                # 这是实际的警报消息（AlertJSON格式）
-                self.handle_alert(data)
+                # 这是实际的警报消息（AlertJSON格式），在接收线程中解码为 Alert 一次
+                self.dispatch_alert(Alert.from_dict(data))
             else:
                 # 其他类型的消息
                 print(f"收到消息: {data}", flush=True)
                 
-        except json.JSONDecodeError as e:
+        except codec.DecodeError as e:
             print(f"JSON解析错误: {e}, 消息: {message[:100]}", flush=True)
         except Exception as e:
             print(f"处理消息错误: {e}", flush=True)
     
-    def handle_alert(self, alert_data: dict):
+    def dispatch_alert(self, alert: Alert):
+        """
+        分发警报：启用摄取队列时入队，否则直接处理
+        
+        参数:
+        - alert: 解码后的警报
+        """
+        self.alerts_received += 1
+        # 统计重连后补发的警报（只做内存操作，不阻塞接收线程）
+        self.supervisor.on_alert(alert.timestamp)
+        
+        if self.ingest_queue and self.ingest_queue.running:
+            self.ingest_queue.submit(alert)
+        else:
+            self.handle_alert(alert)
+    
+    def _report_ingest_metrics(self, stats: dict):
+        """汇报摄取队列指标（打印并写入 Redis）"""
+        print(f"[摄取队列] 深度={stats['depth']}/{stats['maxsize']} | "
+              f"已处理={stats['processed']} | 失败={stats['failed']} | 丢弃={stats['dropped']} | "
+              f"处理p50={stats['process_p50_ms']}ms p99={stats['process_p99_ms']}ms | "
+              f"端到端p99={stats['total_p99_ms']}ms", flush=True)
+        self.redis_client.save_metrics('ingest', stats)
+        if self.dedup:
+            self.redis_client.save_metrics('dedup', self.dedup.stats())
+        if self.binance.price_stream:
+            self.redis_client.save_metrics('price_stream', self.binance.price_stream.stats())
+        if self.binance.price_cache:
+            self.redis_client.save_metrics('price_cache', self.binance.price_cache.stats())
+        if self.binance.symbol_resolver:
+            self.redis_client.save_metrics('symbols', self.binance.symbol_resolver.stats())
+        if self.binance.rate_limiter:
+            self.redis_client.save_metrics('rate_limit', self.binance.rate_limiter.stats())
+    
+    def _save_outage(self, record: dict):
+        """保存一次断线记录和重连统计到 Redis"""
+        self.redis_client.record_outage(record)
+        self.redis_client.save_metrics('reconnect', self.supervisor.stats())
+    
+    def get_metrics(self) -> dict:
+        """
+        获取客户端运行指标
+        
+        返回:
+        - 指标字典
+        """
+        metrics = {'reconnect': self.supervisor.stats()}
+        if self.ingest_queue:
+            metrics['ingest'] = self.ingest_queue.stats()
+        if self.dedup:
+            metrics['dedup'] = self.dedup.stats()
+        if self.binance.price_stream:
+            metrics['price_stream'] = self.binance.price_stream.stats()
+        if self.binance.price_cache:
+            metrics['price_cache'] = self.binance.price_cache.stats()
+        if self.binance.symbol_resolver:
+            metrics['symbols'] = self.binance.symbol_resolver.stats()
+        if self.binance.rate_limiter:
+            metrics['rate_limit'] = self.binance.rate_limiter.stats()
+        return metrics
+    
+    def is_duplicate(self, tx_hash: str) -> bool:
+        """
+        检查交易是否已经处理过（本地布隆过滤器 → Redis 原子占位）
+        
+        参数:
+        - tx_hash: 交易哈希
+        
+        返回:
+        - True 表示重复警报；首次出现时同时完成占位
+        """
+        if not self.dedup:
+            return False
+        if self.dedup.seen_locally(tx_hash):
+            return True
+        try:
+            claimed = self.redis_client.claim_alert(tx_hash, settings.WS_DEDUP_TTL)
+        except Exception as e:
+            # Redis 不可用时按新警报处理（后续写入同样会失败并记录错误）
+            print(f"去重检查失败: {e}", flush=True)
+            self.dedup.record_error(tx_hash)
+            return False
+        self.dedup.record_claim(tx_hash, claimed)
+        return not claimed
+    
+    def _finish_claim(self, tx_hash: str, saved: bool):
+        """
+        处理结束后确认或释放去重占位
+        
+        参数:
+        - tx_hash: 交易哈希
+        - saved: 是否已保存（未保存时释放 Redis 中的占位，避免该警报在去重窗口内无法再处理）
+        """
+        if not self.dedup:
+            return
+        if saved:
+            self.dedup.mark_processed(tx_hash)
+            return
+        try:
+            self.redis_client.release_alert(tx_hash)
+        except Exception as e:
+            print(f"释放去重占位失败: {e}", flush=True)
+    
+    def _warm_up_dedup(self):
+        """用 Redis 中最近处理过的交易哈希预热布隆过滤器（重启后的补发也能在本地丢弃）"""
+        if not self.dedup:
+            return
+        try:
+            count = self.dedup.warm_up(self.redis_client.get_recent_alerts(settings.WS_DEDUP_TTL))
+            print(f"去重过滤器已加载 {count} 个最近处理的交易", flush=True)
+        except Exception as e:
+            print(f"加载去重记录失败: {e}", flush=True)
+    
+    def handle_alert(self, alert: Alert):
         """
-        处理警报数据（AlertJSON格式）
+        处理警报数据
         
         参数:
-        - alert_data: 警报数据字典，格式参考官方文档的 AlertJSON
+        - alert: 解码后的警报（Alert.from_dict，格式参考官方文档的 AlertJSON）
         """
         # 根据官方文档，使用 transaction.hash 作为 event_id
-        transaction = alert_data.get('transaction', {})
-        event_id = transaction.get('hash', '')
+        event_id = alert.tx_hash
         
         if not event_id:
             print("警告: 收到的事件没有交易哈希", flush=True)
             return
         
+        # 重复的警报（重连补发、重复投递）不再查询价格，也不覆盖已有事件和基准价格
+        if self.is_duplicate(event_id):
+            return
+        
+        saved = False
         try:
-            # 获取 amounts 数组（可能包含多个币种）
-            amounts = alert_data.get('amounts', [])
-            if not amounts:
+            # amounts 数组（多币种交易会包含多项），每个币种一个观察窗口
+            if not alert.amounts:
                 print(f"警告: 事件 {event_id[:8]}... 没有金额信息", flush=True)
                 return
             
-            # 处理第一个币种（如果有多个，可以扩展处理）
-            first_amount = amounts[0]
-            currency = first_amount.get('symbol', 'btc').lower()
-            amount = float(first_amount.get('amount', 0))
-            amount_usd = float(first_amount.get('value_usd', 0))
-            
-            # 获取当前价格（BinanceCollector 会处理稳定币和交易对转换）
-            current_price = self.binance.get_current_price(currency)
+            # 一次批量请求获取所有币种的基准价格（BinanceCollector 会处理稳定币和交易对转换）
+            prices = self.binance.get_current_prices([asset.currency for asset in alert.amounts])
+            alert.exchange_flow = self.address_index.classify(alert.from_owner, alert.to_owner)
+            items, skipped = build_alert_observations(alert, prices)
             
-            if not current_price:
-                print(f"无法获取价格: {currency.upper()}，跳过事件 {event_id[:8]}...", flush=True)
+            for currency in skipped:
+                print(f"无法获取价格: {currency.upper()}，跳过事件 {event_id[:8]}... 的该币种", flush=True)
+            if not items:
                 return
             
-            # 准备事件数据
-            timestamp = alert_data.get('timestamp', 0)
-            if isinstance(timestamp, (int, float)) and timestamp > 0:
-                timestamp = datetime.fromtimestamp(timestamp).isoformat()
-            else:
-                timestamp = datetime.now().isoformat()
-            
-            event_data = {
-                "timestamp": timestamp,
-                "amount": str(amount),
-                "amount_usd": str(amount_usd),
-                "currency": currency,
-                "from_address": alert_data.get('from', ''),
-                "to_address": alert_data.get('to', ''),
-                "blockchain": alert_data.get('blockchain', ''),
-                "transaction_type": alert_data.get('transaction_type', ''),
-                "channel_id": alert_data.get('channel_id', ''),
-                "text": alert_data.get('text', ''),
-                "baseline_price": str(current_price),
-                "baseline_time": datetime.now().isoformat(),
-                "status": "observing"
-            }
-            
-            # 保存事件到Redis
-            self.redis_client.save_event(event_id, event_data)
-            
-            # 创建观察窗口（默认24小时）
-            self.redis_client.create_observation(
-                event_id=event_id,
-                baseline_price=current_price,
+            # 在一个 pipeline 中保存事件并创建观察窗口（默认24小时）
+            self.redis_client.save_alert_observations(
+                [(item_id, event_data, price) for item_id, event_data, price, _ in items],
                 window_hours=24
             )
+            saved = True
+            # 统计信息（全量扫描 event:* / result:*）由观察器在每次检查后更新，
+            # 不在每条警报后刷新，否则所有工作线程都会排队等待 Redis 扫描
             
-            # 更新统计信息（实时更新 total_events 和 observing_count）
-            self.redis_client.update_stats()
-            
-            # 格式化显示转账方向
-            from_addr = alert_data.get('from', 'Unknown')
-            to_addr = alert_data.get('to', 'Unknown')
-            # 如果地址太长，截断显示
-            from_display = from_addr[:20] + '...' if len(from_addr) > 20 else from_addr
-            to_display = to_addr[:20] + '...' if len(to_addr) > 20 else to_addr
-            
-            print(f"✓ 新事件: {event_id[:16]}... | "
-                  f"从 {from_display} → {to_display} | "
-                  f"{amount:,.2f} {currency.upper()} (${amount_usd:,.0f}) | "
-                  f"价格: ${current_price:,.2f}", flush=True)
+            for item_id, _, price, asset in items:
+                print(format_event_line(item_id, alert, asset, price), flush=True)
             
         except Exception as e:
-            print(f"处理警报错误: {e}, 数据: {alert_data}", flush=True)
+            print(f"处理警报错误: {e}, 数据: {alert}", flush=True)
+        finally:
+            # 缺少价格或写入失败时释放占位，重新投递的同一警报仍会被处理
+            self._finish_claim(event_id, saved)
     
     def on_error(self, ws, error):
         """处理错误"""
@@ -227,11 +366,10 @@ class WhaleAlertWebSocket:
         # 检测 429 Too Many Requests 错误
         if "429" in error_str or "Too Many Requests" in error_str:
             self.consecutive_429_errors += 1
-            # 指数退避：5秒 -> 10秒 -> 20秒 -> 40秒 -> 80秒 -> 最多5分钟
-            self.reconnect_delay = min(5 * (2 ** (self.consecutive_429_errors - 1)), self.max_reconnect_delay)
+            # 由监督器使用更长的退避时间
+            self.supervisor.on_rate_limited()
             print(f"\n⚠️  请求过于频繁 (429 Too Many Requests)", flush=True)
             print(f"连续 429 错误次数: {self.consecutive_429_errors}", flush=True)
-            print(f"将等待 {self.reconnect_delay} 秒后重连...", flush=True)
             print("\n建议：", flush=True)
             print("1. 检查是否在短时间内多次启动程序", flush=True)
             print("2. 等待更长时间后再重试", flush=True)
@@ -239,7 +377,6 @@ class WhaleAlertWebSocket:
         else:
             # 非 429 错误，重置计数器
             self.consecutive_429_errors = 0
-            self.reconnect_delay = 5  # 重置为默认延迟
         
         # 如果是握手错误，提供更详细的诊断信息
         if "Handshake status" in error_str:
@@ -299,54 +436,30 @@ class WhaleAlertWebSocket:
             print(f"未知关闭代码: {close_status_code}", flush=True)
         
         self.subscribed = False
-        
-        # 自动重连（非正常关闭且仍在运行）
-        if close_status_code != 1000 and self.running:  # 非正常关闭
-            # 如果是 429 错误导致的关闭，使用更长的延迟
-            if self.consecutive_429_errors > 0:
-                print(f"⚠️  由于请求过于频繁，将等待 {self.reconnect_delay} 秒后重连...", flush=True)
-            else:
-                print(f"{self.reconnect_delay}秒后尝试重连...", flush=True)
-            time.sleep(self.reconnect_delay)
-            if self.running:  # 如果还在运行，尝试重连
-                self.start()
-        else:
-            # 正常关闭，重置错误计数
-            self.consecutive_429_errors = 0
-            self.reconnect_delay = 5
+        # 只记录断线，重连由 start() 中的循环负责（不在回调中递归调用 start）
+        self.supervisor.on_disconnected(reason=f"close {close_status_code}")
+    
+    def on_pong(self, ws, data):
+        """收到 pong（约每30秒一次）：刷新最后存活时间，用于计算进程重启造成的断线时长"""
+        if self.running and self.subscribed:
+            try:
+                self.redis_client.touch_alive()
+            except Exception as e:
+                print(f"更新存活时间失败: {e}", flush=True)
     
     def on_open(self, ws):
         """连接建立后订阅"""
         try:
-            # 根据官方文档，订阅消息格式：
-            # type: "subscribe_alerts" (必需)
-            # id: string (可选) - 用于重连后接收错过的警报
-            # blockchains: []string (可选) - 如果省略，自动包含所有区块链
-            # symbols: []string (可选) - 如果省略，自动包含所有币种
-            # tx_types: []string (可选) - 如果省略，自动包含所有交易类型
-            # min_value_usd: float (必需) - 最小转账金额（美元）
-            
-            # 构建订阅消息
-            subscription = {
-                "type": "subscribe_alerts",
-                "min_value_usd": settings.WHALE_ALERT_MIN_VALUE_USD  # 必需参数
-            }
-            
-            # 添加可选参数（如果配置了）
-            if settings.SYMBOLS:
-                subscription["symbols"] = settings.SYMBOLS
-            # 注意：如果不提供 symbols，API 会自动包含所有币种
-            
-            if settings.BLOCKCHAINS:
-                subscription["blockchains"] = settings.BLOCKCHAINS
-            # 注意：如果不提供 blockchains，API 会自动包含所有区块链
+            # 构建订阅消息（格式说明见 build_subscription）
+            subscription = build_subscription(self.subscription_id)
             
             ws.send(json.dumps(subscription))
             
             # 显示订阅信息
             blockchain_info = f", 区块链={settings.BLOCKCHAINS}" if settings.BLOCKCHAINS else " (所有链)"
             symbol_info = f"币种={settings.SYMBOLS}" if settings.SYMBOLS else "所有币种"
-            print(f"已发送订阅请求: {symbol_info}{blockchain_info}, 最小金额=${settings.WHALE_ALERT_MIN_VALUE_USD:,.0f}", flush=True)
+            print(f"已发送订阅请求: {symbol_info}{blockchain_info}, 最小金额=${settings.WHALE_ALERT_MIN_VALUE_USD:,.0f}, "
+                  f"订阅ID={self.subscription_id}", flush=True)
             
             self.subscribed = False  # 等待确认
         except Exception as e:
@@ -367,42 +480,78 @@ class WhaleAlertWebSocket:
         # 某些 WebSocket 服务可能需要 User-Agent
         headers['User-Agent'] = 'WhaleAlertTrends/1.0'
         
-        self.ws = websocket.WebSocketApp(
-            self.ws_url,
-            on_open=self.on_open,
-            on_message=self.on_message,
-            on_error=self.on_error,
-            on_close=self.on_close,
-            header=headers
-        )
         self.running = True
-            # 不显示完整的URL（包含API key）
-            display_url = self.ws_url.split('?')[0] if '?' in self.ws_url else self.ws_url
-            print(f"正在连接到 {display_url}...", flush=True)
-            print(f"API 密钥长度: {len(self.api_key)} 字符", flush=True)
+        if self.ingest_queue:
+            self.ingest_queue.start()
         
-        try:
-            self.ws.run_forever(
-                ping_interval=30,  # 每30秒发送ping保持连接
-                ping_timeout=10     # ping超时10秒
+        # 获取稳定的订阅ID（环境变量 > Redis 中持久化的ID > 新生成）
+        self.subscription_id = self.redis_client.get_subscription_id(settings.WHALE_ALERT_SUBSCRIPTION_ID)
+        self._warm_up_dedup()
+        
+        # 如果上次运行非正常退出（例如 Railway 重启），从最后存活时间开始计算断线时长
+        last_alive = self.redis_client.get_last_alive()
+        if last_alive:
+            self.supervisor.on_disconnected(reason="进程重启", since=last_alive)
+        
+        # 不显示完整的URL（包含API key）
+        display_url = self.ws_url.split('?')[0] if '?' in self.ws_url else self.ws_url
+        print(f"API 密钥长度: {len(self.api_key)} 字符", flush=True)
+        
+        # 单循环重连：每次 run_forever 返回（连接关闭或出错）后按退避时间等待，再建立新连接
+        while self.running:
+            self.ws = websocket.WebSocketApp(
+                self.ws_url,
+                on_open=self.on_open,
+                on_message=self.on_message,
+                on_error=self.on_error,
+                on_close=self.on_close,
+                on_pong=self.on_pong,
+                header=headers
             )
-        except Exception as e:
-            print(f"WebSocket 运行错误: {e}", flush=True)
-            if self.running:
-                # 如果是 429 错误导致的异常，使用更长的延迟
-                if self.consecutive_429_errors > 0:
-                    print(f"⚠️  由于请求过于频繁，将等待 {self.reconnect_delay} 秒后重连...", flush=True)
-                else:
-                    print(f"{self.reconnect_delay}秒后尝试重连...", flush=True)
-                time.sleep(self.reconnect_delay)
-                if self.running:
-                    self.start()  # 递归重连
+            print(f"正在连接到 {display_url}...", flush=True)
+            
+            try:
+                self.ws.run_forever(
+                    ping_interval=30,  # 每30秒发送ping保持连接
+                    ping_timeout=10     # ping超时10秒
+                )
+            except Exception as e:
+                print(f"WebSocket 运行错误: {e}", flush=True)
+            
+            self.subscribed = False
+            if not self.running:
+                break
+            
+            # 连接失败时 on_close 可能不会被调用，这里补记一次（已在断线中则忽略）
+            self.supervisor.on_disconnected(reason="connection lost")
+            delay = self.supervisor.next_delay()
+            if self.consecutive_429_errors > 0:
+                print(f"⚠️  由于请求过于频繁，将等待 {delay:.1f} 秒后重连...", flush=True)
+            else:
+                print(f"{delay:.1f}秒后尝试重连...", flush=True)
+            
+            # 分段等待，便于 stop() 及时生效
+            deadline = time.monotonic() + delay
+            while self.running and time.monotonic() < deadline:
+                time.sleep(min(1.0, deadline - time.monotonic()))
+        
+        self.supervisor.close()
     
     def stop(self):
         """停止WebSocket连接"""
         self.running = False
+        self.supervisor.close()
         if self.ws:
             self.ws.close()
+        # 正常停止：删除最后存活时间，下次启动时不把停机时间记为断线
+        try:
+            self.redis_client.clear_alive()
+        except Exception as e:
+            print(f"清除存活时间失败: {e}", flush=True)
+        if self.ingest_queue:
+            self.ingest_queue.stop()
+        if self.recorder:
+            self.recorder.close()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,20 @@
+"""pytest 配置：把项目根目录加入路径（与 scripts/ 中的脚本相同），以及共用的 fixture"""
+import sys
+from pathlib import Path
+
+import pytest
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+
+@pytest.fixture
+def redis_client(monkeypatch):
+    """连接到 fakeredis 的 RedisClient（未安装 fakeredis 时跳过）"""
+    fakeredis = pytest.importorskip('fakeredis')
+    from src.storage import redis_client as module
+
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(module.redis, 'from_url',
+                        lambda url, **kwargs: fakeredis.FakeRedis(server=server, decode_responses=True))
+    return module.RedisClient(redis_url='redis://fakeredis:6379/0')
@@ -0,0 +1,76 @@
+"""交易所地址索引"""
+import pandas as pd
+
+from src.storage.address_index import (
+    DIRECTION_IN, DIRECTION_INTERNAL, DIRECTION_OUT, DIRECTION_UNKNOWN, AddressIndex
+)
+
+BINANCE = '0xAbC0000000000000000000000000000000000001'
+KRAKEN = 'bc1qkraken0000000000000000000000000000000'
+FUND = '0xf000000000000000000000000000000000000002'
+OTHER = '0x9999999999999999999999999999999999999999'
+
+
+def make_index(chunksize=1_000_000):
+    return AddressIndex.from_labels(
+        [BINANCE, KRAKEN, FUND, '', None],
+        ['Binance', 'Kraken', 'Some Fund', 'Ghost', 'Ghost'],
+        ['exchange', 'exchange', 'fund', 'exchange', 'exchange'],
+        chunksize=chunksize,
+    )
+
+
+def test_lookup_normalizes_evm_addresses():
+    index = make_index()
+    assert len(index) == 3
+    assert index.entity_of(BINANCE.lower()) == 'Binance'
+    assert index.entity_of(f'  {BINANCE.upper().replace("0X", "0x")} ') == 'Binance'
+    assert index.entity_of(KRAKEN) == 'Kraken'
+    assert index.entity_of(OTHER) is None
+
+
+def test_entities_without_addresses_are_skipped():
+    for chunksize in (1, 2, 1_000_000):
+        index = make_index(chunksize)
+        assert index.entities == ['Binance', 'Kraken', 'Some Fund']
+        assert not index.is_exchange('Ghost')
+        assert not index.is_exchange('')
+
+
+def test_classify_uses_entity_type():
+    index = make_index()
+    assert index.classify(OTHER, BINANCE) == DIRECTION_IN
+    assert index.classify(KRAKEN, OTHER) == DIRECTION_OUT
+    assert index.classify(BINANCE, 'kraken') == DIRECTION_INTERNAL
+    assert index.classify(FUND, OTHER) == DIRECTION_UNKNOWN
+
+
+def test_classify_frame_matches_single_lookups():
+    index = make_index()
+    df = pd.DataFrame({
+        'from_address': [OTHER, KRAKEN, BINANCE, FUND, OTHER],
+        'to_address': [BINANCE, OTHER, KRAKEN, OTHER, OTHER],
+        'from_owner_type': ['unknown', 'unknown', 'unknown', 'unknown', 'exchange'],
+    })
+    assert list(index.classify_frame(df)) == [
+        DIRECTION_IN, DIRECTION_OUT, DIRECTION_INTERNAL, DIRECTION_UNKNOWN, DIRECTION_OUT
+    ]
+
+
+def test_save_and_load_round_trip(tmp_path):
+    index = make_index()
+    path = tmp_path / 'labels.npz'
+    index.save(path)
+    loaded = AddressIndex.load(path)
+    assert loaded.entities == index.entities
+    assert loaded.entity_types == index.entity_types
+    assert loaded.entity_of(BINANCE) == 'Binance'
+    assert list(loaded.entity_names([KRAKEN, OTHER])) == ['Kraken', None]
+
+
+def test_from_csv_skips_empty_addresses(tmp_path):
+    path = tmp_path / 'labels.csv'
+    path.write_text(f"address,entity\n{BINANCE},Binance\n,Ghost\n", encoding='utf-8')
+    index = AddressIndex.from_csv(path)
+    assert index.entities == ['Binance']
+    assert index.is_exchange(BINANCE)
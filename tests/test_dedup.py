@@ -0,0 +1,34 @@
+"""布隆过滤器和警报去重器"""
+from src.storage.dedup import AlertDeduplicator, BloomFilter
+
+
+def test_bloom_filter_keeps_previous_generation():
+    bloom = BloomFilter(capacity=100, error_rate=1e-4)
+    for i in range(150):
+        bloom.add(f'tx{i}')
+    assert bloom.rotations == 1
+    assert all(f'tx{i}' in bloom for i in range(150))
+    assert sum(f'other{i}' in bloom for i in range(1000)) <= 5
+
+
+def test_claim_is_not_seen_until_processed():
+    dedup = AlertDeduplicator(capacity=100)
+    assert not dedup.seen_locally('tx')
+    dedup.record_claim('tx', claimed=True)
+    # 保存失败（占位已释放）时，重新投递的同一警报仍需处理
+    assert not dedup.seen_locally('tx')
+    dedup.mark_processed('tx')
+    assert dedup.seen_locally('tx')
+
+
+def test_stats_count_hits_and_errors():
+    dedup = AlertDeduplicator(capacity=100)
+    dedup.warm_up(['a', 'b'])
+    assert dedup.seen_locally('a')
+    dedup.record_claim('c', claimed=False)
+    dedup.record_error('d')
+    stats = dedup.stats()
+    assert stats['local_hits'] == 1
+    assert stats['redis_hits'] == 1
+    assert stats['errors'] == 1
+    assert stats['checked'] == 3
@@ -0,0 +1,65 @@
+"""帧日志录制与读取（包括多次启动追加和 gzip 尾部截断）"""
+import gzip
+
+import pytest
+
+from src.websocket.frame_log import MAGIC, FrameRecorder, iter_frames
+
+
+def record_session(path, frames, start_ts):
+    """模拟一次进程运行：打开录制器、写入若干帧、关闭"""
+    recorder = FrameRecorder(str(path))
+    for i, frame in enumerate(frames):
+        recorder.record(frame, received_at=start_ts + i)
+    recorder.close()
+
+
+@pytest.mark.parametrize('name', ['frames.log', 'frames.log.gz'])
+def test_round_trip_across_restarts(tmp_path, name):
+    path = tmp_path / name
+    record_session(path, ['{"a": 1}', '{"b": "中文"}'], 1000.0)
+    record_session(path, ['{"c": 3}'], 2000.0)
+
+    assert list(iter_frames(str(path))) == [
+        (1000.0, '{"a": 1}'),
+        (1001.0, '{"b": "中文"}'),
+        (2000.0, '{"c": 3}'),
+    ]
+
+
+def test_magic_written_once(tmp_path):
+    path = tmp_path / 'frames.log'
+    record_session(path, ['x'], 1.0)
+    record_session(path, ['y'], 2.0)
+    assert path.read_bytes().count(MAGIC) == 1
+
+
+def test_truncated_record_is_end_of_log(tmp_path):
+    path = tmp_path / 'frames.log'
+    record_session(path, ['first', 'second'], 1.0)
+    path.write_bytes(path.read_bytes()[:-3])
+    assert list(iter_frames(str(path))) == [(1.0, 'first')]
+
+
+def test_truncated_gzip_member_is_end_of_log(tmp_path):
+    path = tmp_path / 'frames.log.gz'
+    record_session(path, ['first'], 1.0)
+    complete = path.read_bytes()
+    record_session(path, ['second' * 100], 2.0)
+    # 第二次运行被杀：最后一个 gzip member 没有写完
+    data = path.read_bytes()
+    path.write_bytes(data[:len(complete) + (len(data) - len(complete)) // 2])
+    assert list(iter_frames(str(path))) == [(1.0, 'first')]
+
+
+def test_rejects_unknown_file(tmp_path):
+    path = tmp_path / 'other.log'
+    path.write_bytes(b'not a frame log')
+    with pytest.raises(ValueError):
+        list(iter_frames(str(path)))
+
+
+def test_gzip_file_is_compressed(tmp_path):
+    path = tmp_path / 'frames.log.gz'
+    record_session(path, ['x' * 1000], 1.0)
+    assert gzip.decompress(path.read_bytes()).startswith(MAGIC)
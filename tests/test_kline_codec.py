@@ -0,0 +1,46 @@
+"""/klines 响应解码"""
+import json
+
+import numpy as np
+import pandas as pd
+
+from src.data_collectors.kline_codec import (
+    KLINE_DTYPE, decode_klines, klines_to_records, records_to_dataframe
+)
+
+RAW = [
+    [1499040000000, "0.01634790", "0.80000000", "0.01575800", "0.01577100", "148976.11427815",
+     1499644799999, "2434.19055334", 308, "1756.87402397", "28.46694368", "0"],
+    [1499644800000, "0.01577100", "0.01600000", "0.01500000", "0.01590000", "100.5",
+     1500249599999, "1.5", 12, "50.25", "0.75", "0"],
+]
+
+
+def test_fast_path_matches_json_parsing():
+    body = json.dumps(RAW).encode()
+    fast = decode_klines(body)
+    slow = klines_to_records(RAW)
+    assert fast.dtype == KLINE_DTYPE
+    assert fast.tolist() == slow.tolist()
+    assert fast['open_time'][0] == 1499040000000
+    assert fast['trades'].tolist() == [308, 12]
+    assert fast['high'][0] == 0.8
+
+
+def test_decode_accepts_str_and_whitespace():
+    text = json.dumps(RAW, indent=2)
+    assert decode_klines(text).tolist() == klines_to_records(RAW).tolist()
+
+
+def test_decode_empty_response():
+    assert len(decode_klines(b'[]')) == 0
+    assert decode_klines(b' [] ').dtype == KLINE_DTYPE
+
+
+def test_records_to_dataframe():
+    df = records_to_dataframe(decode_klines(json.dumps(RAW)))
+    assert list(df.index) == list(pd.to_datetime([1499040000000, 1499644800000], unit='ms'))
+    assert df.index.name == 'open_time'
+    assert df['close_time'].iloc[1] == pd.Timestamp(1500249599999, unit='ms')
+    assert np.allclose(df['volume'], [148976.11427815, 100.5])
+    assert records_to_dataframe(decode_klines(b'[]')).empty
@@ -0,0 +1,70 @@
+"""由 1 分钟K线聚合更粗的间隔"""
+from datetime import datetime, timezone
+
+import numpy as np
+import pytest
+
+from src.data_collectors.kline_codec import KLINE_DTYPE
+from src.data_collectors.kline_downloader import INTERVAL_MS
+from src.data_processors.kline_resampler import (
+    bucket_bounds, can_derive, complete_bucket_mask, resample_records
+)
+
+MINUTE_MS = INTERVAL_MS['1m']
+
+
+def utc_ms(*args) -> int:
+    return int(datetime(*args, tzinfo=timezone.utc).timestamp() * 1000)
+
+
+def minute_klines(start_ms: int, count: int) -> np.ndarray:
+    records = np.zeros(count, dtype=KLINE_DTYPE)
+    records['open_time'] = start_ms + np.arange(count) * MINUTE_MS
+    records['close_time'] = records['open_time'] + MINUTE_MS - 1
+    records['open'] = np.arange(count) + 100.0
+    records['close'] = np.arange(count) + 100.5
+    records['high'] = np.arange(count) + 101.0
+    records['low'] = np.arange(count) + 99.0
+    records['volume'] = 0.1
+    records['trades'] = 2
+    return records
+
+
+def test_can_derive():
+    assert can_derive('1h')
+    assert can_derive('1M')
+    assert can_derive('1d', base='1h')
+    assert not can_derive('3d')
+    assert not can_derive('1m')
+    assert not can_derive('1h', base='1M')
+
+
+def test_bucket_bounds_follow_binance_alignment():
+    t = utc_ms(2024, 2, 15, 13, 47)
+    assert bucket_bounds(t, '1h') == (utc_ms(2024, 2, 15, 13), utc_ms(2024, 2, 15, 14))
+    # 周线从周一 UTC 0 点开始
+    assert bucket_bounds(t, '1w') == (utc_ms(2024, 2, 12), utc_ms(2024, 2, 19))
+    # 月线按自然月（闰年二月）
+    assert bucket_bounds(t, '1M') == (utc_ms(2024, 2, 1), utc_ms(2024, 3, 1))
+
+
+def test_resample_to_hours():
+    records = minute_klines(utc_ms(2024, 1, 1), 150)
+    hours = resample_records(records, '1h')
+    assert hours['open_time'].tolist() == [utc_ms(2024, 1, 1, h) for h in range(3)]
+    assert hours['close_time'][0] == utc_ms(2024, 1, 1, 1) - 1
+    assert hours['open'].tolist() == [100.0, 160.0, 220.0]
+    assert hours['close'].tolist() == [159.5, 219.5, 249.5]
+    assert hours['high'].tolist() == [160.0, 220.0, 250.0]
+    assert hours['low'].tolist() == [99.0, 159.0, 219.0]
+    assert hours['trades'].tolist() == [120, 120, 60]
+    assert hours['volume'][0] == pytest.approx(6.0)
+
+
+def test_complete_bucket_mask_drops_truncated_edges():
+    start = utc_ms(2024, 1, 1)
+    hours = resample_records(minute_klines(start, 150), '1h')
+    covered = [[start, start + 150 * MINUTE_MS]]
+    assert complete_bucket_mask(hours, covered).tolist() == [True, True, False]
+    assert complete_bucket_mask(hours, []).tolist() == [False, False, False]
+    assert len(resample_records(minute_klines(start, 0), '1h')) == 0
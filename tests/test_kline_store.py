@@ -0,0 +1,102 @@
+"""K线并发下载器和本地存储（使用内存中的响应，不访问 Binance）"""
+import json
+
+import numpy as np
+import pytest
+
+from src.data_collectors.kline_downloader import INTERVAL_MS, KlineDownloader
+from src.storage.kline_store import KlineStore
+from src.storage.rate_limiter import RateLimiter
+
+HOUR_MS = INTERVAL_MS['1h']
+START_MS = 1_700_000_000_000 - 1_700_000_000_000 % HOUR_MS
+
+
+class FakeResponse:
+    def __init__(self, body: bytes, status_code: int = 200):
+        self.content = body
+        self.status_code = status_code
+        self.headers = {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            import requests
+            raise requests.exceptions.HTTPError(f"{self.status_code} error")
+
+
+class FakeSession:
+    """按 startTime/endTime 生成小时K线；fail_from 开始的请求返回 500"""
+
+    def __init__(self, fail_from=None):
+        self.fail_from = fail_from
+        self.calls = 0
+
+    def get(self, url, params=None, timeout=None):
+        self.calls += 1
+        if self.fail_from is not None and params['startTime'] >= self.fail_from:
+            return FakeResponse(b'{"code": -1}', status_code=500)
+        rows = []
+        for t in range(params['startTime'], params['endTime'] + 1, HOUR_MS):
+            price = str(100 + (t - START_MS) // HOUR_MS)
+            rows.append([t, price, price, price, price, '1.0', t + HOUR_MS - 1, '100.0', 1, '0.5', '50.0', '0'])
+        return FakeResponse(json.dumps(rows).encode())
+
+
+class FakeCollector:
+    base_url = 'https://binance.invalid/api/v3'
+    timeout = 5
+    rate_limiter = None
+
+    def __init__(self, session):
+        self.session = session
+
+    def observe_response(self, response):
+        return 0
+
+
+def make_downloader(fail_from=None, limit=10):
+    limiter = RateLimiter(limits={'binance': (1_000_000, 1_000_000)}, backfill_reserve=0)
+    return KlineDownloader(FakeCollector(FakeSession(fail_from)), concurrency=4, limiter=limiter, limit=limit)
+
+
+def test_download_range_concatenates_windows():
+    downloader = make_downloader()
+    klines = downloader.download_range('BTCUSDT', '1h', START_MS, START_MS + 35 * HOUR_MS)
+    assert len(klines) == 35
+    assert np.all(np.diff(klines['open_time']) == HOUR_MS)
+    assert downloader.last_report['windows'] == 4
+    assert downloader.last_report['failed_windows'] == 0
+
+
+def test_fetch_range_returns_failed_windows(capsys):
+    downloader = make_downloader(fail_from=START_MS + 20 * HOUR_MS)
+    klines, failed = downloader.fetch_range('BTCUSDT', '1h', START_MS, START_MS + 35 * HOUR_MS)
+    assert len(klines) == 20
+    assert failed == [(START_MS + 20 * HOUR_MS, START_MS + 30 * HOUR_MS),
+                      (START_MS + 30 * HOUR_MS, START_MS + 35 * HOUR_MS)]
+    assert '2/4 个窗口失败' in capsys.readouterr().out
+
+
+def test_fill_does_not_cover_failed_windows(tmp_path):
+    end_ms = START_MS + 35 * HOUR_MS
+    store = KlineStore(root=str(tmp_path), downloader=make_downloader(fail_from=START_MS + 20 * HOUR_MS))
+    assert store.fill('BTCUSDT', '1h', START_MS, end_ms) == 20
+    assert store.covered_ranges('BTCUSDT', '1h') == [[START_MS, START_MS + 20 * HOUR_MS]]
+    assert store.missing_ranges('BTCUSDT', '1h', START_MS, end_ms) == [(START_MS + 20 * HOUR_MS, end_ms)]
+
+    # 下次请求只下载失败的时间段
+    store._downloader = make_downloader()
+    assert store.fill('BTCUSDT', '1h', START_MS, end_ms) == 15
+    assert store.missing_ranges('BTCUSDT', '1h', START_MS, end_ms) == []
+    records = store.load('BTCUSDT', '1h')
+    assert len(records) == 35
+    assert records['close'][-1] == pytest.approx(134)
+
+
+def test_fill_skips_covered_ranges(tmp_path):
+    downloader = make_downloader()
+    store = KlineStore(root=str(tmp_path), downloader=downloader)
+    store.fill('BTCUSDT', '1h', START_MS, START_MS + 10 * HOUR_MS)
+    calls = downloader.collector.session.calls
+    assert store.fill('BTCUSDT', '1h', START_MS, START_MS + 10 * HOUR_MS) == 0
+    assert downloader.collector.session.calls == calls
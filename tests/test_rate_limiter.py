@@ -0,0 +1,92 @@
+"""令牌桶限流器（进程内令牌桶和 Redis Lua 脚本）"""
+from types import SimpleNamespace
+
+import pytest
+
+from config import settings
+from src.storage.rate_limiter import PRIORITY_BACKFILL, PRIORITY_LIVE, RateLimiter
+
+# 每分钟 60 个令牌（每秒补充 1 个），最多积累 10 个
+LIMITS = {'binance': (60, 10)}
+
+
+@pytest.fixture(params=['local', 'redis'])
+def make_limiter(request):
+    """按后端创建限流器；Redis 后端的多个实例共用同一个 fakeredis（相当于多个进程）"""
+    if request.param == 'local':
+        return lambda: RateLimiter(limits=LIMITS, backfill_reserve=0.5)
+    fakeredis = pytest.importorskip('fakeredis')
+    server = fakeredis.FakeServer()
+    return lambda: RateLimiter(SimpleNamespace(client=fakeredis.FakeRedis(server=server)),
+                               limits=LIMITS, backfill_reserve=0.5)
+
+
+def test_burst_then_wait(make_limiter):
+    limiter = make_limiter()
+    for _ in range(10):
+        assert limiter.acquire('binance', 1, timeout=0)
+    assert not limiter.acquire('binance', 1, timeout=0)
+    stats = limiter.stats()
+    assert stats['binance_acquired'] == 10
+    assert stats['binance_cost'] == 10
+
+
+def test_backfill_keeps_reserve_for_live(make_limiter):
+    limiter = make_limiter()
+    for _ in range(5):
+        assert limiter.acquire('binance', 1, priority=PRIORITY_BACKFILL, timeout=0)
+    # 回填不能用掉最后 50% 的令牌，实时请求仍然可以
+    assert not limiter.acquire('binance', 1, priority=PRIORITY_BACKFILL, timeout=0)
+    assert limiter.acquire('binance', 5, priority=PRIORITY_LIVE, timeout=0)
+
+
+def test_penalize_blocks_all_requests(make_limiter):
+    limiter = make_limiter()
+    limiter.penalize('binance', 30)
+    assert not limiter.acquire('binance', 1, timeout=0.05)
+    assert limiter.stats()['binance_penalties'] == 1
+
+
+def test_weight_header_near_limit_penalizes(make_limiter):
+    limiter = make_limiter()
+    limiter.observe_binance_weight(str(int(settings.BINANCE_WEIGHT_LIMIT * 0.5)))
+    assert limiter.acquire('binance', 1, timeout=0)
+    limiter.observe_binance_weight(str(settings.BINANCE_WEIGHT_LIMIT))
+    assert not limiter.acquire('binance', 1, timeout=0)
+
+
+def test_cost_above_capacity_raises_instead_of_hanging(make_limiter):
+    limiter = make_limiter()
+    with pytest.raises(ValueError):
+        limiter.acquire('binance', 11)
+    # 回填只能使用桶容量减去保留部分
+    with pytest.raises(ValueError):
+        limiter.acquire('binance', 6, priority=PRIORITY_BACKFILL)
+    assert limiter.acquire('binance', 10, timeout=0)
+
+
+def test_unknown_api_is_not_limited(make_limiter):
+    assert make_limiter().acquire('other', 1000, timeout=0)
+
+
+def test_redis_bucket_is_shared_between_processes():
+    fakeredis = pytest.importorskip('fakeredis')
+    server = fakeredis.FakeServer()
+    first, second = (RateLimiter(SimpleNamespace(client=fakeredis.FakeRedis(server=server)), limits=LIMITS)
+                     for _ in range(2))
+    assert first.acquire('binance', 6, timeout=0)
+    assert not second.acquire('binance', 6, timeout=0)
+    assert second.acquire('binance', 4, timeout=0)
+
+
+def test_redis_failure_falls_back_to_local_bucket():
+    def broken_script(keys, args):
+        raise ConnectionError("redis down")
+
+    client = SimpleNamespace(register_script=lambda script: broken_script)
+    limiter = RateLimiter(SimpleNamespace(client=client), limits=LIMITS)
+    assert limiter.backend == 'redis'
+    for _ in range(10):
+        assert limiter.acquire('binance', 1, timeout=0)
+    assert not limiter.acquire('binance', 1, timeout=0)
+    assert limiter.stats()['binance_redis_errors'] == 11
@@ -0,0 +1,32 @@
+"""重连监督器：补发警报统计"""
+import time
+
+from src.websocket.supervisor import ReconnectSupervisor
+
+
+def test_only_alerts_from_the_gap_count_as_replayed():
+    outages = []
+    supervisor = ReconnectSupervisor(on_outage=outages.append)
+    disconnected_at = time.time() - 30
+    supervisor.on_disconnected('1006', since=disconnected_at)
+    supervisor.on_subscribed()
+    reconnected_ts = supervisor.pending["reconnected_ts"]
+
+    assert supervisor.on_alert(disconnected_at + 10)
+    # 断线前已收到过的警报被重复投递：不计数，也不结束补发
+    assert not supervisor.on_alert(disconnected_at - 10)
+    assert supervisor.pending is not None
+    # 重连之后的实时警报：结束补发
+    assert not supervisor.on_alert(reconnected_ts + 1)
+
+    assert supervisor.pending is None
+    assert len(outages) == 1
+    assert outages[0]["replayed"] == 1
+    assert "disconnected_ts" not in outages[0] and "reconnected_ts" not in outages[0]
+    assert supervisor.stats()["total_replayed"] == 1
+
+
+def test_alerts_without_outage_are_not_replayed():
+    supervisor = ReconnectSupervisor()
+    assert not supervisor.on_alert(time.time())
+    assert supervisor.stats()["total_outages"] == 0
@@ -0,0 +1,177 @@
+"""观察器单次检查的批量计算和批量写入"""
+import math
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from src.observers.tick import (
+    build_tick_writes, collect_pending, compute_price_updates, needs_snapshot_history, tick_currencies,
+    unindexed_expiries
+)
+
+
+def observation(**fields):
+    return {'status': 'observing', 'baseline_price': '100', **fields}
+
+
+def event(currency='btc', baseline_price='100'):
+    return {'currency': currency, 'baseline_price': baseline_price}
+
+
+def test_collect_pending_skips_bad_windows_individually(capsys):
+    event_ids = ['ok', 'gone', 'done', 'no_event', 'bad_price', 'zero', 'garbage', 'eth']
+    states = [
+        (observation(), event(), 1.0),
+        (None, event(), None),
+        (observation(status='completed'), event(), 1.0),
+        (observation(), None, 1.0),
+        (observation(), event(baseline_price='n/a'), 1.0),
+        (observation(), event(baseline_price='0'), 1.0),
+        ('not a hash', event(), 1.0),
+        (observation(), event('eth', '2000'), 1.0),
+    ]
+    pending, stale = collect_pending(event_ids, states)
+    assert [p[0] for p in pending] == ['ok', 'eth']
+    assert pending[1][2:] == ('eth', 2000.0)
+    assert stale == ['gone']
+    out = capsys.readouterr().out
+    assert 'bad_price' in out and 'garbage' in out
+
+
+def test_unindexed_expiries_parse_expires_at():
+    expires = datetime(2026, 1, 1, 12, 0)
+    states = [
+        (observation(expires_at=expires.isoformat()), event(), 123.0),
+        (observation(expires_at=expires.isoformat()), event(), None),
+        (observation(expires_at='garbage'), event(), None),
+        (observation(), event(), None),
+        (None, None, None),
+    ]
+    assert unindexed_expiries(['indexed', 'missing', 'bad', 'no_field', 'gone'], states) == {
+        'missing': expires.timestamp(), 'bad': 0, 'no_field': 0
+    }
+
+
+def test_tick_currencies_keeps_first_seen_order():
+    pending = [('a', {}, 'eth', 1.0), ('b', {}, 'btc', 1.0), ('c', {}, 'eth', 1.0)]
+    assert tick_currencies(pending) == ['eth', 'btc']
+
+
+def test_compute_price_updates_groups_by_currency():
+    pending = [
+        ('a', observation(), 'btc', 100.0),
+        ('b', observation(max_change_pct='5', min_change_pct='-1'), 'btc', 200.0),
+        ('c', observation(), 'doge', 1.0),
+        ('d', observation(max_change_pct='bad'), 'eth', 1000.0),
+    ]
+    updates = compute_price_updates(pending, {'btc': 110.0, 'eth': 900.0, 'doge': None}, due=['b'])
+    by_id = {u[0]: u for u in updates}
+    # 没有价格的币种跳过
+    assert set(by_id) == {'a', 'b', 'd'}
+
+    _, _, price, change, max_change, min_change, expired = by_id['a']
+    assert (price, change, max_change, min_change, expired) == (110.0, pytest.approx(10.0), pytest.approx(10.0),
+                                                               pytest.approx(10.0), False)
+    _, _, _, change, max_change, min_change, expired = by_id['b']
+    assert change == pytest.approx(-45.0)
+    assert (max_change, min_change, expired) == (5.0, pytest.approx(-45.0), True)
+    # 无效的历史值按缺失处理
+    assert by_id['d'][4] == pytest.approx(-10.0)
+    assert all(math.isfinite(value) for u in updates for value in u[2:6])
+
+
+def test_compute_price_updates_empty():
+    assert compute_price_updates([], {'btc': 1.0}) == []
+
+
+def test_needs_snapshot_history_only_for_expired_legacy_windows():
+    legacy = ('a', {'status': 'observing'}, 1.0, 1.0, 1.0, 1.0, True)
+    current = ('b', {'max_change_pct': '1'}, 1.0, 1.0, 1.0, 1.0, True)
+    open_legacy = ('c', {}, 1.0, 1.0, 1.0, 1.0, False)
+    assert needs_snapshot_history(legacy)
+    assert not needs_snapshot_history(current)
+    assert not needs_snapshot_history(open_legacy)
+
+
+def test_build_tick_writes():
+    updates = [
+        ('open', {}, 110.0, 10.0, 12.0, -2.0, False),
+        ('done', {}, 90.0, -10.0, 3.0, -10.0, True),
+        ('legacy', {}, 105.0, 5.0, 5.0, 5.0, True),
+    ]
+    snapshots, completions = build_tick_writes(updates, {'legacy': [8.0, -4.0]})
+    assert snapshots == [('open', 110.0, 10.0, 12.0, -2.0), ('done', 90.0, -10.0, 3.0, -10.0),
+                         ('legacy', 105.0, 5.0, 5.0, 5.0)]
+    assert completions == [('done', 90.0, -10.0, 'down', 3.0, -10.0),
+                           ('legacy', 105.0, 5.0, 'up', 8.0, -4.0)]
+
+
+def test_save_tick_updates_does_not_recreate_expired_windows(redis_client):
+    client = redis_client.client
+    for event_id in ('open', 'done'):
+        redis_client.create_observation(event_id, 100.0)
+    client.zadd('observations:active', {'expired': 1})
+    client.zadd('observations:expiry', {'expired': 1})
+
+    redis_client.save_tick_updates(
+        snapshots=[('open', 110.0, 10.0, 12.0, -2.0), ('done', 90.0, -10.0, 3.0, -10.0),
+                   ('expired', 100.0, 0.0, 0.0, 0.0)],
+        completions=[('done', 90.0, -10.0, 'down', 3.0, -10.0), ('expired', 100.0, 0.0, 'down', 0.0, 0.0)],
+    )
+
+    assert client.hget('observation:open', 'max_change_pct') == '12.0'
+    assert client.ttl('observation:open') > 0
+    assert client.hget('observation:done', 'status') == 'completed'
+    assert client.hget('result:done', 'direction') == 'down'
+    # 检查期间过期的窗口不会被重新创建
+    assert not client.exists('observation:expired')
+    assert client.llen('snapshots:open') == 1
+    assert client.zrange('observations:active', 0, -1) == ['open']
+    assert client.zrange('observations:expiry', 0, -1) == ['open']
+
+
+def test_save_tick_updates_isolates_command_errors(redis_client, capsys):
+    client = redis_client.client
+    redis_client.create_observation('ok', 100.0)
+    redis_client.create_observation('broken', 100.0)
+    client.set('snapshots:broken', 'not a list')
+
+    redis_client.save_tick_updates(
+        snapshots=[('broken', 1.0, 1.0, 1.0, 1.0), ('ok', 110.0, 10.0, 10.0, 10.0)], completions=[]
+    )
+
+    assert client.llen('snapshots:ok') == 1
+    assert client.hget('observation:ok', 'max_change_pct') == '10.0'
+    assert '1 个命令出错' in capsys.readouterr().out
+
+
+def test_create_observation_writes_index(redis_client):
+    redis_client.create_observation('a', 100.0, window_hours=1)
+    client = redis_client.client
+    expires_at = datetime.fromisoformat(client.hget('observation:a', 'expires_at')).timestamp()
+    assert client.zscore('observations:expiry', 'a') == pytest.approx(expires_at)
+    assert client.zscore('observations:active', 'a') is not None
+    assert client.ttl('observation:a') > 3600
+
+
+def test_unindexed_window_is_backfilled_in_tick(redis_client):
+    client = redis_client.client
+    redis_client.create_observation('late', 100.0)
+    redis_client.create_observation('expired', 100.0)
+    client.zrem('observations:expiry', 'late', 'expired')
+    past = (datetime.now() - timedelta(hours=1)).isoformat()
+    client.hset('observation:expired', 'expires_at', past)
+
+    active, due = redis_client.get_observation_schedule()
+    assert due == []
+    states = redis_client.load_observation_states(active)
+    expiry = unindexed_expiries(active, states)
+    assert set(expiry) == {'late', 'expired'}
+    due = [event_id for event_id, expires in expiry.items() if expires <= time.time()]
+    assert due == ['expired']
+
+    redis_client.save_tick_updates([], [('expired', 1.0, 0.0, 'down', 0.0, 0.0)], expiry=expiry)
+    assert client.zrange('observations:expiry', 0, -1) == ['late']
+    assert client.zrange('observations:active', 0, -1) == ['late']
+    assert redis_client.load_observation_states(['late'])[0][2] == pytest.approx(expiry['late'])